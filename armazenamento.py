@@ -0,0 +1,232 @@
+# armazenamento.py
+"""Layouts de gravação das respostas na planilha (longo e largo) e migração entre eles.
+
+- Longo (legado): uma linha por item, 58 linhas por envio. A 10ª coluna
+  (instrumento) e a 11ª (id_envio) são opcionais; linhas antigas, com 9
+  colunas, são do instrumento padrão.
+- Largo: uma linha por envio, com um par de colunas (resposta, pontuação)
+  para cada ID de item. A primeira linha da aba é um cabeçalho versionado
+  que mapeia as colunas para o banco de itens. Como as colunas dependem dos
+  itens, cada instrumento tem a sua aba larga (ver aba_larga).
+
+O id_envio (um por sessão do questionário) vai para a planilha nos dois
+layouts: é a identidade do envio na deduplicação e nos agregados, já que
+(timestamp, organização, respondente) se repete entre envios anônimos.
+"""
+import argparse
+
+from itens import INSTRUMENTO_PADRAO, ITENS
+
+FORMATO_LONGO = "longo"
+FORMATO_LARGO = "largo"
+
+ABA_LONGA = "Organizacional"
+ABA_LARGA = "Organizacional_Largo"
+
+# Nomes das colunas do layout longo (a aba não tem cabeçalho; usados em exportações)
+COLUNAS_LONGAS = [
+    "timestamp", "id_organizacao", "respondente", "data", "org",
+    "bloco", "item", "resposta", "pontuacao", "instrumento", "id_envio",
+]
+
+VERSAO_LAYOUT_LARGO = "largo-v3"
+COLUNAS_FIXAS_LARGO = [
+    "timestamp", "id_organizacao", "respondente", "data", "org", "versao_layout", "instrumento",
+    "id_envio",
+]
+SUFIXO_RESPOSTA = "_resp"
+SUFIXO_PONTUACAO = "_pont"
+
+
+class CabecalhoIncompativel(ValueError):
+    """A aba larga possui um cabeçalho de outra versão ou de outro banco de itens."""
+
+
+def letra_coluna(numero):
+    """Converte o número da coluna (1 = A) na letra usada em intervalos A1."""
+    letras = ""
+    while numero:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(ord("A") + resto) + letras
+    return letras
+
+
+def instrumento_da_linha_longa(linha):
+    """Instrumento de uma linha do layout longo (linhas antigas não têm a 10ª coluna)."""
+    return linha[9] if len(linha) > 9 and linha[9] else INSTRUMENTO_PADRAO
+
+
+def id_envio_da_linha_longa(linha):
+    """ID do envio de uma linha do layout longo ("" em linhas gravadas antes da 11ª coluna)."""
+    return linha[10] if len(linha) > 10 else ""
+
+
+def aba_larga(instrumento=INSTRUMENTO_PADRAO):
+    """Nome da aba larga do instrumento (a do instrumento padrão mantém o nome original)."""
+    return ABA_LARGA if instrumento == INSTRUMENTO_PADRAO else f"{ABA_LARGA}_{instrumento}"
+
+
+def eh_aba_larga(nome_aba):
+    return nome_aba == ABA_LARGA or nome_aba.startswith(f"{ABA_LARGA}_")
+
+
+def instrumento_da_aba(nome_aba):
+    """Instrumento associado a uma aba larga (inverso de aba_larga)."""
+    return nome_aba[len(ABA_LARGA) + 1:] if nome_aba.startswith(f"{ABA_LARGA}_") else INSTRUMENTO_PADRAO
+
+
+# --- LAYOUT LONGO ---
+def linhas_longas(metadados, itens_pontuados, instrumento=INSTRUMENTO_PADRAO, id_envio=""):
+    """Monta as linhas no layout longo.
+
+    `metadados` é (timestamp, id_organizacao, respondente, data, org) e
+    `itens_pontuados` é uma sequência de (ID, Bloco, Item, Resposta, Pontuação).
+    """
+    return [
+        [*metadados, bloco, item, resposta, pontuacao, instrumento, id_envio]
+        for _, bloco, item, resposta, pontuacao in itens_pontuados
+    ]
+
+
+def chave_envio_longo(linha):
+    """Chave do envio de uma linha longa: o id_envio ou, em linhas antigas, os metadados e o instrumento."""
+    return id_envio_da_linha_longa(linha) or (*linha[:5], instrumento_da_linha_longa(linha))
+
+
+class AgrupadorEnviosLongos:
+    """Separa em envios as linhas do layout longo, lidas na ordem da aba (pode ser em partes).
+
+    As linhas de um envio são contíguas (cada envio entra em um único
+    append_rows). Um envio novo começa quando a chave muda ou quando um item
+    se repete sob a mesma chave: dois envios anônimos no mesmo segundo, ou um
+    lote gravado duas vezes, não se fundem em um só.
+    """
+
+    def __init__(self):
+        self.chave = None
+        self._itens = set()
+
+    def novo_envio(self, linha):
+        """Indica se a linha começa um novo envio (que passa a ser o envio corrente)."""
+        chave = chave_envio_longo(linha)
+        novo = chave != self.chave or linha[6] in self._itens
+        if novo:
+            self.chave, self._itens = chave, set()
+        self._itens.add(linha[6])
+        return novo
+
+
+def agrupar_envios_longos(linhas):
+    """Agrupa as linhas do layout longo por envio: [(chave, índices das linhas)], na ordem da aba."""
+    envios, agrupador = [], AgrupadorEnviosLongos()
+    for indice, linha in enumerate(linhas):
+        if len(linha) < 9:
+            continue
+        if agrupador.novo_envio(linha):
+            envios.append((agrupador.chave, []))
+        envios[-1][1].append(indice)
+    return envios
+
+
+# --- LAYOUT LARGO ---
+def cabecalho_largo(itens=ITENS):
+    """Cabeçalho da aba larga: colunas fixas seguidas de um par de colunas por item."""
+    cabecalho = list(COLUNAS_FIXAS_LARGO)
+    for _, item_id, _, _ in itens:
+        cabecalho.append(f"{item_id}{SUFIXO_RESPOSTA}")
+        cabecalho.append(f"{item_id}{SUFIXO_PONTUACAO}")
+    return cabecalho
+
+
+def mapa_colunas(cabecalho):
+    """Mapeia ID do item -> (índice da coluna de resposta, índice da coluna de pontuação)."""
+    mapa = {}
+    for indice, nome in enumerate(cabecalho):
+        if nome.endswith(SUFIXO_RESPOSTA):
+            mapa.setdefault(nome[:-len(SUFIXO_RESPOSTA)], [None, None])[0] = indice
+        elif nome.endswith(SUFIXO_PONTUACAO):
+            mapa.setdefault(nome[:-len(SUFIXO_PONTUACAO)], [None, None])[1] = indice
+    return {item_id: tuple(colunas) for item_id, colunas in mapa.items()}
+
+
+def linha_larga(metadados, itens_pontuados, itens=ITENS, instrumento=INSTRUMENTO_PADRAO, id_envio=""):
+    """Monta a única linha do envio no layout largo, na ordem do banco de itens."""
+    por_id = {item_id: (resposta, pontuacao) for item_id, _, _, resposta, pontuacao in itens_pontuados}
+    linha = [*metadados, VERSAO_LAYOUT_LARGO, instrumento, id_envio]
+    for _, item_id, _, _ in itens:
+        resposta, pontuacao = por_id.get(item_id, ("N/A", "N/A"))
+        linha.append(resposta)
+        linha.append(pontuacao)
+    return linha
+
+
+def garantir_cabecalho_largo(ws, itens=ITENS):
+    """Escreve o cabeçalho na aba larga vazia ou valida o cabeçalho existente."""
+    esperado = cabecalho_largo(itens)
+    atual = ws.row_values(1)
+    if not atual:
+        ws.update(range_name="A1", values=[esperado])
+    elif atual != esperado:
+        raise CabecalhoIncompativel(
+            f"Cabeçalho da aba '{ws.title}' não corresponde ao layout {VERSAO_LAYOUT_LARGO}."
+        )
+
+
+# --- MIGRAÇÃO LONGO -> LARGO ---
+def converter_longo_para_largo(linhas, itens=ITENS, instrumento=INSTRUMENTO_PADRAO):
+    """Converte linhas do layout longo (de um instrumento) em linhas do layout largo.
+
+    As linhas são separadas em envios por AgrupadorEnviosLongos, preservando a
+    ordem de chegada. O texto do item é mapeado para o ID pelo banco de itens;
+    linhas de cabeçalho, de outros instrumentos ou com itens desconhecidos são
+    ignoradas.
+    """
+    id_por_texto = {item: item_id for _, item_id, item, _ in itens}
+    envios, agrupador = [], AgrupadorEnviosLongos()
+    for linha in linhas:
+        if len(linha) < 9 or instrumento_da_linha_longa(linha) != instrumento:
+            continue
+        item_id = id_por_texto.get(linha[6])
+        if item_id is None:
+            continue
+        if agrupador.novo_envio(linha):
+            envios.append((linha[:5], id_envio_da_linha_longa(linha), []))
+        envios[-1][2].append((item_id, linha[5], linha[6], linha[7], linha[8]))
+    return [
+        linha_larga(list(metadados), pontuados, itens, instrumento, id_envio)
+        for metadados, id_envio, pontuados in envios
+    ]
+
+
+def migrar_aba(ws_longa, ws_larga, itens=ITENS, instrumento=INSTRUMENTO_PADRAO):
+    """Lê a aba longa inteira e grava o equivalente em layout largo. Retorna o nº de envios."""
+    garantir_cabecalho_largo(ws_larga, itens)
+    linhas = converter_longo_para_largo(ws_longa.get_all_values(), itens, instrumento)
+    if linhas:
+        ws_larga.append_rows(linhas, value_input_option="USER_ENTERED")
+    return len(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra a aba de respostas do layout longo para o largo.")
+    parser.add_argument("credenciais", help="Arquivo JSON da conta de serviço do Google.")
+    parser.add_argument("--planilha", default="Respostas Formularios")
+    parser.add_argument("--origem", default=ABA_LONGA)
+    parser.add_argument("--instrumento", default=INSTRUMENTO_PADRAO)
+    parser.add_argument("--destino", help="Aba larga de destino (padrão: a do instrumento).")
+    args = parser.parse_args()
+
+    import gspread
+
+    from itens import carregar_instrumento
+
+    args.destino = args.destino or aba_larga(args.instrumento)
+    itens = carregar_instrumento(args.instrumento).itens
+    planilha = gspread.service_account(filename=args.credenciais).open(args.planilha)
+    total = migrar_aba(planilha.worksheet(args.origem), planilha.worksheet(args.destino),
+                       itens, args.instrumento)
+    print(f"{total} envios migrados de '{args.origem}' para '{args.destino}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 # avaliacao_organizacional_final.py
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import gspread
-import matplotlib.pyplot as plt
 import urllib.parse
 import hmac
 import hashlib
+import os
+import secrets
+import uuid
+from cliente_planilhas import ClientePlanilhas, abrir_planilha_google
+from fila_envio import FilaEnvio, CAMINHO_SPOOL_PADRAO
+from metricas import FORMATO_PROMETHEUS, CapturaPerfil, Metricas, perfil_autorizado
+from rascunhos import (
+    CAMINHO_RASCUNHOS_PADRAO, TTL_PADRAO, ArmazemRascunhos, codificar, codigo_resposta, decodificar,
+)
+from itens import INSTRUMENTO_PADRAO, InstrumentoInvalido, carregar_instrumento
+from relatorio import MotorRelatorio, CAMINHO_RELATORIO_PADRAO
+from armazenamento import (
+    ABA_LONGA, FORMATO_LARGO, FORMATO_LONGO, aba_larga, eh_aba_larga,
+    garantir_cabecalho_largo, instrumento_da_aba, linha_larga, linhas_longas,
+)
 
 # --- PALETA DE CORES E CONFIGURAÇÃO DA PÁGINA ---
 COLOR_PRIMARY = "#70D1C6"
@@ -18,7 +30,43 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- INSTRUMENTAÇÃO (TEMPOS POR SEÇÃO E PERFIL SOB DEMANDA, VER metricas.py) ---
+@st.cache_resource
+def obter_metricas():
+    """Histogramas do processo, compartilhados pelas sessões, pelo cliente e pela fila.
+
+    A exportação periódica roda em uma thread própria: reruns de fragmento e a
+    descarga do spool também são exportados, não só execuções completas.
+    """
+    return Metricas(
+        caminho=st.secrets.get("METRICAS_PATH"),
+        formato=st.secrets.get("METRICAS_FORMATO", FORMATO_PROMETHEUS),
+        ativo=st.secrets.get("METRICAS_ATIVAS", True),
+    ).iniciar()
+
+metricas = obter_metricas()
+cronometro_execucao = metricas.cronometro("execucao")
+
+# Perfil cProfile da execução apenas com link de administrador (perfil=<exp>&perfil_sig=<hmac>)
+captura_perfil = None
+if "perfil" in st.query_params and perfil_autorizado(
+    st.secrets.get("PERFIL_SECRET_KEY"), st.query_params.get("perfil"), st.query_params.get("perfil_sig")
+):
+    captura_perfil = CapturaPerfil().iniciar()
+
+def finalizar_execucao():
+    """Fecha a medição da execução (e o perfil, se ativo) e exporta as métricas no intervalo."""
+    cronometro_execucao.parar()
+    if captura_perfil is not None:
+        resumo, caminho = captura_perfil.encerrar(st.secrets.get("PERFIL_PATH", "perfis"))
+        with st.expander("Perfil da execução (cProfile)"):
+            if caminho:
+                st.caption(f"Gravado em {caminho}")
+            st.code(resumo)
+    metricas.exportar_se_vencido()
+
 # --- CSS CUSTOMIZADO (Omitido para economizar espaço) ---
+cronometro_css = metricas.cronometro("css")
 st.markdown(f"""<style><style>
         /* Remoção de elementos do Streamlit Cloud */
         div[data-testid="stHeader"], div[data-testid="stDecoration"] {{
@@ -80,104 +128,296 @@ st.markdown(f"""<style><style>
             background-color: {COLOR_TEXT_DARK}; color: white;
         }}
     </style>""", unsafe_allow_html=True)
+cronometro_css.parar()
 
-# --- CONEXÃO COM GOOGLE SHEETS (COM CACHE) ---
+# --- CONEXÃO COM GOOGLE SHEETS (CLIENTE RESILIENTE, VER cliente_planilhas.py) ---
 @st.cache_resource
-def connect_to_gsheet():
-    """Conecta ao Google Sheets e retorna o objeto da aba de respostas."""
-    try:
-        creds_dict = dict(st.secrets["google_credentials"])
-        creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
-        
-        gc = gspread.service_account_from_dict(creds_dict)
-        spreadsheet = gc.open("Respostas Formularios")
-        
-        # Retorna apenas a aba principal
-        return spreadsheet.worksheet("Organizacional")
-    except Exception as e:
-        st.error(f"Erro ao conectar com o Google Sheets: {e}")
-        return None
+def obter_cliente_planilhas():
+    """Cliente único do processo; a conexão só é aberta na primeira chamada à planilha."""
+    creds_dict = dict(st.secrets.get("google_credentials", {}))
 
-ws_respostas = connect_to_gsheet()
+    def abrir_planilha():
+        # Credenciais ausentes/inválidas só falham na conexão, sem travar a renderização
+        creds = dict(creds_dict)
+        creds['private_key'] = creds['private_key'].replace('\\n', '\n')
+        return abrir_planilha_google(creds, "Respostas Formularios")
 
-if ws_respostas is None:
-    st.error("Não foi possível conectar à aba 'Organizacional' da planilha. Verifique o nome e as permissões.")
-    st.stop()
+    return ClientePlanilhas(abrir_planilha, metricas=obter_metricas())
+
+def abrir_aba(cliente, nome_aba):
+    """Proxy da aba no cliente; a aba larga tem o cabeçalho validado na (re)conexão."""
+    preparar = None
+    if eh_aba_larga(nome_aba):
+        itens = carregar_instrumento(instrumento_da_aba(nome_aba)).itens
+        preparar = lambda ws: garantir_cabecalho_largo(ws, itens)
+    return cliente.aba(nome_aba, preparar=preparar)
+
+def connect_to_gsheet(nome_aba=ABA_LONGA):
+    """Retorna a aba informada (proxy preguiçoso com reconexão e backoff)."""
+    return abrir_aba(obter_cliente_planilhas(), nome_aba)
+
+# Layout de gravação: "longo" (uma linha por item) ou "largo" (uma linha por envio)
+FORMATO_GRAVACAO = st.secrets.get("FORMATO_GRAVACAO", FORMATO_LONGO)
+
+# --- FILA DE ENVIO (SPOOL LOCAL + DESCARGA EM LOTES) ---
+# Modo multiprocesso: várias réplicas na mesma máquina podem compartilhar SPOOL_PATH,
+# RASCUNHOS_PATH e RELATORIO_PATH; só um processo eleito descarrega o spool para a
+# planilha (ver fila_envio.py e benchmarks/multiprocesso.py). METRICAS_PATH não é
+# compartilhado: use "{pid}" no caminho para um arquivo por réplica.
+@st.cache_resource
+def obter_fila_envio():
+    """Cria a fila de envio única do processo e inicia a thread descarregadora."""
+    caminho = st.secrets.get("SPOOL_PATH", CAMINHO_SPOOL_PADRAO)
+    # O cliente é resolvido aqui, na thread do script: a thread da fila não lê st.secrets
+    cliente = obter_cliente_planilhas()
+    return FilaEnvio(
+        lambda nome_aba: abrir_aba(cliente, nome_aba), caminho=caminho, metricas=obter_metricas()
+    ).iniciar()
+
+fila_envio = obter_fila_envio()
+
+# --- RASCUNHOS (RETOMADA DO QUESTIONÁRIO APÓS QUEDA, VER rascunhos.py) ---
+@st.cache_resource
+def obter_armazem_rascunhos():
+    """Armazém de rascunhos único do processo, com a thread de gravação adiada."""
+    caminho = st.secrets.get("RASCUNHOS_PATH", CAMINHO_RASCUNHOS_PADRAO)
+    ttl = float(st.secrets.get("RASCUNHOS_TTL_HORAS", TTL_PADRAO / 3600)) * 3600
+    return ArmazemRascunhos(caminho, ttl=ttl).iniciar()
+
+armazem_rascunhos = obter_armazem_rascunhos()
+
+# O token de retomada fica em um cookie deste navegador, nunca na URL: o link
+# pode ser compartilhado e não deve levar as respostas de outra pessoa
+COOKIE_RASCUNHO = "avaliacao_rascunho"
+
+def token_navegador():
+    """Token de retomada do navegador; na primeira visita, cria o token e grava o cookie."""
+    token = st.context.cookies.get(COOKIE_RASCUNHO)
+    if not token:
+        token = secrets.token_urlsafe(16)
+        segura = "; Secure" if (st.context.url or "").startswith("https:") else ""
+        st.html(
+            f"<script>document.cookie = '{COOKIE_RASCUNHO}={token}; max-age={int(armazem_rascunhos.ttl)}; "
+            f"path=/; SameSite=Strict{segura}';</script>",
+            unsafe_allow_javascript=True,
+        )
+    return token
+
+def chave_rascunho(token, instrumento):
+    """Chave do rascunho: um por navegador, link assinado e instrumento."""
+    chave = f"{token}|{st.query_params.get('sig', '')}|{instrumento.chave}"
+    return hashlib.sha256(chave.encode("utf-8")).hexdigest()
 
 
 # --- CABEÇALHO DA APLICAÇÃO ---
-col1, col2 = st.columns([1, 4])
-with col1:
-    try:
-        st.image("logo_wedja.jpg", width=120)
-    except FileNotFoundError:
-        st.warning("Logo 'logo_wedja.jpg' não encontrada.")
-with col2:
-    st.markdown(f"""
-    <div style="display: flex; flex-direction: column; justify-content: center; height: 100%;">
-        <h1 style='color: {COLOR_TEXT_DARK}; margin: 0; padding: 0;'>Inventário Organizacional</h1>
-        <h3 style='color: {COLOR_TEXT_DARK}; margin: 0; padding: 0;'>Cultura e Prática</h3>
-    </div>
-    """, unsafe_allow_html=True)
+with metricas.cronometro("cabecalho"):
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        try:
+            st.image("logo_wedja.jpg", width=120)
+        except FileNotFoundError:
+            st.warning("Logo 'logo_wedja.jpg' não encontrada.")
+    with col2:
+        st.markdown(f"""
+        <div style="display: flex; flex-direction: column; justify-content: center; height: 100%;">
+            <h1 style='color: {COLOR_TEXT_DARK}; margin: 0; padding: 0;'>Inventário Organizacional</h1>
+            <h3 style='color: {COLOR_TEXT_DARK}; margin: 0; padding: 0;'>Cultura e Prática</h3>
+        </div>
+        """, unsafe_allow_html=True)
 
 
 # --- SEÇÃO DE IDENTIFICAÇÃO ---
-with st.container(border=True):
-        # --- Lógica de Verificação da URL ---
+# --- Lógica de Verificação da URL ---
+def verificar_link(escopo=None):
+    """Valida a assinatura e a validade do link. Retorna (link_valido, org_coletora, erro, instrumento).
+
+    Com `escopo` (ex.: "relatorio"), a assinatura deve cobrir org|exp|escopo e o
+    acesso direto sem parâmetros não é permitido. O parâmetro opcional `inst`
+    escolhe a versão do banco de itens e, quando presente, entra na assinatura
+    (org|exp|inst[|escopo]); links sem `inst` usam o instrumento padrão.
+    """
     org_coletora_valida = "Instituto Wedja de Socionomia" # Valor padrão seguro
-    link_valido = False # Começa como inválido por padrão
-
-try:
-    query_params = st.query_params
-    org_encoded_from_url = query_params.get("org")
-    exp_from_url = query_params.get("exp") # Parâmetro de expiração
-    sig_from_url = query_params.get("sig") # Parâmetro de assinatura
-    
-    # 1. Verifica se todos os parâmetros de segurança existem
-    if org_encoded_from_url and exp_from_url and sig_from_url:
-        org_decoded = urllib.parse.unquote(org_encoded_from_url)
-        
-        # 2. Recalcula a assinatura (com base na org + exp)
-        secret_key = st.secrets["LINK_SECRET_KEY"].encode('utf-8')
-        message = f"{org_decoded}|{exp_from_url}".encode('utf-8')
-        calculated_sig = hmac.new(secret_key, message, hashlib.sha256).hexdigest()
-        
-        # 3. Compara as assinaturas
-        if hmac.compare_digest(calculated_sig, sig_from_url):
+    instrumento = INSTRUMENTO_PADRAO
+    try:
+        query_params = st.query_params
+        org_encoded_from_url = query_params.get("org")
+        exp_from_url = query_params.get("exp") # Parâmetro de expiração
+        sig_from_url = query_params.get("sig") # Parâmetro de assinatura
+        inst_from_url = query_params.get("inst") # Versão do instrumento (opcional)
+
+        # 1. Verifica se todos os parâmetros de segurança existem
+        if org_encoded_from_url and exp_from_url and sig_from_url:
+            org_decoded = urllib.parse.unquote(org_encoded_from_url)
+
+            # 2. Recalcula a assinatura (com base na org + exp [+ inst] [+ escopo])
+            secret_key = st.secrets["LINK_SECRET_KEY"].encode('utf-8')
+            message = f"{org_decoded}|{exp_from_url}"
+            if inst_from_url:
+                message += f"|{inst_from_url}"
+            if escopo:
+                message += f"|{escopo}"
+            message = message.encode('utf-8')
+            calculated_sig = hmac.new(secret_key, message, hashlib.sha256).hexdigest()
+
+            # 3. Compara as assinaturas
+            if not hmac.compare_digest(calculated_sig, sig_from_url):
+                # FALHA: Assinatura não bate, link adulterado
+                return False, org_coletora_valida, "Link inválido ou adulterado.", instrumento
+
             # Assinatura OK! Agora verifica a data de validade
-            timestamp_validade = int(exp_from_url)
-            timestamp_atual = int(datetime.now().timestamp())
-            
-            if timestamp_atual <= timestamp_validade:
-                # SUCESSO: Assinatura válida E dentro da data
-                link_valido = True
-                org_coletora_valida = org_decoded
-            else:
+            if int(datetime.now().timestamp()) > int(exp_from_url):
                 # FALHA: Link expirou
-                st.error("Link Expirado. Por favor, solicite um novo link.")
-        else:
-            # FALHA: Assinatura não bate, link adulterado
-            st.error("Link inválido ou adulterado.")
+                return False, org_coletora_valida, "Link Expirado. Por favor, solicite um novo link.", instrumento
+
+            # Assinatura e validade OK; o instrumento do link precisa existir
+            if inst_from_url:
+                instrumento = carregar_instrumento(inst_from_url).chave
+
+            # SUCESSO: Assinatura válida E dentro da data
+            return True, org_decoded, None, instrumento
+
+        # Se nenhum parâmetro for passado (acesso direto), permite o uso com valor padrão
+        if not (org_encoded_from_url or exp_from_url or sig_from_url) and not escopo:
+            return True, org_coletora_valida, None, instrumento
+        return False, org_coletora_valida, "Link inválido. Faltando parâmetros de segurança.", instrumento
+
+    except KeyError:
+        return False, org_coletora_valida, "ERRO DE CONFIGURAÇÃO: O app não pôde verificar a segurança do link. Contate o administrador.", instrumento
+    except InstrumentoInvalido as e:
+        return False, org_coletora_valida, f"Questionário indisponível: {e}", instrumento
+    except Exception as e:
+        return False, org_coletora_valida, f"Erro ao processar o link: {e}", instrumento
+
+def calcular_id_organizacao(nome_organizacao):
+    """ID curto e estável da organização (md5 do nome normalizado)."""
+    nome_limpo = nome_organizacao.strip().upper()
+    return hashlib.md5(nome_limpo.encode('utf-8')).hexdigest()[:8].upper()
+
+# --- MODO RELATÓRIO (link assinado com modo=relatorio) ---
+@st.cache_resource(max_entries=8)
+def obter_motor_relatorio(chave_instrumento, revisao):
+    """Motor de agregação único por instrumento (agregados e marca d'água em SQLite).
+
+    `revisao` (mtime do arquivo do instrumento) entra na chave do cache: quando
+    o arquivo muda, um novo motor é criado com os itens recompilados.
+    """
+    caminho = st.secrets.get("RELATORIO_PATH", CAMINHO_RELATORIO_PADRAO)
+    if chave_instrumento != INSTRUMENTO_PADRAO:
+        raiz, extensao = os.path.splitext(caminho)
+        caminho = f"{raiz}_{chave_instrumento}{extensao}"
+    itens = carregar_instrumento(chave_instrumento).itens
+    return MotorRelatorio(caminho, itens=itens, instrumento=chave_instrumento)
+
+def renderizar_relatorio(org, chave_instrumento=INSTRUMENTO_PADRAO):
+    """Atualiza os agregados com as linhas novas e exibe o relatório da organização."""
+    instrumento = carregar_instrumento(chave_instrumento)
+    motor = obter_motor_relatorio(instrumento.chave, instrumento.revisao)
+    aba = aba_larga(chave_instrumento) if FORMATO_GRAVACAO == FORMATO_LARGO else ABA_LONGA
+    try:
+        with st.spinner("Atualizando resultados..."):
+            motor.atualizar(connect_to_gsheet(aba))
+    except Exception as e:
+        st.warning(f"Não foi possível ler respostas novas; exibindo os últimos resultados. ({e})")
+
+    id_organizacao = calcular_id_organizacao(org)
+    info = next((o for o in motor.organizacoes() if o["id_organizacao"] == id_organizacao), None)
+    st.subheader(f"Relatório — {org}")
+    if info is None:
+        st.info("Ainda não há respostas para esta organização.")
+        return
+    col_envios, col_ultimo = st.columns(2)
+    col_envios.metric("Respostas recebidas", info["envios"])
+    col_ultimo.metric("Última resposta", info["ultimo_timestamp"] or "-")
+    st.image(motor.grafico(id_organizacao))
+    st.dataframe([
+        {"Bloco": r["bloco"], "N": r["n"], "Média": r["media"], "Desvio": r["desvio"],
+         **{f"Nota {p}": q for p, q in r["distribuicao"].items()}}
+        for r in motor.resumo(id_organizacao)
+    ], hide_index=True)
+
+    with st.expander("Análise psicométrica (alfa de Cronbach, correlação item-total, N/A, piso/teto)"):
+        import psicometria
+        analise = psicometria.analisar(
+            motor.matriz(id_organizacao), motor.itens,
+            versao=(motor.instrumento, id_organizacao, info["versao"]),
+        )
+        st.dataframe(analise["blocos"], hide_index=True)
+        st.dataframe(analise["itens"], hide_index=True)
+
+if st.query_params.get("modo") == "relatorio":
+    if 'verificacao_relatorio' not in st.session_state:
+        with metricas.cronometro("verificacao_link"):
+            st.session_state.verificacao_relatorio = verificar_link("relatorio")
+    relatorio_valido, org_relatorio, erro_relatorio, instrumento_relatorio = st.session_state.verificacao_relatorio
+    if not relatorio_valido:
+        st.error(erro_relatorio or "Link de relatório inválido.")
     else:
-         # Se nenhum parâmetro for passado (acesso direto), permite o uso com valor padrão
-         if not (org_encoded_from_url or exp_from_url or sig_from_url):
-             link_valido = True
-         else:
-             st.error("Link inválido. Faltando parâmetros de segurança.")
-
-except KeyError:
-     st.error("ERRO DE CONFIGURAÇÃO: O app não pôde verificar a segurança do link. Contate o administrador.")
-     link_valido = False
-except Exception as e:
-    st.error(f"Erro ao processar o link: {e}")
-    link_valido = False
+        with metricas.cronometro("relatorio"):
+            renderizar_relatorio(org_relatorio, instrumento_relatorio)
+    finalizar_execucao()
+    st.stop()
+
+# A verificação (query params + HMAC) roda uma única vez por sessão
+if 'verificacao_link' not in st.session_state:
+    with metricas.cronometro("verificacao_link"):
+        st.session_state.verificacao_link = verificar_link()
+link_valido, org_coletora_valida, erro_link, chave_instrumento = st.session_state.verificacao_link
+if erro_link:
+    st.error(erro_link)
+
+# --- ESTADO DO QUESTIONÁRIO (NOVO OU RESTAURADO DO RASCUNHO) ---
+def resposta_valida(resposta):
+    return resposta is not None and resposta != "N/A"
+
+def iniciar_questionario(instrumento):
+    """Cria o estado da sessão; restaura o rascunho deste navegador, se houver (sem acessar o Sheets)."""
+    st.session_state.respostas = {}
+    st.session_state.respostas_validas = 0
+    # ID do envio desta sessão: a fila descarta reenvios com o mesmo ID
+    st.session_state.id_envio = uuid.uuid4().hex
+    st.session_state.envio_aceito = None  # None, "novo" ou "repetido"
+
+    token = chave_rascunho(token_navegador(), instrumento)
+    rascunho = armazem_rascunhos.carregar(token)
+    # Rascunho de um envio já aceito: começa um questionário novo, com outro ID
+    if rascunho and not (rascunho["id_envio"] and fila_envio.ja_aceito(rascunho["id_envio"])):
+        respostas = decodificar(rascunho["respostas"], instrumento)
+        for item_id, resposta in respostas.items():
+            st.session_state[f"radio_{item_id}"] = resposta
+        st.session_state.respostas = respostas
+        st.session_state.respostas_validas = sum(map(resposta_valida, respostas.values()))
+        st.session_state.input_respondente = rascunho["respondente"] or ""
+        st.session_state.id_envio = rascunho["id_envio"] or st.session_state.id_envio
+        st.session_state.rascunho_restaurado = True
+    st.session_state.token_rascunho = token
+    st.session_state.rascunho = bytearray(codificar(st.session_state.respostas, instrumento))
+
+def rascunho_atual():
+    return {
+        "link": st.query_params.get("sig", ""),
+        "instrumento": chave_instrumento,
+        "respostas": bytes(st.session_state.rascunho),
+        "respondente": st.session_state.get("input_respondente", ""),
+        "id_envio": st.session_state.id_envio,
+    }
+
+def agendar_rascunho():
+    """Agenda a gravação do rascunho (adiada; nada é gravado a cada clique)."""
+    if 'token_rascunho' in st.session_state:
+        armazem_rascunhos.agendar(st.session_state.token_rascunho, rascunho_atual())
+
+if link_valido:
+    # Instrumento compilado uma vez por processo (itens.py); blocos já agrupados em tuplas
+    instrumento = carregar_instrumento(chave_instrumento)
+    if 'respostas' not in st.session_state:
+        iniciar_questionario(instrumento)
 
 # Renderiza os campos de identificação
 with st.container(border=True):
     st.markdown("<h3 style='text-align: center;'>Identificação</h3>", unsafe_allow_html=True)
     col1_form, col2_form = st.columns(2)
     with col1_form:
-        respondente = st.text_input("Respondente:", key="input_respondente")
+        respondente = st.text_input("Respondente:", key="input_respondente", on_change=agendar_rascunho)
         data = st.text_input("Data:", datetime.now().strftime('%d/%m/%Y')) 
     with col2_form:
         # O campo agora usa o valor validado e está sempre desabilitado
@@ -190,6 +430,7 @@ with st.container(border=True):
 # --- BLOQUEIO DO FORMULÁRIO SE O LINK FOR INVÁLIDO ---
 if not link_valido:
     st.error("Acesso ao formulário bloqueado.")
+    finalizar_execucao()
     st.stop() # Para a execução, escondendo o questionário e o botão de envio
 else:
 # --- INSTRUÇÕES ---
@@ -203,177 +444,107 @@ else:
         )
 
 
-    # --- LÓGICA DO QUESTIONÁRIO (BACK-END) ---
-    @st.cache_data
-    def carregar_itens():
-        data = [
-            ('Cultura, Liderança e Rituais', 'CL01', 'As práticas diárias refletem o que a liderança diz e cobra.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL02', 'Processos críticos têm donos claros e rotina de revisão.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL03', 'A comunicação visual (quadros, murais, campanhas) reforça os valores da empresa.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL04', 'Reconhecimentos e premiações estão alinhados ao comportamento esperado.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL05', 'Feedbacks e aprendizados com erros ocorrem sem punição inadequada.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL06', 'Conflitos são tratados com respeito e foco em solução.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL07', 'Integridade e respeito orientam decisões, mesmo sob pressão.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL08', 'Não há tolerância a discriminação, assédio ou retaliação.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL09', 'Critérios de decisão são transparentes e consistentes.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL10', 'A empresa cumpre o que promete a pessoas e clientes.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL11', 'Acreditamos que segurança e saúde emocional são inegociáveis.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL12', 'Acreditamos que diversidade melhora resultados.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL13', 'Há rituais de reconhecimento (semanal/mensal) que celebram comportamentos-chave.', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL14', 'Reuniões de resultado incluem aprendizados (o que manter, o que ajustar).', 'NÃO'),
-            ('Cultura, Liderança e Rituais', 'CL15', 'Políticas internas são conhecidas e aplicadas (não ficam só no papel).', 'NÃO'),
-            ('Comunicação e Ambiente', 'CA01', 'Sistemas suportam o trabalho (não criam retrabalho ou gargalos).', 'NÃO'),
-            ('Comunicação e Ambiente', 'CA02', 'Indicadores de pessoas e segurança são acompanhados periodicamente.', 'NÃO'),
-            ('Comunicação e Ambiente', 'CA03', 'A linguagem interna é respeitosa e inclusiva.', 'NÃO'),
-            ('Comunicação e Ambiente', 'CA04', 'Termos e siglas são explicados para evitar exclusão.', 'NÃO'),
-            ('Comunicação e Ambiente', 'CA05', 'A comunicação interna é clara e no tempo certo.', 'NÃO'),
-            ('Comunicação e Ambiente', 'CA06', 'Metas e resultados são divulgados com clareza.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP01', 'Sinto segurança psicológica para expor opiniões e erros.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP02', 'Consigo equilibrar trabalho e vida pessoal.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP03', 'Práticas de contratação e promoção são justas e inclusivas.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP04', 'A empresa promove ambientes livres de assédio e discriminação.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP05', 'Tenho acesso a ações de saúde/apoio emocional quando preciso.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP06', 'Carga de trabalho é ajustada para prevenir sobrecarga crônica.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP07', 'Recebo treinamentos relevantes ao meu perfil de risco e função.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP08', 'Tenho oportunidades reais de desenvolvimento profissional.', 'NÃO'),
-            ('Segurança Psicológica e Bem-estar', 'SP09', 'Sou ouvido(a) nas decisões que afetam meu trabalho.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR01', 'Existe canal de denúncia acessível e confiável.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR02', 'Conheço o Código de Ética e como reportar condutas impróprias.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR03', 'Sinto confiança nos processos de investigação e resposta a denúncias.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR04', 'Há prestação de contas sobre planos e ações corretivas.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR05', 'Riscos relevantes são identificados e acompanhados regularmente.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR06', 'Controles internos funcionam e são revisados quando necessário.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR07', 'Inventário de riscos e planos de ação (PGR) estão atualizados e acessíveis.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR08', 'Mudanças de processo passam por avaliação de risco antes da implantação.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR09', 'O canal de denúncia é acessível e protege contra retaliações.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR10', 'Sinto que denúncias geram ações efetivas.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR11', 'Tenho meios simples para reportar incidentes/quase-acidentes e perigos.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR12', 'No meu posto, riscos são avaliados considerando exposição e severidade x probabilidade.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR13', 'A empresa prioriza eliminar/substituir riscos antes de recorrer ao EPI.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR14', 'Recebo treinamento quando há mudanças de função/processo/equipamentos.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR15', 'Há inspeções/observações de segurança com frequência adequada.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR16', 'Sinalização e procedimentos são claros e atualizados.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR17', 'Sou convidado(a) a participar das discussões de riscos e soluções.', 'NÃO'),
-            ('Governança, Riscos e Controles', 'GR18', 'Planos de emergência são conhecidos e incidentes são investigados com ações corretivas.', 'NÃO'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR01', 'No meu ambiente há piadas, constrangimentos ou condutas indesejadas.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR02', 'Tenho receio de represálias ao reportar assédio ou condutas impróprias.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR03', 'Conflitos entre áreas/pessoas permanecem sem solução por muito tempo.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR04', 'Falta respeito nas interações do dia a dia.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR05', 'Falta de informações atrapalha minha entrega.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR06', 'Mensagens importantes chegam tarde ou de forma confusa.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR07', 'Trabalho frequentemente isolado sem suporte adequado.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR08', 'Em teletrabalho me sinto desconectado(a) da equipe.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR09', 'A sobrecarga e prazos incompatíveis são frequentes.', 'SIM'),
-            ('Fatores de Risco Psicossocial (Reversos)', 'FR10', 'As expectativas de produtividade são irreais no meu contexto.', 'SIM'),
-        ]
-        df = pd.DataFrame(data, columns=["Bloco", "ID", "Item", "Reverso"])
-        return df
-
     # --- INICIALIZAÇÃO E FORMULÁRIO DINÂMICO ---
-    df_itens = carregar_itens()
-    if 'respostas' not in st.session_state:
-        st.session_state.respostas = {}
+    blocos = instrumento.blocos
+    total_perguntas = len(instrumento)
+    limite_respostas = total_perguntas / 2
+    if st.session_state.pop("rascunho_restaurado", False):
+        st.info("Suas respostas anteriores foram restauradas.")
 
-    st.subheader("Questionário")
-    blocos = df_itens["Bloco"].unique().tolist()
     def registrar_resposta(item_id, key):
-        st.session_state.respostas[item_id] = st.session_state[key]
-
-    for bloco in blocos:
-        df_bloco = df_itens[df_itens["Bloco"] == bloco]
-        prefixo_bloco = df_bloco['ID'].iloc[0][:2] if not df_bloco.empty else bloco
-        
-        with st.expander(f"{prefixo_bloco}", expanded=bloco == blocos[0]):
-            for _, row in df_bloco.iterrows():
-                item_id = row["ID"]
-                label = f'({item_id}) {row["Item"]}'
+        # Atualiza o contador de respostas válidas e o rascunho (1 byte) de forma incremental
+        with metricas.cronometro("contagem"):
+            anterior = st.session_state.respostas.get(item_id)
+            nova = st.session_state[key]
+            st.session_state.respostas[item_id] = nova
+            st.session_state.respostas_validas += resposta_valida(nova) - resposta_valida(anterior)
+            st.session_state.rascunho[instrumento.indice[item_id]] = codigo_resposta(nova)
+            agendar_rascunho()
+
+    @st.fragment
+    def renderizar_bloco(prefixo_bloco, itens_bloco, expandido):
+        """Renderiza um bloco como fragmento: um clique reexecuta apenas este bloco."""
+        with metricas.cronometro("bloco"), st.expander(f"{prefixo_bloco}", expanded=expandido):
+            for item_id, label in itens_bloco:
                 widget_key = f"radio_{item_id}"
                 st.radio(
                     label, options=["N/A", 1, 2, 3, 4, 5],
                     horizontal=True, key=widget_key,
                     on_change=registrar_resposta, args=(item_id, widget_key)
                 )
+            st.caption(f"{st.session_state.respostas_validas}/{total_perguntas} respostas válidas no questionário")
+        # Só reexecuta o app inteiro quando o botão de envio precisa mudar de estado
+        liberado = st.session_state.respostas_validas >= limite_respostas
+        if liberado != st.session_state.get("envio_liberado"):
+            st.rerun()
 
-    # --- VALIDAÇÃO E BOTÃO DE FINALIZAR (MOVIDO PARA O FINAL) ---
-    # Calcula o número de respostas válidas (excluindo N/A)
-    respostas_validas_contadas = 0
-    if 'respostas' in st.session_state:
-        for resposta in st.session_state.respostas.values():
-            if resposta is not None and resposta != "N/A":
-                respostas_validas_contadas += 1
-
-    total_perguntas = len(df_itens)
-    limite_respostas = total_perguntas / 2
+    # --- VALIDAÇÃO DO ENVIO (contador mantido por registrar_resposta) ---
+    respostas_validas_contadas = st.session_state.respostas_validas
 
     # Determina se o botão deve ser desabilitado
     botao_desabilitado = respostas_validas_contadas < limite_respostas
+    st.session_state.envio_liberado = not botao_desabilitado
 
+    st.subheader("Questionário")
+    with metricas.cronometro("questionario"):
+        for bloco, prefixo_bloco, itens_bloco in blocos:
+            renderizar_bloco(prefixo_bloco, itens_bloco, bloco == blocos[0][0])
+
+    # --- BOTÃO DE FINALIZAR (MOVIDO PARA O FINAL) ---
     # Exibe aviso se o botão estiver desabilitado
     if botao_desabilitado:
         st.warning(f"Responda 50% das perguntas (excluindo 'N/A') para habilitar o envio. ({respostas_validas_contadas}/{total_perguntas} válidas)")
 
-    # Botão Finalizar com estado dinâmico (habilitado/desabilitado)
-    if st.button("Finalizar e Enviar Respostas", type="primary", disabled=botao_desabilitado):
+    # Botão Finalizar com estado dinâmico; travado depois que o envio é aceito
+    envio_aceito = st.session_state.envio_aceito
+    if st.button("Finalizar e Enviar Respostas", type="primary",
+                 disabled=botao_desabilitado or envio_aceito is not None) and envio_aceito is None:
             st.subheader("Enviando Respostas...")
 
-            # --- LÓGICA DE CÁLCULO ---
-            respostas_list = []
-            for index, row in df_itens.iterrows():
-                item_id = row['ID']
-                resposta_usuario = st.session_state.respostas.get(item_id)
-                respostas_list.append({
-                    "Bloco": row["Bloco"],
-                    "Item": row["Item"],
-                    "Resposta": resposta_usuario,
-                    "Reverso": row["Reverso"]
-                })
-            dfr = pd.DataFrame(respostas_list)
-        
-            with st.spinner("Enviando dados para a planilha..."):
+            with metricas.cronometro("envio"), st.spinner("Registrando suas respostas..."):
                 try:
                     timestamp_str = datetime.now().isoformat(timespec="seconds")
 
-                    nome_limpo = organizacao_coletora.strip().upper()
-                    id_organizacao = hashlib.md5(nome_limpo.encode('utf-8')).hexdigest()[:8].upper()
+                    id_organizacao = calcular_id_organizacao(organizacao_coletora)
 
-                    respostas_para_enviar = []
-                    
-                    for _, row in dfr.iterrows():
-                        resposta = row["Resposta"]
-                        pontuacao = "N/A" # Valor padrão se for N/A ou None
-                    
-                        if pd.notna(resposta) and resposta != "N/A":
-                            try:
-                                valor = int(resposta)
-                                if row["Reverso"] == "SIM":
-                                    pontuacao = 6 - valor # Inverte: 1->5, 2->4, etc.
-                                else:
-                                    pontuacao = valor # Normal
-                            except ValueError:
-                                pass
-
-                        respostas_para_enviar.append([
-                            timestamp_str,
-                            id_organizacao,
-                            respondente,
-                            data,
-                            org_coletora_valida,
-                            row["Bloco"],
-                            row["Item"],
-                            row["Resposta"] if pd.notna(row["Resposta"]) else "N/A",
-                            pontuacao
-                        ])
-                    
-                    ws_respostas.append_rows(respostas_para_enviar, value_input_option='USER_ENTERED')
+                    # --- LÓGICA DE CÁLCULO (vetorizada, ver pontuacao.py) ---
+                    # Importado só no envio: NumPy fica fora da primeira renderização
+                    import pontuacao
+                    itens_pontuados = pontuacao.itens_pontuados(st.session_state.respostas, instrumento.itens)
+
+                    # Cada envio registra a versão do instrumento respondido e o seu ID
+                    metadados = [timestamp_str, id_organizacao, respondente, data, org_coletora_valida]
+                    id_envio = st.session_state.id_envio
+                    if FORMATO_GRAVACAO == FORMATO_LARGO:
+                        aba_destino = aba_larga(instrumento.chave)
+                        respostas_para_enviar = [linha_larga(
+                            metadados, itens_pontuados, instrumento.itens, instrumento.chave, id_envio
+                        )]
+                    else:
+                        aba_destino = ABA_LONGA
+                        respostas_para_enviar = linhas_longas(
+                            metadados, itens_pontuados, instrumento.chave, id_envio
+                        )
                     
-                    st.success("Suas respostas foram enviadas com sucesso!")
-                    st.balloons()
+                    # Grava no spool local (idempotente pelo ID da sessão); a thread da fila
+                    # envia em lote para a planilha
+                    id_spool = fila_envio.enfileirar(aba_destino, respostas_para_enviar, id_envio)
+                    st.session_state.envio_aceito = "repetido" if id_spool is None else "novo"
+                    metricas.contar("envios", resultado=st.session_state.envio_aceito)
+                    # O rascunho fica com o ID do envio: reabrir o link começa um questionário novo
+                    armazem_rascunhos.salvar(st.session_state.token_rascunho, rascunho_atual())
                 except Exception as e:
-                    st.error(f"Erro ao enviar dados para a planilha: {e}")
-
-with st.empty():
-    st.markdown('<div id="autoclick-div">', unsafe_allow_html=True)
-    if st.button("Ping Button", key="autoclick_button"):
-    # A ação aqui pode ser um simples print no log do Streamlit
-        print("Ping button clicked by automation.")
-    st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+                    st.error(f"Erro ao registrar as respostas: {e}")
+            if st.session_state.envio_aceito is not None:
+                st.session_state.comemorar = True
+                finalizar_execucao()
+                st.rerun()  # Reexecuta para exibir o botão travado
+
+    if envio_aceito is not None:
+        st.success("Suas respostas foram enviadas com sucesso!")
+        if envio_aceito == "repetido":
+            st.info("Este envio já havia sido registrado; as respostas não foram gravadas novamente.")
+        if st.session_state.pop("comemorar", False):
+            st.balloons()
+
+finalizar_execucao()
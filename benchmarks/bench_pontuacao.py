@@ -0,0 +1,97 @@
+# benchmarks/bench_pontuacao.py
+"""Compara a pontuação vetorizada (pontuacao.py) com o laço iterrows original.
+
+Uso: python benchmarks/bench_pontuacao.py [--envios 100000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import pontuacao
+from itens import ITENS, COLUNAS_ITENS
+
+OPCOES = ["N/A", 1, 2, 3, 4, 5]
+
+
+def pontuar_laco_original(df_itens, respostas):
+    """Reprodução do cálculo original do envio (dois laços iterrows)."""
+    respostas_list = []
+    for _, row in df_itens.iterrows():
+        respostas_list.append({
+            "Bloco": row["Bloco"],
+            "Item": row["Item"],
+            "Resposta": respostas.get(row["ID"]),
+            "Reverso": row["Reverso"],
+        })
+    dfr = pd.DataFrame(respostas_list)
+    saida = []
+    for _, row in dfr.iterrows():
+        resposta = row["Resposta"]
+        pontos = "N/A"
+        if pd.notna(resposta) and resposta != "N/A":
+            try:
+                valor = int(resposta)
+                pontos = 6 - valor if row["Reverso"] == "SIM" else valor
+            except ValueError:
+                pass
+        saida.append(pontos)
+    return saida
+
+
+def cronometrar(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--envios", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    ids = [item_id for _, item_id, _, _ in ITENS]
+    respostas = {item_id: rng.choice(OPCOES) for item_id in ids}
+    df_itens = pd.DataFrame(ITENS, columns=COLUNAS_ITENS)
+
+    # Conferência: os dois caminhos produzem a mesma pontuação
+    esperado = pontuar_laco_original(df_itens, respostas)
+    obtido = [p for *_, p in pontuacao.itens_pontuados(respostas)]
+    assert esperado == obtido, "pontuação vetorizada diverge do laço original"
+
+    t_laco = cronometrar(lambda: pontuar_laco_original(df_itens, respostas), args.repeticoes)
+    t_vetor = cronometrar(lambda: pontuacao.itens_pontuados(respostas), args.repeticoes)
+    print(f"1 respondente  | laço iterrows: {t_laco * 1e6:10.1f} µs | vetorizado: {t_vetor * 1e6:8.1f} µs"
+          f" | {t_laco / t_vetor:6.1f}x")
+
+    # Lote: envios {ID: resposta} com ~10% de N/A, como no caminho de envio
+    gerador = np.random.default_rng(42)
+    codigos = gerador.integers(0, len(OPCOES), size=(args.envios, len(ids)))
+    envios = [{item_id: OPCOES[c] for item_id, c in zip(ids, linha)} for linha in codigos.tolist()]
+    inicio = time.perf_counter()
+    pontos = pontuacao.pontuar_lote(envios)
+    medias = pontuacao.medias_por_bloco(pontos)
+    t_lote = time.perf_counter() - inicio
+    print(f"{args.envios} envios | vetorizado (matriz de respostas + pontuação + médias por bloco): "
+          f"{t_lote:.3f} s | estimativa do laço: {t_laco * args.envios:.0f} s")
+    assert medias.shape == (args.envios, len(set(b for b, _, _, _ in ITENS)))
+
+    # Repontuação histórica: colunas de resposta do layout largo, como texto
+    brutas = np.array(OPCOES, dtype=object)[codigos].astype(str)
+    inicio = time.perf_counter()
+    pontuacao.repontuar_largo(brutas)
+    print(f"{args.envios} envios | repontuação das respostas gravadas (layout largo): "
+          f"{time.perf_counter() - inicio:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# benchmarks/carga.py
+"""Teste de carga do modo multiprocesso: réplicas do app com sessões em sequência, sem rede.
+
+Mede o que várias réplicas (processos) atrás de um balanceador sustentam, não
+quantos respondentes simultâneos uma única instância atende. Cada respondente
+é uma sessão do AppTest do Streamlit que preenche os 58 itens (um rerun por
+clique) e envia. Sessões simultâneas no mesmo processo não são possíveis com
+o AppTest: ele troca estado global a cada run (Runtime._instance, st.secrets)
+e recompila o script, o que quebra com threads (SystemError do compilador,
+widgets ausentes). Por isso cada processo é uma réplica que roda as suas
+sessões uma após a outra, no modo multiprocesso: todas gravam no mesmo spool
+e só a líder descarrega. A conexão
+com o Google é trocada por uma PlanilhaFalsa em memória (planilha_falsa.py)
+por processo; `abrir_planilha_google` é substituído antes do primeiro run,
+então connect_to_gsheet e a fila passam a escrever na aba falsa, que pode
+injetar latência e erros 429. As chamadas e linhas são somadas entre os
+processos, o que equivale a uma única planilha compartilhada.
+
+O AppTest reexecuta o script inteiro a cada interação; não há reruns parciais
+de st.fragment. Portanto rerun_completo_p50/p99 mede reruns completos da
+página, um limite superior para o clique em um item, que no servidor
+reexecuta apenas o fragmento do bloco.
+
+Saída (JSON), junto do commit atual e de um indicador de alterações locais,
+para comparação entre versões:
+- rerun_completo_p50/p99_s e envio_*: latências por sessão, com as réplicas
+  disputando a CPU;
+- rss_pico_por_replica_mb: maior pico de RSS entre as réplicas;
+- rss_crescimento_por_sessao_sequencial_mb: crescimento do pico de RSS de uma
+  réplica dividido pelas sessões que ela rodou em sequência. Indica memória
+  retida entre sessões, não o custo de uma sessão aberta;
+- chamadas à API do Sheets por envio.
+
+Uso: python benchmarks/carga.py --respondentes 20 --replicas 5 \\
+         --latencia 0.3 --taxa-429 0.1 --saida carga.json
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import cliente_planilhas
+from fila_envio import FilaEnvio
+from itens import ITENS
+from planilha_falsa import PlanilhaFalsa
+
+APP = RAIZ / "avaliacao_organizacional.py"
+OPCOES = ["N/A", 1, 2, 3, 4, 5]
+ROTULO_ENVIO = "Finalizar e Enviar Respostas"
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _rss_mb():
+    """RSS de pico do processo em MB (ru_maxrss é KB no Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _git(*argumentos):
+    try:
+        return subprocess.run(["git", *argumentos], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _commit_atual():
+    """(commit curto, há alterações locais em arquivos versionados?) ou (None, None) fora do git."""
+    commit = _git("rev-parse", "--short", "HEAD")
+    if commit is None:
+        return None, None
+    return commit, bool(_git("status", "--porcelain", "--untracked-files=no"))
+
+
+def simular_respondente(numero, spool, timeout, semente, rascunhos):
+    """Preenche o questionário em uma sessão do AppTest e envia. Retorna as latências."""
+    from streamlit.testing.v1 import AppTest
+
+    aleatorio = random.Random(semente + numero)
+    app = AppTest.from_file(str(APP), default_timeout=timeout)
+    app.secrets["SPOOL_PATH"] = spool
+    app.secrets["RASCUNHOS_PATH"] = rascunhos
+    app.secrets["google_credentials"] = {"private_key": "falsa"}
+
+    inicio = time.perf_counter()
+    app.run()
+    primeira = time.perf_counter() - inicio
+
+    app.text_input(key="input_respondente").input(f"Respondente {numero}")
+    reruns = []
+    for _, item_id, _, _ in ITENS:
+        inicio = time.perf_counter()
+        app.radio(key=f"radio_{item_id}").set_value(aleatorio.choice(OPCOES[1:])).run()
+        reruns.append(time.perf_counter() - inicio)
+
+    botao = next(b for b in app.button if b.label == ROTULO_ENVIO)
+    inicio = time.perf_counter()
+    botao.click().run()
+    envio = time.perf_counter() - inicio
+    sucesso = any("sucesso" in s.value for s in app.success)
+    return {"primeira_renderizacao": primeira, "reruns": reruns, "envio": envio,
+            "sucesso": sucesso, "excecoes": [str(e.value) for e in app.exception]}
+
+
+def trabalhador(processo, numeros, spool, rascunhos, latencia, taxa_429, timeout, espera_descarga,
+                semente, barreira, resultados):
+    """Uma réplica: roda as sessões `numeros` em sequência, aguarda o spool esvaziar e devolve as medidas."""
+    importlib.import_module("streamlit.testing.v1")  # O RSS inicial já inclui o Streamlit
+
+    planilha = PlanilhaFalsa(latencia=latencia, taxa_429=taxa_429, semente=semente + processo)
+    # Toda conexão do app (cliente resiliente e fila) passa a usar a planilha falsa
+    cliente_planilhas.abrir_planilha_google = lambda credenciais, nome, **kwargs: planilha
+
+    rss_inicial = _rss_mb()
+    sessoes, excecoes = [], []
+    for numero in numeros:
+        try:
+            sessoes.append(simular_respondente(numero, spool, timeout, semente, rascunhos))
+        except Exception as e:
+            excecoes.append(f"{type(e).__name__}: {e}")
+    rss_sessoes = _rss_mb() - rss_inicial
+
+    # Só aguarda a descarga depois que todas as réplicas enfileiraram: o líder não sai antes
+    try:
+        barreira.wait(timeout=espera_descarga + timeout * len(ITENS))
+    except threading.BrokenBarrierError:
+        pass
+    fila = FilaEnvio(lambda aba: None, caminho=spool)
+    limite = time.perf_counter() + espera_descarga
+    while fila.pendentes() and time.perf_counter() < limite:
+        time.sleep(0.5)
+    resultados.put({
+        "processo": processo, "sessoes": sessoes, "excecoes": excecoes,
+        "rss_pico_mb": _rss_mb(), "rss_crescimento_por_sessao_mb": rss_sessoes / max(len(numeros), 1),
+        "chamadas": dict(planilha.chamadas()), "pendentes": fila.pendentes(),
+        "linhas_gravadas": sum(aba.row_count for aba in planilha.worksheets()),
+    })
+
+
+def executar(respondentes, replicas, latencia, taxa_429, timeout, espera_descarga, semente):
+    contexto = multiprocessing.get_context("spawn")
+    resultados = contexto.Queue()
+    barreira = contexto.Barrier(replicas)
+    with tempfile.TemporaryDirectory() as pasta:
+        spool = str(Path(pasta) / "spool.sqlite3")
+        rascunhos = str(Path(pasta) / "rascunhos.sqlite3")
+        FilaEnvio(lambda aba: None, caminho=spool)  # cria o arquivo antes dos processos
+        inicio = time.perf_counter()
+        trabalhadores = [
+            contexto.Process(target=trabalhador, args=(
+                n, list(range(n, respondentes, replicas)), spool, rascunhos, latencia, taxa_429,
+                timeout, espera_descarga, semente, barreira, resultados,
+            ))
+            for n in range(replicas)
+        ]
+        for processo in trabalhadores:
+            processo.start()
+        por_processo = [resultados.get() for _ in trabalhadores]
+        for processo in trabalhadores:
+            processo.join()
+        duracao = time.perf_counter() - inicio
+
+    resultados = [s for r in por_processo for s in r["sessoes"]]
+    reruns = [t for r in resultados for t in r["reruns"]]
+    envios = [r["envio"] for r in resultados]
+    enviados = sum(r["sucesso"] for r in resultados)
+    chamadas = {}
+    for r in por_processo:
+        for nome, total in r["chamadas"].items():
+            chamadas[nome] = chamadas.get(nome, 0) + total
+    commit, alteracoes_locais = _commit_atual()
+    return {
+        "commit": commit,
+        "alteracoes_locais": alteracoes_locais,
+        "modo": "multiprocesso: réplicas em paralelo, sessões em sequência em cada réplica",
+        "parametros": {
+            "respondentes": respondentes, "replicas": replicas,
+            "latencia_planilha_s": latencia, "taxa_429": taxa_429,
+        },
+        "duracao_total_s": round(duracao, 3),
+        "primeira_renderizacao_p50_s": round(_percentil([r["primeira_renderizacao"] for r in resultados], 50), 4),
+        "rerun_completo_p50_s": round(_percentil(reruns, 50), 4),
+        "rerun_completo_p99_s": round(_percentil(reruns, 99), 4),
+        "envio_p50_s": round(_percentil(envios, 50), 4),
+        "envio_p99_s": round(_percentil(envios, 99), 4),
+        "envio_medio_s": round(statistics.fmean(envios), 4),
+        "envios_confirmados": enviados,
+        "envios_pendentes_no_spool": max(r["pendentes"] for r in por_processo),
+        "rss_pico_por_replica_mb": round(max(r["rss_pico_mb"] for r in por_processo), 1),
+        "rss_crescimento_por_sessao_sequencial_mb": round(
+            statistics.fmean(r["rss_crescimento_por_sessao_mb"] for r in por_processo), 2
+        ),
+        "chamadas_api": chamadas,
+        "chamadas_api_por_envio": round(sum(chamadas.values()) / max(enviados, 1), 3),
+        "linhas_gravadas": sum(r["linhas_gravadas"] for r in por_processo),
+        "excecoes": sorted({e for r in resultados for e in r["excecoes"]}
+                           | {e for r in por_processo for e in r["excecoes"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do modo multiprocesso com planilha falsa.")
+    parser.add_argument("--respondentes", type=int, default=10)
+    parser.add_argument("--replicas", "--concorrencia", type=int, default=5, dest="replicas",
+                        help="Processos (réplicas do app) em paralelo; cada um roda as suas sessões em sequência.")
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência por chamada à planilha (s).")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de chamadas que recebem 429.")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout de cada run do AppTest (s).")
+    parser.add_argument("--espera-descarga", type=float, default=120)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo.")
+    args = parser.parse_args()
+
+    resultado = executar(args.respondentes, args.replicas, args.latencia, args.taxa_429,
+                         args.timeout, args.espera_descarga, args.semente)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
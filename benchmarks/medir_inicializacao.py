@@ -0,0 +1,145 @@
+# benchmarks/medir_inicializacao.py
+"""Orçamento de inicialização a frio do avaliacao_organizacional.py.
+
+Executa a primeira renderização do app com o AppTest do Streamlit em um
+processo novo, sob `python -X importtime`, e informa:
+- o tempo até a primeira renderização (import do Streamlit excluído);
+- os módulos mais caros importados pelo app (além do próprio Streamlit);
+- se algum módulo pesado (pandas, NumPy, matplotlib, gspread, google-auth)
+  foi carregado pelo código do app antes de qualquer envio — o que conta
+  como regressão.
+
+Cada import novo é atribuído a quem o disparou: sobe-se a pilha a partir do
+import até o primeiro quadro do Streamlit ou do app. Os módulos que o próprio
+Streamlit carrega sob demanda (ex.: NumPy dentro de st.image) aparecem em
+"modulos_pesados_do_streamlit", só como informação.
+
+Uso: python benchmarks/medir_inicializacao.py [--saida benchmarks/resultados/inicializacao.json]
+O código de saída é 1 quando há regressão, para uso em CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP = RAIZ / "avaliacao_organizacional.py"
+
+# Não devem ser importados na primeira renderização do questionário
+MODULOS_PESADOS = ["pandas", "numpy", "matplotlib", "gspread", "google.auth", "google.oauth2"]
+
+
+class OrigemDosImports:
+    """Finder do sys.meta_path que só observa: separa os imports do app dos do Streamlit."""
+
+    def __init__(self, pasta_app, pasta_streamlit):
+        self.pasta_app = str(pasta_app)
+        self.pasta_streamlit = str(pasta_streamlit)
+        self.pasta_benchmarks = str(Path(__file__).resolve().parent)
+        self.do_app, self.do_streamlit = set(), set()
+
+    def find_spec(self, nome, caminho=None, alvo=None):
+        quadro = sys._getframe(1)
+        while quadro is not None:
+            arquivo = quadro.f_code.co_filename
+            if arquivo.startswith(self.pasta_streamlit):
+                self.do_streamlit.add(nome)
+                break
+            if arquivo.startswith(self.pasta_app) and not arquivo.startswith(self.pasta_benchmarks):
+                self.do_app.add(nome)
+                break
+            quadro = quadro.f_back
+        return None  # a busca segue pelos finders normais
+
+
+def _pesados(modulos):
+    return [modulo for modulo in MODULOS_PESADOS if modulo in modulos]
+
+
+def _primeira_renderizacao():
+    """Roda no subprocesso: renderiza o app uma vez e imprime o tempo em JSON."""
+    import streamlit
+    from streamlit.testing.v1 import AppTest
+
+    origem = OrigemDosImports(RAIZ, Path(streamlit.__file__).resolve().parent)
+    with tempfile.TemporaryDirectory() as pasta:
+        app = AppTest.from_file(str(APP), default_timeout=60)
+        # Nenhum arquivo do app é criado na raiz do repositório
+        app.secrets["SPOOL_PATH"] = os.path.join(pasta, "spool.sqlite3")
+        app.secrets["RASCUNHOS_PATH"] = os.path.join(pasta, "rascunhos.sqlite3")
+        app.secrets["RELATORIO_PATH"] = os.path.join(pasta, "relatorio.sqlite3")
+        sys.meta_path.insert(0, origem)
+        inicio = time.perf_counter()
+        try:
+            app.run()
+        finally:
+            duracao = time.perf_counter() - inicio
+            sys.meta_path.remove(origem)
+        print(json.dumps({
+            "python": sys.version.split()[0],
+            "streamlit": streamlit.__version__,
+            "primeira_renderizacao_s": round(duracao, 4),
+            "excecoes": [str(e.value) for e in app.exception],
+            "radios": len(app.radio),
+            "modulos_carregados_pelo_app": sorted(origem.do_app),
+            "modulos_pesados_do_streamlit": _pesados(origem.do_streamlit),
+        }))
+
+
+def _ler_importtime(stderr):
+    """Converte a saída do -X importtime em {módulo: tempo acumulado em µs}."""
+    tempos = {}
+    for linha in stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, acumulada, modulo = linha.split("|")
+        tempos[modulo.strip()] = int(acumulada.strip())
+    return tempos
+
+
+def medir():
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", __file__, "--interno"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    )
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    carregados = set(resultado.pop("modulos_carregados_pelo_app"))
+    tempos = _ler_importtime(processo.stderr)
+    # Só interessa o que o app importou além do próprio Streamlit/AppTest
+    raizes = {m: t for m, t in tempos.items() if m in carregados and "." not in m}
+    resultado["import_app_s"] = round(sum(raizes.values()) / 1e6, 4)
+    resultado["imports_mais_caros_ms"] = {
+        modulo: round(t / 1e3, 1)
+        for modulo, t in sorted(raizes.items(), key=lambda par: -par[1])[:15]
+    }
+    resultado["modulos_pesados_carregados"] = _pesados(carregados)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a inicialização a frio do app.")
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o resultado.")
+    parser.add_argument("--interno", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        _primeira_renderizacao()
+        return 0
+
+    resultado = medir()
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+    if resultado["modulos_pesados_carregados"] or resultado["excecoes"]:
+        print("REGRESSÃO: módulos pesados ou exceções na primeira renderização.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# benchmarks/multiprocesso.py
+"""Teste do modo multiprocesso: vários processos gravando no mesmo spool, um só descarregando.
+
+Cada processo simula uma réplica do app: cria a sua FilaEnvio sobre o mesmo
+arquivo de spool (como com SPOOL_PATH compartilhado) e a sua PlanilhaFalsa,
+enfileira envios de 58 linhas e espera o spool esvaziar. Apenas o processo
+eleito (trava em "<spool>.lider") descarrega, então as linhas gravadas e as
+chamadas de API somadas de todas as planilhas falsas correspondem a uma única
+planilha compartilhada. Parte dos envios é repetida com o mesmo ID a partir
+de outro processo para exercitar o índice de deduplicação.
+
+Saída (JSON): vazão de enfileiramento, chamadas append_rows, linhas gravadas
+(que devem ser exatamente envios únicos × 58) e os processos que descarregaram.
+
+Uso: python benchmarks/multiprocesso.py --processos 4 --envios 50 --latencia 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from armazenamento import ABA_LONGA, linhas_longas
+from fila_envio import FilaEnvio
+from itens import INSTRUMENTO_PADRAO, ITENS
+from planilha_falsa import PlanilhaFalsa
+
+
+def _linhas_envio(processo, numero):
+    metadados = ["2026-01-01T00:00:00", "ABCD1234", f"Respondente {processo}-{numero}", "01/01/2026", "Org"]
+    itens_pontuados = [(item_id, bloco, item, 3, 3) for bloco, item_id, item, _ in ITENS]
+    return linhas_longas(metadados, itens_pontuados, INSTRUMENTO_PADRAO, f"{processo}-{numero}")
+
+
+def trabalhador(processo, processos, spool, envios, repetidos, latencia, taxa_429, timeout, resultados):
+    """Uma réplica: enfileira os envios, aguarda a descarga e devolve as contagens da sua planilha falsa."""
+    planilha = PlanilhaFalsa(latencia=latencia, taxa_429=taxa_429, semente=processo)
+    fila = FilaEnvio(planilha.worksheet, caminho=spool, janela=0.2).iniciar()
+
+    inicio = time.perf_counter()
+    aceitos = 0
+    for numero in range(envios):
+        aceitos += fila.enfileirar(ABA_LONGA, _linhas_envio(processo, numero), f"{processo}-{numero}") is not None
+    # Reenvia IDs do processo vizinho (duplicatas vindas de outra réplica); se o vizinho
+    # ainda não os enviou, este processo é quem os aceita
+    vizinho = (processo + 1) % processos
+    descartados = 0
+    for numero in range(repetidos):
+        if fila.enfileirar(ABA_LONGA, _linhas_envio(vizinho, numero), f"{vizinho}-{numero}") is None:
+            descartados += 1
+        else:
+            aceitos += 1
+    duracao = time.perf_counter() - inicio
+
+    limite = time.perf_counter() + timeout
+    while fila.pendentes() and time.perf_counter() < limite:
+        time.sleep(0.2)
+    resultados.put({
+        "processo": processo, "enfileiramento_s": duracao, "aceitos": aceitos,
+        "repetidos_descartados": descartados, "lider": fila.lider,
+        "linhas_gravadas": sum(aba.row_count for aba in planilha.worksheets()),
+        "chamadas": dict(planilha.chamadas()), "pendentes": fila.pendentes(),
+    })
+    fila.parar(timeout=5)
+
+
+def executar(processos, envios, repetidos, latencia, taxa_429, timeout):
+    contexto = multiprocessing.get_context("spawn")
+    resultados = contexto.Queue()
+    with tempfile.TemporaryDirectory() as pasta:
+        spool = str(Path(pasta) / "spool.sqlite3")
+        FilaEnvio(lambda aba: None, caminho=spool)  # cria o arquivo antes dos processos
+        inicio = time.perf_counter()
+        trabalhadores = [
+            contexto.Process(target=trabalhador, args=(
+                n, processos, spool, envios, repetidos, latencia, taxa_429, timeout, resultados,
+            ))
+            for n in range(processos)
+        ]
+        for processo in trabalhadores:
+            processo.start()
+        por_processo = [resultados.get(timeout=timeout + 60) for _ in trabalhadores]
+        for processo in trabalhadores:
+            processo.join()
+        duracao = time.perf_counter() - inicio
+
+    aceitos = sum(r["aceitos"] for r in por_processo)
+    linhas = sum(r["linhas_gravadas"] for r in por_processo)
+    append_rows = sum(r["chamadas"].get("append_rows", 0) for r in por_processo)
+    esperado = aceitos * len(ITENS)
+    return {
+        "parametros": {"processos": processos, "envios_por_processo": envios,
+                       "repetidos_por_processo": repetidos, "latencia_planilha_s": latencia,
+                       "taxa_429": taxa_429},
+        "duracao_total_s": round(duracao, 3),
+        "envios_aceitos": aceitos,
+        "repetidos_descartados": sum(r["repetidos_descartados"] for r in por_processo),
+        "envios_por_segundo_enfileiramento": round(
+            aceitos / max(max(r["enfileiramento_s"] for r in por_processo), 1e-9), 1
+        ),
+        "chamadas_append_rows": append_rows,
+        "linhas_gravadas": linhas,
+        "linhas_esperadas": esperado,
+        "processos_que_descarregaram": [r["processo"] for r in por_processo if r["linhas_gravadas"]],
+        "pendentes": max(r["pendentes"] for r in por_processo),
+        "ok": linhas == esperado,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Testa o modo multiprocesso do spool com planilhas falsas.")
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--envios", type=int, default=50, help="Envios por processo.")
+    parser.add_argument("--repetidos", type=int, default=5, help="Envios do vizinho reenviados por processo.")
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência por chamada à planilha (s).")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de chamadas que recebem 429.")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo.")
+    args = parser.parse_args()
+
+    resultado = executar(args.processos, args.envios, args.repetidos, args.latencia, args.taxa_429,
+                         args.timeout)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        Path(args.saida).write_text(texto + "\n", encoding="utf-8")
+    sys.exit(0 if resultado["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
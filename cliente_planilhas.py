@@ -0,0 +1,265 @@
+# cliente_planilhas.py
+"""Cliente resiliente do Google Sheets (camada fina sobre o gspread).
+
+- Conexão preguiçosa: nada é feito na rede até a primeira chamada.
+- Reconexão automática (renova credenciais) após 401 ou falha de transporte,
+  com verificação de saúde antes de reutilizar uma conexão suspeita.
+- Backoff exponencial com jitter em 429/5xx, respeitando Retry-After.
+  Operações que não são idempotentes (append_rows) só são repetidas quando a
+  requisição com certeza não foi aplicada (429, 401); após 5xx ou falha de
+  transporte o erro é propagado, e quem decide o reenvio é a fila de envio.
+- Sessão HTTP única e com pool de conexões, compartilhada entre reruns.
+- Métricas por operação: chamadas, falhas, novas tentativas e latência
+  (e, com `metricas`, histograma de latência em metricas.py).
+- Enquanto uma falha de conexão é conhecida, novas tentativas são recusadas
+  imediatamente (PlanilhaIndisponivel) até o fim do intervalo de espera.
+
+`abrir_planilha` é qualquer função sem argumentos que retorne um objeto com
+`.worksheet(nome)`, o que permite usar a planilha falsa de planilha_falsa.py.
+"""
+import random
+import threading
+import time
+
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+STATUS_REAUTENTICAR = {401}
+# Repetir estas chamadas após uma falha ambígua (5xx, rede) pode gravar as linhas duas vezes
+OPERACOES_NAO_IDEMPOTENTES = {"append_rows", "append_row"}
+ESCOPOS_GOOGLE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+
+class PlanilhaIndisponivel(ConnectionError):
+    """A conexão com a planilha falhou recentemente; nova tentativa só após o intervalo."""
+
+
+def status_http(erro):
+    """Extrai o status HTTP de um erro do gspread/requests, se houver."""
+    resposta = getattr(erro, "response", None)
+    return getattr(resposta, "status_code", None)
+
+
+def retry_after(erro):
+    """Lê o cabeçalho Retry-After (em segundos) de um erro HTTP, se houver."""
+    resposta = getattr(erro, "response", None)
+    cabecalhos = getattr(resposta, "headers", None) or {}
+    try:
+        return float(cabecalhos.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _erro_de_transporte(erro):
+    """Falhas de rede (sem resposta HTTP): conexão recusada, timeout, DNS..."""
+    return status_http(erro) is None and isinstance(erro, (ConnectionError, TimeoutError, OSError))
+
+
+def resultado_incerto(erro):
+    """Indica se a requisição pode ter sido aplicada apesar do erro (5xx ou falha de transporte)."""
+    status = status_http(erro)
+    return _erro_de_transporte(erro) or (status is not None and status >= 500)
+
+
+def abrir_planilha_google(credenciais, nome_planilha, tamanho_pool=10):
+    """Abre a planilha com uma sessão HTTP autorizada e com pool de conexões."""
+    import gspread
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2.service_account import Credentials
+    from requests.adapters import HTTPAdapter
+
+    creds = Credentials.from_service_account_info(credenciais, scopes=ESCOPOS_GOOGLE)
+    sessao = AuthorizedSession(creds)
+    adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+    sessao.mount("https://", adaptador)
+    return gspread.Client(auth=creds, session=sessao).open(nome_planilha)
+
+
+class MetricaOperacao:
+    """Contadores de uma operação (ex.: 'Organizacional.append_rows')."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.falhas = 0
+        self.novas_tentativas = 0
+        self.latencia_total = 0.0
+        self.latencia_max = 0.0
+
+    def registrar(self, latencia, tentativas, sucesso):
+        self.chamadas += 1
+        self.novas_tentativas += tentativas
+        self.falhas += not sucesso
+        self.latencia_total += latencia
+        self.latencia_max = max(self.latencia_max, latencia)
+
+    def como_dict(self):
+        media = self.latencia_total / self.chamadas if self.chamadas else 0.0
+        return {
+            "chamadas": self.chamadas,
+            "falhas": self.falhas,
+            "novas_tentativas": self.novas_tentativas,
+            "latencia_media_s": round(media, 4),
+            "latencia_max_s": round(self.latencia_max, 4),
+        }
+
+
+class ClientePlanilhas:
+    """Acesso às abas com conexão preguiçosa, reconexão e backoff."""
+
+    def __init__(self, abrir_planilha, tentativas=5, espera_base=0.5, espera_max=32.0,
+                 intervalo_reconexao=15.0, intervalo_reconexao_max=300.0, dormir=time.sleep,
+                 metricas=None):
+        self.abrir_planilha = abrir_planilha
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.intervalo_reconexao = intervalo_reconexao
+        self.intervalo_reconexao_max = intervalo_reconexao_max
+        self.dormir = dormir
+        self._trava = threading.RLock()
+        self._planilha = None
+        self._abas = {}
+        self._preparar = {}
+        self._suspeita = False
+        self._falhas_conexao = 0
+        self._bloqueado_ate = 0.0
+        self.ultimo_erro_conexao = None
+        self.operacoes = {}  # "aba.metodo" -> MetricaOperacao
+        self.metricas = metricas  # metricas.Metricas opcional
+
+    # --- CONEXÃO ---
+    def _conectar(self):
+        """Retorna a planilha conectada, abrindo (ou reabrindo) se necessário."""
+        with self._trava:
+            if self._planilha is not None and self._suspeita:
+                self._verificar_saude()
+            if self._planilha is not None:
+                return self._planilha
+            if time.monotonic() < self._bloqueado_ate:
+                raise PlanilhaIndisponivel(
+                    f"Conexão indisponível (última falha: {self.ultimo_erro_conexao})."
+                )
+            try:
+                self._planilha = self.abrir_planilha()
+            except Exception as e:
+                self._falhas_conexao += 1
+                self.ultimo_erro_conexao = e
+                espera = min(self.intervalo_reconexao * 2 ** (self._falhas_conexao - 1),
+                             self.intervalo_reconexao_max)
+                self._bloqueado_ate = time.monotonic() + espera
+                raise PlanilhaIndisponivel(f"Falha ao conectar ao Google Sheets: {e}") from e
+            self._falhas_conexao = 0
+            self.ultimo_erro_conexao = None
+            self._suspeita = False
+            return self._planilha
+
+    def _verificar_saude(self):
+        """Confirma que a conexão suspeita ainda responde; descarta-a se não."""
+        try:
+            self._planilha.worksheets()
+            self._suspeita = False
+        except Exception:
+            self.desconectar()
+
+    def desconectar(self):
+        """Descarta a conexão atual; a próxima chamada reconecta (e renova o token)."""
+        with self._trava:
+            self._planilha = None
+            self._abas = {}
+            self._suspeita = False
+
+    def saudavel(self):
+        """Verificação de saúde: conecta se preciso e faz uma leitura leve de metadados."""
+        try:
+            self._conectar().worksheets()
+            return True
+        except Exception:
+            self._suspeita = True
+            return False
+
+    def _aba(self, nome):
+        with self._trava:
+            if self._suspeita:
+                self._conectar()
+            ws = self._abas.get(nome)
+            if ws is None:
+                ws = self._conectar().worksheet(nome)
+                preparar = self._preparar.get(nome)
+                if preparar is not None:
+                    preparar(ws)
+                self._abas[nome] = ws
+            return ws
+
+    # --- EXECUÇÃO COM BACKOFF ---
+    def _espera(self, tentativa, erro):
+        sugerida = retry_after(erro)
+        if sugerida is not None:
+            return min(sugerida, self.espera_max)
+        return min(self.espera_base * 2 ** tentativa, self.espera_max) * random.uniform(0.5, 1.0)
+
+    def executar(self, nome_aba, metodo, *args, **kwargs):
+        """Chama `metodo` na aba com novas tentativas em 429/5xx e reconexão em 401/rede.
+
+        Em OPERACOES_NAO_IDEMPOTENTES, 5xx e falhas de transporte não são repetidos.
+        """
+        metrica = self.operacoes.setdefault(f"{nome_aba}.{metodo}", MetricaOperacao())
+        inicio = time.perf_counter()
+        tentativa = 0
+        while True:
+            try:
+                resultado = getattr(self._aba(nome_aba), metodo)(*args, **kwargs)
+                self._registrar(metrica, nome_aba, metodo, inicio, tentativa, True)
+                return resultado
+            except PlanilhaIndisponivel:
+                self._registrar(metrica, nome_aba, metodo, inicio, tentativa, False)
+                raise
+            except Exception as e:
+                status = status_http(e)
+                if status in STATUS_REAUTENTICAR:
+                    self.desconectar()
+                elif _erro_de_transporte(e):
+                    self._suspeita = True
+                elif status not in STATUS_REPETIVEIS:
+                    self._registrar(metrica, nome_aba, metodo, inicio, tentativa, False)
+                    raise
+                if metodo in OPERACOES_NAO_IDEMPOTENTES and resultado_incerto(e):
+                    self._registrar(metrica, nome_aba, metodo, inicio, tentativa, False)
+                    raise
+                if tentativa + 1 >= self.tentativas:
+                    self._registrar(metrica, nome_aba, metodo, inicio, tentativa, False)
+                    raise
+                self.dormir(self._espera(tentativa, e))
+                tentativa += 1
+
+    def _registrar(self, metrica, nome_aba, metodo, inicio, tentativa, sucesso):
+        latencia = time.perf_counter() - inicio
+        metrica.registrar(latencia, tentativa, sucesso)
+        if self.metricas is not None:
+            self.metricas.observar("sheets_segundos", latencia, aba=nome_aba, operacao=metodo,
+                                   sucesso=str(sucesso).lower())
+
+    def aba(self, nome, preparar=None):
+        """Retorna um proxy da aba; `preparar(ws)` roda uma vez a cada (re)conexão."""
+        if preparar is not None:
+            self._preparar[nome] = preparar
+        return AbaResiliente(self, nome)
+
+    def resumo_metricas(self):
+        return {operacao: metrica.como_dict() for operacao, metrica in self.operacoes.items()}
+
+
+class AbaResiliente:
+    """Proxy de uma aba do gspread: cada método passa por ClientePlanilhas.executar."""
+
+    def __init__(self, cliente, nome):
+        self.cliente = cliente
+        self.title = nome
+
+    def __getattr__(self, metodo):
+        if metodo.startswith("_"):
+            raise AttributeError(metodo)
+
+        def chamar(*args, **kwargs):
+            return self.cliente.executar(self.title, metodo, *args, **kwargs)
+        return chamar
@@ -0,0 +1,156 @@
+# deduplicar.py
+"""Localiza e remove envios duplicados já gravados na planilha (ferramenta offline).
+
+Há dois tipos de duplicata, listados separadamente:
+- por ID: envios com o mesmo id_envio (coluna gravada pelo app) são o mesmo
+  envio gravado mais de uma vez (ex.: um lote reenviado);
+- por conteúdo: envios com o mesmo hash de (id_organizacao, respondente,
+  instrumento, vetor de respostas), mesmo com IDs diferentes ou sem ID, como
+  quando o respondente reenvia a partir de uma nova sessão (nova aba do
+  navegador) e recebe outro id_envio. O nome do respondente é comparado sem
+  diferenciar maiúsculas nem espaços extras. Envios anônimos idênticos também
+  são agrupados; confira a lista antes de aplicar.
+
+No layout longo, as linhas de um envio são agrupadas por
+armazenamento.agrupar_envios_longos; no layout largo, cada linha é um envio.
+De cada grupo de duplicatas fica o primeiro envio da aba (o mais antigo).
+
+Sem --aplicar, apenas lista as duplicatas. Com --aplicar, grava a aba sem
+duplicatas na aba de destino (que deve existir e é sobrescrita), em
+intervalos de até CELULAS_POR_GRAVACAO células (o Sheets limita o tamanho de
+cada requisição); a aba de origem não é alterada, para que a troca seja
+conferida antes.
+
+Uso: python deduplicar.py credenciais.json --aba Organizacional [--destino Organizacional_Dedup] [--aplicar]
+"""
+import argparse
+import hashlib
+import json
+from armazenamento import (
+    agrupar_envios_longos, eh_aba_larga, id_envio_da_linha_longa, instrumento_da_aba,
+    instrumento_da_linha_longa, mapa_colunas,
+)
+
+CELULAS_POR_GRAVACAO = 100_000
+DUPLICATA_ID = "id"
+DUPLICATA_CONTEUDO = "conteudo"
+
+
+def hash_envio(id_organizacao, respondente, instrumento, respostas):
+    """Hash estável de um envio; `respostas` é uma sequência de (ID ou texto do item, resposta)."""
+    chave = [
+        id_organizacao.strip().upper(), " ".join(respondente.split()).casefold(), instrumento,
+        sorted([str(item), str(resposta)] for item, resposta in respostas),
+    ]
+    return hashlib.sha256(json.dumps(chave, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _envios_longos(linhas):
+    """[(id_envio, hash do conteúdo, índices das linhas)] na ordem da aba (layout longo)."""
+    envios = []
+    for _, indices in agrupar_envios_longos(linhas):
+        primeira = linhas[indices[0]]
+        respostas = [(linhas[i][6], linhas[i][7]) for i in indices]
+        conteudo = hash_envio(primeira[1], primeira[2], instrumento_da_linha_longa(primeira), respostas)
+        envios.append((id_envio_da_linha_longa(primeira), conteudo, indices))
+    return envios
+
+
+def _envios_largos(linhas, instrumento):
+    """Um envio por linha (layout largo); a linha 1 é o cabeçalho."""
+    if not linhas:
+        return []
+    cabecalho = linhas[0]
+    colunas_resposta = [(item_id, i) for item_id, (i, _) in mapa_colunas(cabecalho).items()]
+    i_org, i_resp = cabecalho.index("id_organizacao"), cabecalho.index("respondente")
+    i_inst = cabecalho.index("instrumento") if "instrumento" in cabecalho else None
+    i_id = cabecalho.index("id_envio") if "id_envio" in cabecalho else None
+    envios = []
+    for indice, linha in enumerate(linhas[1:], start=1):
+        if not any(linha):
+            continue
+        linha = list(linha) + [""] * (len(linhas[0]) - len(linha))
+        inst = (linha[i_inst] if i_inst is not None else "") or instrumento
+        respostas = [(item_id, linha[i]) for item_id, i in colunas_resposta]
+        conteudo = hash_envio(linha[i_org], linha[i_resp], inst, respostas)
+        envios.append((linha[i_id] if i_id is not None else "", conteudo, [indice]))
+    return envios
+
+
+def encontrar_duplicatas(linhas, largo=False, instrumento=None):
+    """Retorna (linhas sem duplicatas, duplicatas).
+
+    `duplicatas` é uma lista de (tipo, chave, índices das linhas removidas,
+    índice da primeira linha do envio mantido): tipo DUPLICATA_ID com o
+    id_envio como chave ou DUPLICATA_CONTEUDO com o hash do envio. Um envio
+    que repete o ID de outro é contado como duplicata por ID, mesmo que o
+    conteúdo também se repita.
+    """
+    envios = _envios_largos(linhas, instrumento) if largo else _envios_longos(linhas)
+    por_id, por_conteudo, duplicatas, remover = {}, {}, [], set()
+    for id_envio, conteudo, indices in envios:
+        if id_envio and id_envio in por_id:
+            duplicatas.append((DUPLICATA_ID, id_envio, indices, por_id[id_envio]))
+        elif conteudo in por_conteudo:
+            duplicatas.append((DUPLICATA_CONTEUDO, conteudo, indices, por_conteudo[conteudo]))
+            if id_envio:
+                # Cópias posteriores deste ID também apontam para o envio mantido
+                por_id[id_envio] = por_conteudo[conteudo]
+        else:
+            por_conteudo[conteudo] = indices[0]
+            if id_envio:
+                por_id[id_envio] = indices[0]
+            continue
+        remover.update(indices)
+    return [linha for i, linha in enumerate(linhas) if i not in remover], duplicatas
+
+
+def gravar_em_partes(ws, linhas, celulas_por_gravacao=CELULAS_POR_GRAVACAO):
+    """Sobrescreve a aba com `linhas` em intervalos A<n> de até `celulas_por_gravacao` células.
+
+    A aba é limpa e redimensionada antes, para que todos os intervalos caibam
+    na grade. Retorna o número de chamadas update.
+    """
+    largura = max((len(linha) for linha in linhas), default=1)
+    por_gravacao = max(1, celulas_por_gravacao // largura)
+    ws.clear()
+    ws.resize(rows=max(len(linhas), 1), cols=largura)
+    chamadas = 0
+    for inicio in range(0, len(linhas), por_gravacao):
+        ws.update(range_name=f"A{inicio + 1}", values=linhas[inicio:inicio + por_gravacao],
+                  value_input_option="USER_ENTERED")
+        chamadas += 1
+    return chamadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Localiza e remove envios duplicados de uma aba.")
+    parser.add_argument("credenciais", help="Arquivo JSON da conta de serviço do Google.")
+    parser.add_argument("--planilha", default="Respostas Formularios")
+    parser.add_argument("--aba", required=True, help="Aba longa ou uma aba larga de instrumento.")
+    parser.add_argument("--destino", help="Aba que recebe o resultado (padrão: <aba>_Dedup).")
+    parser.add_argument("--aplicar", action="store_true", help="Grava a aba sem duplicatas no destino.")
+    args = parser.parse_args()
+
+    from cliente_planilhas import ClientePlanilhas, abrir_planilha_google
+
+    with open(args.credenciais, encoding="utf-8") as arquivo:
+        credenciais = json.load(arquivo)
+    cliente = ClientePlanilhas(lambda: abrir_planilha_google(credenciais, args.planilha))
+    linhas = cliente.aba(args.aba).get_all_values()
+    largo = eh_aba_larga(args.aba)
+    sem_duplicatas, duplicatas = encontrar_duplicatas(linhas, largo, instrumento_da_aba(args.aba))
+    for tipo, chave, indices, mantida in duplicatas:
+        print(f"{tipo:<8}  {chave[:12]}  linhas {indices[0] + 1}-{indices[-1] + 1} duplicam a linha {mantida + 1}")
+    por_id = sum(tipo == DUPLICATA_ID for tipo, _, _, _ in duplicatas)
+    print(f"{len(duplicatas)} envios duplicados ({por_id} por ID, {len(duplicatas) - por_id} por conteúdo; "
+          f"{len(linhas) - len(sem_duplicatas)} linhas) em '{args.aba}'.")
+
+    if args.aplicar and duplicatas:
+        destino = args.destino or f"{args.aba}_Dedup"
+        chamadas = gravar_em_partes(cliente.aba(destino), sem_duplicatas)
+        print(f"{len(sem_duplicatas)} linhas gravadas em '{destino}' ({chamadas} gravações).")
+
+
+if __name__ == "__main__":
+    main()
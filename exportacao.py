@@ -0,0 +1,159 @@
+# exportacao.py
+"""Exportação incremental da aba de respostas para Parquet particionado e Excel.
+
+A aba é lida em intervalos (ws.get("A{inicio}:{coluna}{fim}")) a partir de um
+checkpoint com as linhas já exportadas e o último timestamp visto. Cada lote
+novo é gravado no dataset Parquet particionado por organização e mês:
+
+    destino/organizacao=<id_organizacao>/mes=<AAAA-MM>/part-<linha inicial>.parquet
+
+(As chaves de partição têm nomes diferentes das colunas dos arquivos, para que
+a leitura do diretório inteiro com pandas/pyarrow não gere conflito de campos.)
+
+O nome do arquivo depende só da linha inicial do lote, então repetir um lote
+após uma queda sobrescreve o mesmo arquivo em vez de duplicar dados. O Excel
+de uma organização é gerado em modo write-only do openpyxl, lote a lote, a
+partir dos arquivos Parquet dela. Use um destino por aba (layout longo ou
+largo), pois os dois layouts têm colunas diferentes.
+
+Requer o pacote opcional pyarrow (não usado pelo app em si).
+
+Uso: python exportacao.py credenciais.json --destino exportacao/ [--xlsx ID_ORG]
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+from armazenamento import ABA_LONGA, COLUNAS_LONGAS, cabecalho_largo, eh_aba_larga, letra_coluna
+from itens import ITENS
+
+LINHAS_POR_LEITURA = 5000
+ARQUIVO_CHECKPOINT = "_checkpoint.json"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("A exportação para Parquet requer o pacote 'pyarrow'.") from e
+    return pa, pq
+
+
+# --- CHECKPOINT ---
+def ler_checkpoint(destino):
+    caminho = Path(destino) / ARQUIVO_CHECKPOINT
+    if not caminho.exists():
+        return {}
+    return json.loads(caminho.read_text(encoding="utf-8"))
+
+
+def gravar_checkpoint(destino, checkpoint):
+    """Grava o checkpoint de forma atômica (arquivo temporário + rename)."""
+    caminho = Path(destino) / ARQUIVO_CHECKPOINT
+    temporario = caminho.with_suffix(".tmp")
+    temporario.write_text(json.dumps(checkpoint, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(temporario, caminho)
+
+
+# --- EXPORTAÇÃO PARA PARQUET ---
+def _colunas(aba, itens):
+    return cabecalho_largo(itens) if eh_aba_larga(aba) else COLUNAS_LONGAS
+
+
+def _gravar_lote(destino, colunas, linhas, inicio):
+    """Agrupa as linhas por (organização, mês) e grava um arquivo por partição."""
+    pa, pq = _pyarrow()
+    particoes = {}
+    for linha in linhas:
+        if not linha or linha[0] == colunas[0]:
+            continue  # linha vazia ou cabeçalho
+        linha = (list(linha) + [""] * len(colunas))[:len(colunas)]
+        particoes.setdefault((linha[1], linha[0][:7]), []).append(linha)
+    for (id_org, mes), linhas_particao in particoes.items():
+        pasta = Path(destino) / f"organizacao={id_org}" / f"mes={mes}"
+        pasta.mkdir(parents=True, exist_ok=True)
+        tabela = pa.table({
+            nome: pa.array([linha[i] for linha in linhas_particao], type=pa.string())
+            for i, nome in enumerate(colunas)
+        })
+        pq.write_table(tabela, pasta / f"part-{inicio:09d}.parquet")
+    return sum(len(v) for v in particoes.values())
+
+
+def exportar_parquet(ws, destino, itens=ITENS, linhas_por_leitura=LINHAS_POR_LEITURA):
+    """Exporta para o dataset apenas as linhas novas da aba. Retorna o nº de linhas gravadas."""
+    Path(destino).mkdir(parents=True, exist_ok=True)
+    checkpoint = ler_checkpoint(destino)
+    estado = checkpoint.setdefault(ws.title, {"linhas_lidas": 0, "ultimo_timestamp": None})
+    colunas = _colunas(ws.title, itens)
+    ultima_coluna = letra_coluna(len(colunas))
+    gravadas = 0
+    while True:
+        inicio = estado["linhas_lidas"] + 1
+        linhas = ws.get(f"A{inicio}:{ultima_coluna}{inicio + linhas_por_leitura - 1}")
+        if not linhas:
+            break
+        gravadas += _gravar_lote(destino, colunas, linhas, inicio)
+        timestamps = [linha[0] for linha in linhas if linha and linha[0] != colunas[0]]
+        if timestamps:
+            estado["ultimo_timestamp"] = max([estado["ultimo_timestamp"] or ""] + timestamps)
+        estado["linhas_lidas"] += len(linhas)
+        gravar_checkpoint(destino, checkpoint)
+        if len(linhas) < linhas_por_leitura:
+            break
+    return gravadas
+
+
+# --- EXCEL POR ORGANIZAÇÃO (STREAMING) ---
+def exportar_xlsx(destino, id_organizacao, caminho_xlsx, tamanho_lote=10_000):
+    """Gera o .xlsx de uma organização lendo seus arquivos Parquet em lotes."""
+    from openpyxl import Workbook
+
+    _, pq = _pyarrow()
+    arquivos = sorted((Path(destino) / f"organizacao={id_organizacao}").glob("mes=*/part-*.parquet"))
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet("Respostas")
+    total = 0
+    cabecalho_escrito = False
+    for arquivo in arquivos:
+        parquet = pq.ParquetFile(arquivo)
+        if not cabecalho_escrito:
+            planilha.append(parquet.schema_arrow.names)
+            cabecalho_escrito = True
+        for lote in parquet.iter_batches(batch_size=tamanho_lote):
+            for linha in zip(*(coluna.to_pylist() for coluna in lote.columns)):
+                planilha.append(list(linha))
+                total += 1
+    livro.save(caminho_xlsx)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta a aba de respostas para Parquet/Excel.")
+    parser.add_argument("credenciais", help="Arquivo JSON da conta de serviço do Google.")
+    parser.add_argument("--destino", default="exportacao")
+    parser.add_argument("--planilha", default="Respostas Formularios")
+    parser.add_argument("--aba", default=ABA_LONGA, help="Aba longa ou uma aba larga de instrumento.")
+    parser.add_argument("--xlsx", metavar="ID_ORG", help="Gera também o .xlsx desta organização.")
+    args = parser.parse_args()
+
+    from armazenamento import instrumento_da_aba
+    from cliente_planilhas import ClientePlanilhas, abrir_planilha_google
+    from itens import carregar_instrumento
+
+    with open(args.credenciais, encoding="utf-8") as arquivo:
+        credenciais = json.load(arquivo)
+    cliente = ClientePlanilhas(lambda: abrir_planilha_google(credenciais, args.planilha))
+    itens = carregar_instrumento(instrumento_da_aba(args.aba)).itens
+    gravadas = exportar_parquet(cliente.aba(args.aba), args.destino, itens)
+    print(f"{gravadas} linhas novas exportadas para '{args.destino}'.")
+    if args.xlsx:
+        caminho = Path(args.destino) / f"{args.xlsx}.xlsx"
+        total = exportar_xlsx(args.destino, args.xlsx, caminho)
+        print(f"{total} linhas gravadas em '{caminho}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+# fila_envio.py
+"""Fila de envio (write-behind) com spool local em SQLite na frente do append_rows.
+
+O mesmo arquivo guarda o índice de deduplicação: os IDs de envio já aceitos
+(um por sessão do app). Um envio repetido com o mesmo ID é descartado sem
+nenhuma leitura da planilha.
+
+A fila é a única camada que reenvia um lote (o cliente não repete append_rows
+após 5xx ou falha de rede). Antes de cada append_rows o lote é marcado como
+"em voo"; se a chamada termina sem resposta certa (5xx, rede, queda do
+processo entre o append_rows e a remoção do spool), a próxima tentativa lê a
+coluna id_envio da aba e descarta os envios que já estão lá.
+
+Erros transitórios (429, 5xx, rede, credenciais) mantêm o lote no spool, com
+backoff. Erros permanentes (4xx como dados inválidos ou o limite de células da
+planilha, cabeçalho largo incompatível) não se resolvem repetindo o mesmo
+lote: os envios do lote são reenviados um a um e os que falharem vão para a
+tabela envios_falhos, sem travar o restante da fila. Eles podem voltar à fila
+com reenfileirar_falhos() depois de corrigida a causa, também pela linha de
+comando (o app em execução os descarrega na próxima sondagem):
+
+    python fila_envio.py spool_respostas.sqlite3 listar
+    python fila_envio.py spool_respostas.sqlite3 reenfileirar [--aba ABA] [--id ID ...]
+
+Modo multiprocesso: vários processos do app (réplicas atrás de um balanceador,
+na mesma máquina) podem apontar SPOOL_PATH para o mesmo arquivo. O SQLite fica
+em modo WAL, todos gravam no spool e apenas um processo, o que obtém a trava
+exclusiva do arquivo "<spool>.lider" (flock; no Windows, msvcrt.locking),
+descarrega para a planilha. Se ele cair, o sistema libera a trava e outro
+processo assume na próxima sondagem. As chamadas ao Sheets não crescem com o
+número de processos. O modo multiprocesso exige uma das duas travas; sem
+elas, o processo se considera o único e sempre descarrega.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from armazenamento import COLUNAS_FIXAS_LARGO, COLUNAS_LONGAS, CabecalhoIncompativel, eh_aba_larga
+from cliente_planilhas import (
+    STATUS_REAUTENTICAR, STATUS_REPETIVEIS, PlanilhaIndisponivel, resultado_incerto, retry_after,
+    status_http,
+)
+from metricas import LIMITES_BYTES, LIMITES_LINHAS
+
+# --- CONFIGURAÇÕES PADRÃO ---
+CAMINHO_SPOOL_PADRAO = "spool_respostas.sqlite3"
+LINHAS_POR_LOTE = 1000       # Máximo de linhas agrupadas em um único append_rows
+JANELA_AGRUPAMENTO = 2.0     # Segundos de espera para juntar envios de vários respondentes
+ESPERA_MINIMA = 1.0          # Primeiro intervalo de backoff (segundos)
+ESPERA_MAXIMA = 120.0        # Teto do backoff exponencial (segundos)
+RETENCAO_IDS = 90 * 24 * 3600  # Por quanto tempo um ID de envio aceito é lembrado (segundos)
+INTERVALO_SONDAGEM = 5.0     # Verificação periódica do spool e da liderança (segundos)
+# 4xx que afetam todos os lotes (credenciais, permissão, timeout): transitórios, não do lote
+STATUS_4XX_TRANSITORIOS = STATUS_REPETIVEIS | STATUS_REAUTENTICAR | {403, 408}
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+def _travar(arquivo):
+    """Trava exclusiva e sem espera do arquivo. Retorna False se outro processo a detém."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _destravar(arquivo):
+    if fcntl is not None:
+        fcntl.flock(arquivo, fcntl.LOCK_UN)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def erro_permanente(erro):
+    """Indica se o erro é do lote em si, ou seja, se repetir o mesmo append_rows falharia de novo."""
+    if isinstance(erro, CabecalhoIncompativel):
+        return True
+    status = status_http(erro)
+    return status is not None and 400 <= status < 500 and status not in STATUS_4XX_TRANSITORIOS
+
+
+class FilaEnvio:
+    """Grava cada envio em um spool local e descarrega em lotes para a planilha.
+
+    `obter_planilha(nome_aba)` deve retornar a aba do gspread (ou None se a
+    conexão falhar). O envio é confirmado assim que é gravado no spool; uma
+    thread em segundo plano agrupa as linhas de vários respondentes em poucas
+    chamadas `append_rows`, com backoff em caso de 429/5xx. Envios que ficarem
+    no spool após uma queda do processo são reenviados no próximo início.
+    """
+
+    def __init__(self, obter_planilha, caminho=CAMINHO_SPOOL_PADRAO,
+                 linhas_por_lote=LINHAS_POR_LOTE, janela=JANELA_AGRUPAMENTO, metricas=None):
+        self.obter_planilha = obter_planilha
+        self.caminho = caminho
+        self.linhas_por_lote = linhas_por_lote
+        self.janela = janela
+        self.metricas = metricas  # metricas.Metricas opcional
+        self._sinal = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._falhas_seguidas = 0
+        self._arquivo_lider = None
+        self.ultimo_erro = None
+        self._criar_tabela()
+
+    # --- SPOOL LOCAL ---
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _criar_tabela(self):
+        with self._conectar() as conn:
+            # WAL: vários processos gravam no spool sem bloquear a leitura do descarregador
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS envios (
+                       id INTEGER PRIMARY KEY AUTOINCREMENT,
+                       aba TEXT NOT NULL,
+                       linhas TEXT NOT NULL,
+                       criado_em TEXT NOT NULL,
+                       id_envio TEXT,
+                       em_voo INTEGER NOT NULL DEFAULT 0
+                   )"""
+            )
+            # Spools criados antes das colunas id_envio/em_voo
+            colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(envios)")}
+            if "id_envio" not in colunas:
+                conn.execute("ALTER TABLE envios ADD COLUMN id_envio TEXT")
+            if "em_voo" not in colunas:
+                conn.execute("ALTER TABLE envios ADD COLUMN em_voo INTEGER NOT NULL DEFAULT 0")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS ids_aceitos (
+                       id_envio TEXT PRIMARY KEY,
+                       aceito_em REAL NOT NULL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ids_aceitos_aceito_em ON ids_aceitos (aceito_em)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS envios_falhos (
+                       id INTEGER PRIMARY KEY,
+                       aba TEXT NOT NULL,
+                       linhas TEXT NOT NULL,
+                       criado_em TEXT NOT NULL,
+                       id_envio TEXT,
+                       erro TEXT NOT NULL,
+                       falhou_em TEXT NOT NULL
+                   )"""
+            )
+
+    def enfileirar(self, aba, linhas, id_envio=None):
+        """Grava as linhas de um envio no spool e acorda o descarregador. Retorna o id no spool.
+
+        Com `id_envio`, a gravação é idempotente: se o ID já foi aceito, nada é
+        gravado e o retorno é None. O registro do ID e das linhas ocorre na
+        mesma transação.
+        """
+        with self._conectar() as conn:
+            if id_envio is not None:
+                novo = conn.execute(
+                    "INSERT OR IGNORE INTO ids_aceitos (id_envio, aceito_em) VALUES (?, ?)",
+                    (id_envio, time.time()),
+                ).rowcount
+                if not novo:
+                    return None
+            linhas_json = json.dumps(linhas, ensure_ascii=False)
+            cur = conn.execute(
+                "INSERT INTO envios (aba, linhas, criado_em, id_envio) VALUES (?, ?, ?, ?)",
+                (aba, linhas_json, datetime.now().isoformat(timespec="seconds"), id_envio),
+            )
+            id_spool = cur.lastrowid
+        if self.metricas is not None:
+            self.metricas.observar("envio_bytes", len(linhas_json.encode("utf-8")),
+                                   LIMITES_BYTES, aba=aba)
+        self._sinal.set()
+        return id_spool
+
+    def ja_aceito(self, id_envio):
+        """Indica se o ID de envio já foi aceito (consulta só o índice local)."""
+        with self._conectar() as conn:
+            return conn.execute(
+                "SELECT 1 FROM ids_aceitos WHERE id_envio = ?", (id_envio,)
+            ).fetchone() is not None
+
+    def pendentes(self):
+        """Quantidade de envios ainda não gravados na planilha."""
+        with self._conectar() as conn:
+            return conn.execute("SELECT COUNT(*) FROM envios").fetchone()[0]
+
+    def falhos(self):
+        """Quantidade de envios retirados da fila por erro permanente (tabela envios_falhos)."""
+        with self._conectar() as conn:
+            return conn.execute("SELECT COUNT(*) FROM envios_falhos").fetchone()[0]
+
+    def listar_falhos(self, aba=None):
+        """Envios em envios_falhos (de uma aba ou de todas), do mais antigo ao mais novo.
+
+        Retorna dicts com id, aba, id_envio, linhas (quantidade), criado_em, falhou_em e erro.
+        """
+        filtro, parametros = ("WHERE aba = ?", (aba,)) if aba is not None else ("", ())
+        with self._conectar() as conn:
+            registros = conn.execute(
+                f"""SELECT id, aba, id_envio, linhas, criado_em, falhou_em, erro
+                    FROM envios_falhos {filtro} ORDER BY id""",
+                parametros,
+            ).fetchall()
+        return [
+            {"id": id_spool, "aba": aba_envio, "id_envio": id_envio, "linhas": len(json.loads(linhas)),
+             "criado_em": criado_em, "falhou_em": falhou_em, "erro": erro}
+            for id_spool, aba_envio, id_envio, linhas, criado_em, falhou_em, erro in registros
+        ]
+
+    def reenfileirar_falhos(self, aba=None, ids=None):
+        """Devolve à fila os envios que falharam (de uma aba, com os ids dados ou todos). Retorna quantos."""
+        condicoes, parametros = [], []
+        if aba is not None:
+            condicoes.append("aba = ?")
+            parametros.append(aba)
+        if ids is not None:
+            condicoes.append(f"id IN ({', '.join('?' * len(ids))})")
+            parametros.extend(ids)
+        filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        with self._conectar() as conn:
+            # Mantém o id original: a ordem de chegada é preservada
+            conn.execute(
+                f"""INSERT INTO envios (id, aba, linhas, criado_em, id_envio)
+                    SELECT id, aba, linhas, criado_em, id_envio FROM envios_falhos {filtro}""",
+                parametros,
+            )
+            total = conn.execute(f"DELETE FROM envios_falhos {filtro}", parametros).rowcount
+        self._atualizar_medidores()
+        self._sinal.set()
+        return total
+
+    def _mover_para_falhos(self, aba, ids, erro):
+        with self._conectar() as conn:
+            conn.executemany(
+                """INSERT INTO envios_falhos (id, aba, linhas, criado_em, id_envio, erro, falhou_em)
+                   SELECT id, aba, linhas, criado_em, id_envio, ?, ? FROM envios WHERE id = ?""",
+                [(f"{type(erro).__name__}: {erro}", datetime.now().isoformat(timespec="seconds"), i)
+                 for i in ids],
+            )
+            conn.executemany("DELETE FROM envios WHERE id = ?", [(i,) for i in ids])
+        print(f"{len(ids)} envio(s) da aba '{aba}' movido(s) para envios_falhos: {erro}")
+        if self.metricas is not None:
+            self.metricas.contar("envios_falhos", len(ids), aba=aba)
+
+    def _atualizar_medidores(self):
+        if self.metricas is None:
+            return
+        try:
+            self.metricas.definir("spool_pendentes", self.pendentes())
+            self.metricas.definir("spool_falhos", self.falhos())
+        except sqlite3.Error as e:
+            print(f"Falha ao ler o tamanho do spool: {e}")
+
+    def _proximo_lote(self):
+        """Seleciona os envios mais antigos de uma mesma aba até o limite de linhas.
+
+        Retorna (aba, [(id no spool, id_envio, linhas, em_voo)]).
+        """
+        with self._conectar() as conn:
+            primeiro = conn.execute("SELECT aba FROM envios ORDER BY id LIMIT 1").fetchone()
+            if primeiro is None:
+                return None, []
+            aba = primeiro[0]
+            lote, total = [], 0
+            for id_spool, id_envio, linhas_json, em_voo in conn.execute(
+                "SELECT id, id_envio, linhas, em_voo FROM envios WHERE aba = ? ORDER BY id", (aba,)
+            ):
+                linhas_envio = json.loads(linhas_json)
+                if lote and total + len(linhas_envio) > self.linhas_por_lote:
+                    break
+                lote.append((id_spool, id_envio, linhas_envio, em_voo))
+                total += len(linhas_envio)
+        return aba, lote
+
+    def _marcar_em_voo(self, ids, em_voo):
+        with self._conectar() as conn:
+            conn.executemany("UPDATE envios SET em_voo = ? WHERE id = ?", [(em_voo, i) for i in ids])
+
+    def _remover(self, ids):
+        with self._conectar() as conn:
+            conn.executemany("DELETE FROM envios WHERE id = ?", [(i,) for i in ids])
+            conn.execute("DELETE FROM ids_aceitos WHERE aceito_em < ?", (time.time() - RETENCAO_IDS,))
+
+    def _ids_na_planilha(self, ws, aba):
+        """IDs de envio já presentes na aba (lê só a coluna id_envio)."""
+        if eh_aba_larga(aba):
+            coluna = COLUNAS_FIXAS_LARGO.index("id_envio") + 1
+        else:
+            coluna = COLUNAS_LONGAS.index("id_envio") + 1
+        return set(ws.col_values(coluna))
+
+    # --- ELEIÇÃO DO DESCARREGADOR (MODO MULTIPROCESSO) ---
+    def assumir_descarga(self):
+        """Tenta tornar este processo o descarregador do spool. Retorna True se for o líder.
+
+        A trava é do sistema operacional: é liberada quando o processo termina,
+        mesmo sem parar() (queda, kill -9).
+        """
+        if fcntl is None and msvcrt is None:
+            return True
+        if self._arquivo_lider is not None:
+            return True
+        arquivo = open(f"{self.caminho}.lider", "a+")
+        if not _travar(arquivo):
+            arquivo.close()
+            return False
+        arquivo.seek(0)
+        arquivo.truncate()
+        arquivo.write(f"{os.getpid()}\n")
+        arquivo.flush()
+        self._arquivo_lider = arquivo
+        return True
+
+    def liberar_descarga(self):
+        if self._arquivo_lider is not None:
+            _destravar(self._arquivo_lider)
+            self._arquivo_lider.close()
+            self._arquivo_lider = None
+
+    @property
+    def lider(self):
+        return (fcntl is None and msvcrt is None) or self._arquivo_lider is not None
+
+    # --- DESCARGA PARA O GOOGLE SHEETS ---
+    def descarregar(self):
+        """Envia um lote para a planilha. Retorna o número de envios retirados do spool.
+
+        Erros transitórios são propagados e os envios permanecem no spool; com
+        um erro permanente, os envios que falham são movidos para envios_falhos.
+        """
+        aba, lote = self._proximo_lote()
+        if not lote:
+            return 0
+        try:
+            return self._gravar_lote(aba, lote)
+        except Exception as e:
+            if not erro_permanente(e):
+                raise
+            erro = e
+        if len(lote) == 1 or isinstance(erro, CabecalhoIncompativel):
+            self._mover_para_falhos(aba, [i for i, _, _, _ in lote], erro)
+            return len(lote)
+        # Não se sabe qual envio causou o erro: reenvia um a um
+        for envio in lote:
+            try:
+                self._gravar_lote(aba, [envio])
+            except Exception as e:
+                if not erro_permanente(e):
+                    raise
+                self._mover_para_falhos(aba, [envio[0]], e)
+        return len(lote)
+
+    def _gravar_lote(self, aba, lote):
+        ws = self.obter_planilha(aba)
+        if ws is None:
+            raise ConnectionError(f"Aba '{aba}' indisponível.")
+        if any(em_voo for _, _, _, em_voo in lote):
+            # A tentativa anterior pode ter gravado: confere antes de reenviar
+            na_planilha = self._ids_na_planilha(ws, aba)
+            ja_gravados = [i for i, id_envio, _, em_voo in lote if em_voo and id_envio in na_planilha]
+            if ja_gravados:
+                self._remover(ja_gravados)
+                if self.metricas is not None:
+                    self.metricas.contar("envios_ja_gravados", len(ja_gravados), aba=aba)
+                lote = [envio for envio in lote if envio[0] not in ja_gravados]
+                if not lote:
+                    return len(ja_gravados)
+        ids = [i for i, _, _, _ in lote]
+        linhas = [linha for _, _, linhas_envio, _ in lote for linha in linhas_envio]
+        self._marcar_em_voo(ids, 1)
+        try:
+            ws.append_rows(linhas, value_input_option="USER_ENTERED")
+        except Exception as e:
+            if isinstance(e, PlanilhaIndisponivel) or not resultado_incerto(e):
+                self._marcar_em_voo(ids, 0)  # não aplicado com certeza: o reenvio não duplica
+            raise
+        self._remover(ids)
+        if self.metricas is not None:
+            self.metricas.observar("lote_linhas", len(linhas), LIMITES_LINHAS, aba=aba)
+            self.metricas.contar("linhas_gravadas", len(linhas), aba=aba)
+            self.metricas.contar("envios_gravados", len(ids), aba=aba)
+        return len(ids)
+
+    def _espera_backoff(self, erro):
+        """Calcula a espera após uma falha, respeitando Retry-After em 429."""
+        sugerida = retry_after(erro)
+        if sugerida is not None:
+            return min(sugerida, ESPERA_MAXIMA)
+        base = min(ESPERA_MINIMA * (2 ** self._falhas_seguidas), ESPERA_MAXIMA)
+        return base * random.uniform(0.5, 1.0)
+
+    def _loop(self):
+        while not self._parar.is_set():
+            # Envios de outros processos não acordam esta thread: sondagem periódica
+            acordado = self._sinal.wait(timeout=INTERVALO_SONDAGEM)
+            if self._parar.is_set():
+                break
+            self._atualizar_medidores()
+            if not self.assumir_descarga():
+                self._sinal.clear()
+                continue  # Outro processo descarrega o spool
+            if acordado:
+                # Aguarda um pouco para agrupar envios que chegam quase juntos
+                time.sleep(self.janela)
+            self._sinal.clear()
+            while not self._parar.is_set():
+                try:
+                    if self.descarregar() == 0:
+                        self._atualizar_medidores()
+                        break
+                    self._falhas_seguidas = 0
+                    self.ultimo_erro = None
+                except Exception as e:
+                    self._atualizar_medidores()
+                    self.ultimo_erro = e
+                    espera = self._espera_backoff(e)
+                    self._falhas_seguidas += 1
+                    print(f"Falha ao descarregar spool (HTTP {status_http(e)}): {e}. "
+                          f"Nova tentativa em {espera:.1f}s.")
+                    if self._parar.wait(espera):
+                        break
+
+    def iniciar(self):
+        """Inicia a thread descarregadora (recupera pendências de execuções anteriores)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="fila-envio", daemon=True)
+            self._thread.start()
+            self._sinal.set()
+        return self
+
+    def parar(self, timeout=None):
+        """Sinaliza a thread para encerrar e aguarda o término."""
+        self._parar.set()
+        self._sinal.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.liberar_descarga()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lista e reenfileira os envios que falharam no spool.")
+    parser.add_argument("spool", nargs="?", default=CAMINHO_SPOOL_PADRAO, help="Arquivo do spool (SPOOL_PATH).")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    listar = subcomandos.add_parser("listar", help="Lista os envios em envios_falhos.")
+    listar.add_argument("--aba")
+    reenfileirar = subcomandos.add_parser("reenfileirar", help="Devolve envios de envios_falhos à fila.")
+    reenfileirar.add_argument("--aba")
+    reenfileirar.add_argument("--id", type=int, nargs="+", dest="ids", help="Ids no spool (ver 'listar').")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.spool):
+        parser.error(f"spool '{args.spool}' não encontrado.")
+    fila = FilaEnvio(lambda aba: None, caminho=args.spool)
+    if args.comando == "listar":
+        falhos = fila.listar_falhos(args.aba)
+        for envio in falhos:
+            print(f"{envio['id']:>8}  {envio['aba']}  {envio['id_envio'] or '-'}  {envio['linhas']} linhas  "
+                  f"falhou em {envio['falhou_em']}  {envio['erro']}")
+        print(f"{len(falhos)} envio(s) em envios_falhos; {fila.pendentes()} pendente(s) na fila.")
+    else:
+        total = fila.reenfileirar_falhos(args.aba, args.ids)
+        print(f"{total} envio(s) devolvido(s) à fila; o descarregador os envia na próxima sondagem.")
+
+
+if __name__ == "__main__":
+    main()
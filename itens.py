@@ -0,0 +1,91 @@
+# itens.py
+"""Banco de itens: instrumentos versionados em instrumentos/<nome>-<versao>.json.
+
+Cada arquivo é compilado uma vez em um Instrumento com estruturas prontas para
+renderização e pontuação (blocos -> tuplas de itens, máscara reversa, ID ->
+índice da coluna). A compilação é memorizada e refeita apenas quando o mtime
+do arquivo muda; o mtime fica em Instrumento.revisao, para que os caches
+derivados (ex.: o motor de relatório do app) acompanhem a recompilação.
+"""
+import json
+import os
+import re
+import threading
+
+PASTA_INSTRUMENTOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instrumentos")
+INSTRUMENTO_PADRAO = "organizacional-v1"
+COLUNAS_ITENS = ["Bloco", "ID", "Item", "Reverso"]
+
+_CHAVE_VALIDA = re.compile(r"^[a-z0-9_]+-[a-z0-9_.]+$")
+_cache = {}
+_trava = threading.Lock()
+
+
+class InstrumentoInvalido(ValueError):
+    """Chave de instrumento desconhecida ou arquivo de itens malformado."""
+
+
+class Instrumento:
+    """Instrumento compilado (somente leitura)."""
+
+    def __init__(self, chave, dados, revisao=None):
+        self.chave = chave
+        self.revisao = revisao  # mtime (ns) do arquivo compilado
+        self.nome = dados["instrumento"]
+        self.versao = dados["versao"]
+        self.titulo = dados.get("titulo", self.nome)
+        # (Bloco, ID, Item, Reverso) — mesmo formato usado pelos demais módulos
+        self.itens = tuple(
+            (item["bloco"], item["id"], item["item"], item["reverso"]) for item in dados["itens"]
+        )
+        ids = [item_id for _, item_id, _, _ in self.itens]
+        if len(set(ids)) != len(ids):
+            raise InstrumentoInvalido(f"IDs de item repetidos em '{chave}'.")
+        self.indice = {item_id: i for i, item_id in enumerate(ids)}
+        self.reverso = tuple(reverso == "SIM" for _, _, _, reverso in self.itens)
+        agrupados = {}
+        for bloco, item_id, item, _ in self.itens:
+            agrupados.setdefault(bloco, []).append((item_id, f'({item_id}) {item}'))
+        # ((bloco, prefixo, ((ID, rótulo), ...)), ...)
+        self.blocos = tuple(
+            (bloco, itens_bloco[0][0][:2], tuple(itens_bloco))
+            for bloco, itens_bloco in agrupados.items()
+        )
+
+    def __len__(self):
+        return len(self.itens)
+
+
+def caminho_instrumento(chave):
+    if not _CHAVE_VALIDA.match(chave or ""):
+        raise InstrumentoInvalido(f"Chave de instrumento inválida: {chave!r}")
+    return os.path.join(PASTA_INSTRUMENTOS, f"{chave}.json")
+
+
+def carregar_instrumento(chave=INSTRUMENTO_PADRAO):
+    """Retorna o instrumento compilado, recompilando só se o arquivo mudou."""
+    caminho = caminho_instrumento(chave)
+    try:
+        mtime = os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        raise InstrumentoInvalido(f"Instrumento '{chave}' não encontrado.") from None
+    em_cache = _cache.get(chave)
+    if em_cache is not None and em_cache[0] == mtime:
+        return em_cache[1]
+    with _trava:
+        with open(caminho, encoding="utf-8") as arquivo:
+            try:
+                instrumento = Instrumento(chave, json.load(arquivo), revisao=mtime)
+            except (KeyError, TypeError, ValueError) as e:
+                raise InstrumentoInvalido(f"Arquivo de itens inválido '{chave}': {e}") from e
+        _cache[chave] = (mtime, instrumento)
+    return instrumento
+
+
+def listar_instrumentos():
+    """Chaves dos instrumentos disponíveis na pasta."""
+    return sorted(nome[:-5] for nome in os.listdir(PASTA_INSTRUMENTOS) if nome.endswith(".json"))
+
+
+# Itens do instrumento padrão (compatibilidade com os módulos que importam ITENS)
+ITENS = carregar_instrumento().itens
@@ -0,0 +1,311 @@
+# metricas.py
+"""Instrumentação do caminho quente: histogramas em memória e captura de perfil sob demanda.
+
+- Cada seção de uma execução do script (CSS, cabeçalho, verificação do link,
+  questionário, contagem, envio) é cronometrada e somada a um histograma do
+  processo, assim como a latência das chamadas ao Sheets, o tamanho dos
+  envios e as linhas gravadas. Medidores guardam valores atuais, como os
+  envios pendentes e os que falharam de vez no spool.
+- Os histogramas são exportados periodicamente em um arquivo de texto no
+  formato do Prometheus (sobrescrito de forma atômica) ou como um log JSONL
+  (uma linha por exportação). A exportação roda em uma thread própria
+  (iniciar()), e não só ao fim de uma execução completa do script: reruns
+  de fragmento e a thread da fila de envio também entram no arquivo, mesmo
+  em uma réplica que só descarrega o spool. Cada processo tem os seus
+  histogramas: no modo multiprocesso, use "{pid}" no caminho (ex.:
+  metricas-{pid}.prom) para que cada réplica grave o seu próprio arquivo.
+- Um perfil cProfile da execução pode ser capturado por um link de
+  administrador assinado (perfil=<exp>&perfil_sig=<hmac>); sem o parâmetro,
+  nada é ativado.
+
+Com a instrumentação desativada, `cronometro()` devolve um objeto nulo e o
+custo por seção é uma chamada de método vazia.
+"""
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+FORMATO_PROMETHEUS = "prometheus"
+FORMATO_JSONL = "jsonl"
+PREFIXO = "avaliacao"
+INTERVALO_EXPORTACAO = 30.0  # Segundos entre exportações
+
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+LIMITES_LINHAS = (1, 10, 58, 100, 250, 500, 1000)
+
+
+class Histograma:
+    """Histograma cumulativo no estilo do Prometheus (contagens por limite superior)."""
+
+    def __init__(self, limites):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)  # o último é +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def como_dict(self):
+        return {"limites": list(self.limites), "contagens": list(self.contagens),
+                "soma": round(self.soma, 6), "total": self.total}
+
+
+class Cronometro:
+    """Mede uma seção; use com `with` ou chame `parar()`."""
+
+    __slots__ = ("metricas", "nome", "rotulos", "inicio")
+
+    def __init__(self, metricas, nome, rotulos):
+        self.metricas = metricas
+        self.nome = nome
+        self.rotulos = rotulos
+        self.inicio = time.perf_counter()
+
+    def parar(self):
+        if self.inicio is not None:
+            self.metricas.observar(self.nome, time.perf_counter() - self.inicio, **self.rotulos)
+            self.inicio = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.parar()
+
+
+class _CronometroNulo:
+    __slots__ = ()
+
+    def parar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        pass
+
+
+CRONOMETRO_NULO = _CronometroNulo()
+
+
+class Metricas:
+    """Histogramas e contadores do processo, com exportação periódica.
+
+    `caminho=None` mantém tudo só em memória (sem exportação). "{pid}" no
+    caminho é trocado pelo PID do processo.
+    """
+
+    def __init__(self, caminho=None, formato=FORMATO_PROMETHEUS, intervalo=INTERVALO_EXPORTACAO,
+                 ativo=True):
+        self.caminho = caminho.replace("{pid}", str(os.getpid())) if caminho else caminho
+        self.formato = formato
+        self.intervalo = intervalo
+        self.ativo = ativo
+        self._histogramas = {}
+        self._contadores = {}
+        self._medidores = {}
+        self._trava = threading.Lock()
+        self._ultima_exportacao = time.monotonic()
+        self._parar = threading.Event()
+        self._thread = None
+
+    # --- REGISTRO ---
+    def observar(self, nome, valor, limites=LIMITES_SEGUNDOS, **rotulos):
+        if not self.ativo:
+            return
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma(limites)
+            histograma.observar(valor)
+
+    def contar(self, nome, valor=1, **rotulos):
+        if not self.ativo:
+            return
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **rotulos):
+        """Valor atual de um medidor (gauge), ex.: envios pendentes no spool."""
+        if not self.ativo:
+            return
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self._medidores[chave] = valor
+
+    def cronometro(self, secao):
+        """Cronômetro de uma seção do script (histograma secao_segundos)."""
+        if not self.ativo:
+            return CRONOMETRO_NULO
+        return Cronometro(self, "secao_segundos", {"secao": secao})
+
+    # --- EXPORTAÇÃO ---
+    def instantaneo(self):
+        """Cópia dos valores atuais: {"histogramas": [...], "contadores": [...], "medidores": [...]}."""
+        with self._trava:
+            return {
+                "histogramas": [
+                    {"nome": nome, "rotulos": dict(rotulos), **histograma.como_dict()}
+                    for (nome, rotulos), histograma in self._histogramas.items()
+                ],
+                "contadores": [
+                    {"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                    for (nome, rotulos), valor in self._contadores.items()
+                ],
+                "medidores": [
+                    {"nome": nome, "rotulos": dict(rotulos), "valor": valor}
+                    for (nome, rotulos), valor in self._medidores.items()
+                ],
+            }
+
+    def texto_prometheus(self):
+        """Valores no formato de exposição em texto do Prometheus."""
+        dados = self.instantaneo()
+        linhas, tipos = [], set()
+        for h in sorted(dados["histogramas"], key=lambda h: h["nome"]):
+            nome = f"{PREFIXO}_{h['nome']}"
+            if nome not in tipos:
+                linhas.append(f"# TYPE {nome} histogram")
+                tipos.add(nome)
+            acumulado = 0
+            for limite, contagem in zip([*h["limites"], "+Inf"], h["contagens"]):
+                acumulado += contagem
+                linhas.append(f"{nome}_bucket{_rotulos({**h['rotulos'], 'le': limite})} {acumulado}")
+            linhas.append(f"{nome}_sum{_rotulos(h['rotulos'])} {h['soma']}")
+            linhas.append(f"{nome}_count{_rotulos(h['rotulos'])} {h['total']}")
+        for c in sorted(dados["contadores"], key=lambda c: c["nome"]):
+            nome = f"{PREFIXO}_{c['nome']}_total"
+            if nome not in tipos:
+                linhas.append(f"# TYPE {nome} counter")
+                tipos.add(nome)
+            linhas.append(f"{nome}{_rotulos(c['rotulos'])} {c['valor']}")
+        for m in sorted(dados["medidores"], key=lambda m: m["nome"]):
+            nome = f"{PREFIXO}_{m['nome']}"
+            if nome not in tipos:
+                linhas.append(f"# TYPE {nome} gauge")
+                tipos.add(nome)
+            linhas.append(f"{nome}{_rotulos(m['rotulos'])} {m['valor']}")
+        return "\n".join(linhas) + "\n"
+
+    def exportar(self):
+        """Grava os valores atuais no arquivo configurado."""
+        if not self.caminho:
+            return
+        if self.formato == FORMATO_JSONL:
+            registro = {"timestamp": datetime.now().isoformat(timespec="seconds"),
+                        "pid": os.getpid(), **self.instantaneo()}
+            with open(self.caminho, "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        else:
+            temporario = f"{self.caminho}.tmp"
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                arquivo.write(self.texto_prometheus())
+            os.replace(temporario, self.caminho)
+
+    def exportar_se_vencido(self):
+        """Exporta se o intervalo desde a última exportação já passou."""
+        if not (self.ativo and self.caminho):
+            return
+        agora = time.monotonic()
+        with self._trava:
+            if agora - self._ultima_exportacao < self.intervalo:
+                return
+            self._ultima_exportacao = agora
+        try:
+            self.exportar()
+        except OSError as e:
+            print(f"Falha ao exportar métricas para '{self.caminho}': {e}")
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            self.exportar_se_vencido()
+
+    def iniciar(self):
+        """Inicia a thread de exportação periódica (só com a instrumentação ativa e um caminho)."""
+        if self.ativo and self.caminho and (self._thread is None or not self._thread.is_alive()):
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="metricas", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self, timeout=None):
+        """Encerra a thread de exportação e grava os valores finais."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.ativo and self.caminho:
+            self.exportar()
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ""
+    pares = ",".join(f'{chave}="{valor}"' for chave, valor in rotulos.items())
+    return "{" + pares + "}"
+
+
+# --- PERFIL SOB DEMANDA (LINK DE ADMINISTRADOR) ---
+def assinar_perfil(segredo, exp):
+    """Assinatura do parâmetro de perfil: HMAC-SHA256 de 'perfil|<exp>'."""
+    return hmac.new(segredo.encode("utf-8"), f"perfil|{exp}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def perfil_autorizado(segredo, exp, assinatura):
+    """Valida o link de perfil (assinatura e validade). Sem segredo configurado, nunca autoriza."""
+    if not (segredo and exp and assinatura):
+        return False
+    if not hmac.compare_digest(assinar_perfil(segredo, exp), assinatura):
+        return False
+    try:
+        return int(time.time()) <= int(exp)
+    except ValueError:
+        return False
+
+
+class CapturaPerfil:
+    """Perfil cProfile de uma execução do script."""
+
+    def __init__(self):
+        import cProfile
+
+        self.perfil = cProfile.Profile()
+        self.ativo = False
+
+    def iniciar(self):
+        try:
+            self.perfil.enable()
+            self.ativo = True
+        except ValueError:
+            # Outro profiler já ativo no interpretador (Python 3.12+)
+            self.ativo = False
+        return self
+
+    def encerrar(self, pasta=None, linhas=30):
+        """Para a captura e retorna (resumo em texto, caminho do .prof ou None)."""
+        import io
+        import pstats
+
+        if not self.ativo:
+            return "Não foi possível iniciar o perfil (outro profiler ativo).", None
+        self.perfil.disable()
+        self.ativo = False
+        caminho = None
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+            caminho = os.path.join(pasta, f"perfil-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.prof")
+            self.perfil.dump_stats(caminho)
+        saida = io.StringIO()
+        pstats.Stats(self.perfil, stream=saida).sort_stats("cumulative").print_stats(linhas)
+        return saida.getvalue(), caminho
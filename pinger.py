@@ -1,41 +1,164 @@
+import argparse
+import asyncio
+import base64
+import csv
+import http.client
+import json
+import os
+import ssl
 import time
-from playwright.sync_api import sync_playwright
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
 
 # --- CONFIGURAÇÕES ---
-# Coloque a URL completa do seu aplicativo Streamlit aqui
-URL_DO_APP = "https://wedja-organizacional.streamlit.app/" 
-# Coloque o texto exato do botão que você quer clicar
-TEXTO_DO_BOTAO = "Finalizar e Gerar Relatório"
-
-def ping_e_clica():
-    print(f"Iniciando o ping para: {URL_DO_APP}")
-    with sync_playwright() as p:
+# URLs dos apps Streamlit a manter acordados (podem ser passadas na linha de comando)
+URLS_DOS_APPS = ["https://wedja-organizacional.streamlit.app/"]
+# Histórico das sondagens: .csv ou .jsonl (uma linha por sondagem)
+ARQUIVO_HISTORICO = "historico_pinger.csv"
+# Tempo máximo esperando um app adormecido voltar a responder
+ESPERA_MAXIMA_DESPERTAR = 300
+INTERVALO_SONDAGEM = 5
+TIMEOUT_HTTP = 30
+
+# Falhas de rede enquanto o app acorda (conexão recusada/derrubada, timeout, resposta truncada)
+ERROS_DE_REDE = (urllib.error.URLError, http.client.HTTPException, OSError)
+
+CAMPOS_HISTORICO = [
+    "timestamp", "url", "estava_dormindo", "ttfb_s", "latencia_despertar_s",
+    "status_health", "websocket_ok", "erro",
+]
+
+
+def _get(url, timeout=TIMEOUT_HTTP):
+    """GET simples. Retorna (status, corpo, ttfb) — o ttfb vai até a chegada dos cabeçalhos."""
+    requisicao = urllib.request.Request(url, headers={"User-Agent": "wedja-pinger/2.0"})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+            ttfb = time.perf_counter() - inicio
+            return resposta.status, resposta.read(4096).decode("utf-8", "replace"), ttfb
+    except urllib.error.HTTPError as e:
+        return e.code, e.read(4096).decode("utf-8", "replace"), time.perf_counter() - inicio
+
+
+async def _abrir_websocket(url, timeout=TIMEOUT_HTTP):
+    """Faz o handshake no /_stcore/stream (o mesmo canal do navegador) e fecha em seguida."""
+    partes = urllib.parse.urlsplit(url)
+    seguro = partes.scheme == "https"
+    porta = partes.port or (443 if seguro else 80)
+    caminho = partes.path.rstrip("/") + "/_stcore/stream"
+    chave = base64.b64encode(os.urandom(16)).decode()
+    leitor, escritor = await asyncio.wait_for(
+        asyncio.open_connection(partes.hostname, porta,
+                                ssl=ssl.create_default_context() if seguro else None),
+        timeout,
+    )
+    try:
+        escritor.write((
+            f"GET {caminho} HTTP/1.1\r\nHost: {partes.netloc}\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {chave}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        await escritor.drain()
+        linha_status = await asyncio.wait_for(leitor.readline(), timeout)
+        return b" 101 " in linha_status
+    finally:
+        escritor.close()
+
+
+def _acordado(status, corpo):
+    return status == 200 and corpo.strip().lower() == "ok"
+
+
+async def sondar(url, espera_maxima=ESPERA_MAXIMA_DESPERTAR, intervalo=INTERVALO_SONDAGEM):
+    """Sonda um app: health, detecção de sono, espera pelo despertar e websocket."""
+    base = url.rstrip("/")
+    registro = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "url": url, "estava_dormindo": False, "ttfb_s": None, "latencia_despertar_s": None,
+        "status_health": None, "websocket_ok": None, "erro": "",
+    }
+    try:
         try:
-            # Inicia o navegador (headless=True roda em segundo plano, sem abrir janela)
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            # Navega até a URL do seu app
-            print("Acessando a página...")
-            page.goto(URL_DO_APP, timeout=120000) # Timeout de 2 minutos para carregar
-            
-            # Espera um tempo extra para o Streamlit renderizar tudo
-            print("Página carregada. Aguardando 10 segundos para renderização completa...")
-            time.sleep(10)
-            
-            # Clica no botão
-            print(f"Procurando e clicando no botão com o texto: '{TEXTO_DO_BOTAO}'")
-            page.locator("#autoclick-div button").click()
-            
-            # Espera mais um pouco para a ação do clique ser processada
-            print("Botão clicado. Aguardando 5 segundos...")
-            time.sleep(5)
-            
-            browser.close()
-            print("Ping com clique concluído com sucesso!")
-
-        except Exception as e:
-            print(f"Ocorreu um erro: {e}")
+            status, corpo, ttfb = await asyncio.to_thread(_get, f"{base}/_stcore/health")
+            registro["ttfb_s"] = round(ttfb, 3)
+        except ERROS_DE_REDE:
+            status, corpo = None, ""  # sem resposta: tratado como adormecido
+        registro["status_health"] = status
+
+        if not _acordado(status, corpo):
+            # App adormecido (ou reiniciando): o acesso à página principal dispara o despertar
+            registro["estava_dormindo"] = True
+            inicio = time.perf_counter()
+            ultimo_erro = None
+            try:
+                await asyncio.to_thread(_get, base + "/")
+            except ERROS_DE_REDE as e:
+                ultimo_erro = e
+            while time.perf_counter() - inicio < espera_maxima:
+                await asyncio.sleep(intervalo)
+                try:
+                    status, corpo, _ = await asyncio.to_thread(_get, f"{base}/_stcore/health")
+                except ERROS_DE_REDE as e:
+                    # Enquanto acorda, o app pode recusar ou derrubar conexões: continua sondando
+                    ultimo_erro = e
+                    registro["status_health"] = None
+                    continue
+                registro["status_health"] = status
+                if _acordado(status, corpo):
+                    registro["latencia_despertar_s"] = round(time.perf_counter() - inicio, 3)
+                    break
+            else:
+                registro["erro"] = f"App não acordou em {espera_maxima}s"
+                if ultimo_erro is not None:
+                    registro["erro"] += f" (último erro: {type(ultimo_erro).__name__}: {ultimo_erro})"
+
+        registro["websocket_ok"] = await _abrir_websocket(base)
+    except Exception as e:
+        registro["erro"] = f"{type(e).__name__}: {e}"
+    return registro
+
+
+def gravar_historico(registros, caminho=ARQUIVO_HISTORICO):
+    """Acrescenta as sondagens ao histórico (CSV ou JSONL, conforme a extensão)."""
+    if caminho.endswith(".jsonl"):
+        with open(caminho, "a", encoding="utf-8") as arquivo:
+            for registro in registros:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        return
+    novo = not os.path.exists(caminho)
+    with open(caminho, "a", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_HISTORICO)
+        if novo:
+            escritor.writeheader()
+        escritor.writerows(registros)
+
+
+async def sondar_todos(urls, espera_maxima=ESPERA_MAXIMA_DESPERTAR, intervalo=INTERVALO_SONDAGEM):
+    return await asyncio.gather(*(sondar(url, espera_maxima, intervalo) for url in urls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantém apps Streamlit acordados via HTTP/websocket.")
+    parser.add_argument("urls", nargs="*", default=URLS_DOS_APPS)
+    parser.add_argument("--historico", default=ARQUIVO_HISTORICO)
+    parser.add_argument("--espera-maxima", type=float, default=ESPERA_MAXIMA_DESPERTAR)
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_SONDAGEM)
+    args = parser.parse_args()
+
+    registros = asyncio.run(sondar_todos(args.urls, args.espera_maxima, args.intervalo))
+    gravar_historico(registros, args.historico)
+    for registro in registros:
+        if registro["erro"]:
+            print(f"{registro['url']}: ERRO: {registro['erro']}")
+            continue
+        estado = "acordou" if registro["estava_dormindo"] else "já estava acordado"
+        print(f"{registro['url']}: {estado} | TTFB {registro['ttfb_s']}s | "
+              f"despertar {registro['latencia_despertar_s']}s | websocket {registro['websocket_ok']}")
+    return 1 if any(registro["erro"] for registro in registros) else 0
+
 
 if __name__ == "__main__":
-    ping_e_clica()
\ No newline at end of file
+    raise SystemExit(main())
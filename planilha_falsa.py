@@ -0,0 +1,145 @@
+# planilha_falsa.py
+"""Planilha e aba falsas, em memória, com a mesma interface usada do gspread.
+
+Usadas para exercitar a fila de envio, o cliente resiliente, a exportação e os
+benchmarks sem acesso à rede. A aba pode injetar latência e erros 429.
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+
+class RespostaHttpFalsa:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ErroHttpFalso(Exception):
+    """Imita o APIError do gspread: expõe `.response.status_code` e `.response.headers`."""
+
+    def __init__(self, status_code, mensagem="erro simulado", retry_after=None):
+        super().__init__(f"{status_code}: {mensagem}")
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self.response = RespostaHttpFalsa(status_code, headers)
+
+
+def _coluna_para_indice(letras):
+    indice = 0
+    for letra in letras.upper():
+        indice = indice * 26 + (ord(letra) - ord("A") + 1)
+    return indice
+
+
+_INTERVALO_A1 = re.compile(r"^([A-Za-z]+)(\d+)(?::([A-Za-z]+)(\d*))?$")
+
+
+class AbaFalsa:
+    """Aba em memória. `latencia` em segundos por chamada; `taxa_429` em [0, 1]."""
+
+    def __init__(self, title, linhas=None, latencia=0.0, taxa_429=0.0, semente=None):
+        self.title = title
+        self.linhas = [list(linha) for linha in (linhas or [])]
+        self.latencia = latencia
+        self.taxa_429 = taxa_429
+        self.chamadas = Counter()
+        self._aleatorio = random.Random(semente)
+        self._trava = threading.Lock()
+
+    def _chamada(self, metodo):
+        with self._trava:
+            self.chamadas[metodo] += 1
+            falhar = self.taxa_429 and self._aleatorio.random() < self.taxa_429
+        if self.latencia:
+            time.sleep(self.latencia)
+        if falhar:
+            raise ErroHttpFalso(429, "Quota exceeded (simulado)")
+
+    @property
+    def row_count(self):
+        return len(self.linhas)
+
+    def append_rows(self, values, value_input_option=None, **kwargs):
+        self._chamada("append_rows")
+        with self._trava:
+            self.linhas.extend([list(linha) for linha in values])
+
+    def append_row(self, values, value_input_option=None, **kwargs):
+        self.append_rows([values], value_input_option=value_input_option)
+
+    def get_all_values(self, **kwargs):
+        self._chamada("get_all_values")
+        with self._trava:
+            return [list(map(str, linha)) for linha in self.linhas]
+
+    def row_values(self, row, **kwargs):
+        self._chamada("row_values")
+        with self._trava:
+            if row > len(self.linhas):
+                return []
+            return list(map(str, self.linhas[row - 1]))
+
+    def col_values(self, col, **kwargs):
+        self._chamada("col_values")
+        with self._trava:
+            return [str(linha[col - 1]) if len(linha) >= col else "" for linha in self.linhas]
+
+    def clear(self, **kwargs):
+        self._chamada("clear")
+        with self._trava:
+            self.linhas = []
+
+    def resize(self, rows=None, cols=None, **kwargs):
+        """Só registra a chamada: a aba falsa não tem grade de tamanho fixo."""
+        self._chamada("resize")
+
+    def get(self, range_name=None, **kwargs):
+        """Lê um intervalo A1 (ex.: 'A2:I1001' ou 'A2:I', aberto até o fim)."""
+        self._chamada("get")
+        casamento = _INTERVALO_A1.match(range_name or "")
+        if casamento is None:
+            raise ValueError(f"Intervalo não suportado pela aba falsa: {range_name}")
+        col_ini, lin_ini, col_fim, lin_fim = casamento.groups()
+        c0 = _coluna_para_indice(col_ini) - 1
+        c1 = _coluna_para_indice(col_fim) if col_fim else None
+        l0 = int(lin_ini) - 1
+        with self._trava:
+            l1 = int(lin_fim) if lin_fim else len(self.linhas)
+            return [list(map(str, linha[c0:c1])) for linha in self.linhas[l0:l1]]
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self._chamada("update")
+        casamento = _INTERVALO_A1.match(range_name or "A1")
+        l0 = int(casamento.group(2)) - 1
+        with self._trava:
+            while len(self.linhas) < l0 + len(values):
+                self.linhas.append([])
+            for deslocamento, linha in enumerate(values):
+                self.linhas[l0 + deslocamento] = list(linha)
+
+
+class PlanilhaFalsa:
+    """Planilha em memória; as abas são criadas sob demanda com os mesmos parâmetros."""
+
+    def __init__(self, **parametros_aba):
+        self.parametros_aba = parametros_aba
+        self.abas = {}
+        self._trava = threading.Lock()
+
+    def worksheet(self, nome):
+        with self._trava:
+            if nome not in self.abas:
+                self.abas[nome] = AbaFalsa(nome, **self.parametros_aba)
+            return self.abas[nome]
+
+    def worksheets(self):
+        return list(self.abas.values())
+
+    def chamadas(self):
+        """Total de chamadas de API por método, somando todas as abas."""
+        total = Counter()
+        for aba in self.abas.values():
+            total.update(aba.chamadas)
+        return total
@@ -0,0 +1,142 @@
+# pontuacao.py
+"""Motor de pontuação vetorizado (um respondente ou lotes inteiros de envios).
+
+As respostas são tratadas como uma matriz respondentes × itens, na ordem do
+banco de itens. "N/A" e respostas ausentes viram NaN; itens reversos são
+pontuados como 6 - valor por meio de uma máscara booleana.
+
+A repontuação de dados históricos (psicometria.py lê a resposta gravada, não a
+pontuação) usa o mesmo núcleo. O pandas só é importado pelas funções de
+lote/repontuação, para que o caminho de envio (itens_pontuados) carregue
+apenas o NumPy.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from itens import ITENS
+
+NA = "N/A"
+
+
+class _Banco:
+    """Arrays pré-calculados de um banco de itens (IDs, blocos, máscara reversa)."""
+
+    def __init__(self, itens):
+        self.itens = tuple(itens)
+        self.ids = [item_id for _, item_id, _, _ in self.itens]
+        self.indice = {item_id: i for i, item_id in enumerate(self.ids)}
+        self.reverso = np.array([reverso == "SIM" for _, _, _, reverso in self.itens])
+        self.blocos = list(dict.fromkeys(bloco for bloco, _, _, _ in self.itens))
+        codigos_bloco = {bloco: i for i, bloco in enumerate(self.blocos)}
+        self.bloco_por_item = np.array([codigos_bloco[bloco] for bloco, _, _, _ in self.itens])
+
+
+@lru_cache(maxsize=8)
+def _banco_de(itens):
+    return _Banco(itens)
+
+
+def _banco(itens):
+    return _banco_de(tuple(itens))
+
+
+def _valor(resposta):
+    """Converte uma resposta isolada em float (NaN para N/A, vazio ou inválido)."""
+    if resposta is None or resposta == NA or resposta == "":
+        return np.nan
+    try:
+        return float(resposta)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# --- NÚCLEO VETORIZADO ---
+def pontuar_matriz(valores, itens=ITENS):
+    """Aplica a inversão dos itens reversos a uma matriz (n × itens) de respostas."""
+    valores = np.asarray(valores, dtype=float)
+    return np.where(_banco(itens).reverso, 6.0 - valores, valores)
+
+
+def _para_float(brutas):
+    """Converte uma matriz de respostas brutas (objetos) em float (NaN para N/A, vazio ou inválido).
+
+    Há poucas respostas distintas (1–5, "N/A", vazio): cada uma é convertida
+    uma única vez e espalhada na matriz pelos códigos do factorize.
+    """
+    import pandas as pd
+
+    brutas = np.asarray(brutas, dtype=object)
+    codigos, distintas = pd.factorize(brutas.ravel())
+    valores = pd.to_numeric(pd.Series(distintas, dtype=object), errors="coerce").to_numpy(dtype=float)
+    # Código -1 (None/NaN) aponta para o NaN acrescentado ao final
+    return np.append(valores, np.nan)[codigos].reshape(brutas.shape)
+
+
+def matriz_respostas(envios, itens=ITENS):
+    """Monta a matriz n × itens a partir de uma lista de dicionários {ID: resposta}."""
+    import pandas as pd
+
+    brutas = pd.DataFrame.from_records(envios, columns=_banco(itens).ids)
+    return _para_float(brutas.to_numpy(dtype=object))
+
+
+def medias_por_bloco(pontuacoes, itens=ITENS):
+    """Média por bloco (ignorando NaN) de uma matriz de pontuações. Retorna DataFrame n × blocos."""
+    import pandas as pd
+
+    banco = _banco(itens)
+    pontuacoes = np.atleast_2d(pontuacoes)
+    validos = ~np.isnan(pontuacoes)
+    soma = np.nan_to_num(pontuacoes)
+    medias = np.full((pontuacoes.shape[0], len(banco.blocos)), np.nan)
+    for codigo in range(len(banco.blocos)):
+        colunas = banco.bloco_por_item == codigo
+        contagem = validos[:, colunas].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias[:, codigo] = soma[:, colunas].sum(axis=1) / contagem
+    return pd.DataFrame(medias, columns=banco.blocos)
+
+
+def pontuar_lote(envios, itens=ITENS):
+    """Pontua uma lista de envios {ID: resposta}. Retorna a matriz de pontuações."""
+    return pontuar_matriz(matriz_respostas(envios, itens), itens)
+
+
+# --- UM RESPONDENTE (CAMINHO DE ENVIO) ---
+def itens_pontuados(respostas, itens=ITENS):
+    """Pontua as respostas de um respondente.
+
+    Retorna tuplas (ID, Bloco, Item, Resposta, Pontuação) na ordem do banco,
+    com "N/A" onde não houver resposta válida.
+    """
+    banco = _banco(itens)
+    brutas = [respostas.get(item_id) for item_id in banco.ids]
+    valores = np.array([_valor(r) for r in brutas])
+    pontos = np.where(banco.reverso, 6.0 - valores, valores)
+    return [
+        (item_id, bloco, item,
+         NA if resposta is None else resposta,
+         NA if np.isnan(ponto) else int(ponto))
+        for (bloco, item_id, item, _), resposta, ponto in zip(banco.itens, brutas, pontos)
+    ]
+
+
+# --- REPONTUAÇÃO DE DADOS HISTÓRICOS ---
+def repontuar_longo(df, itens=ITENS):
+    """Recalcula a pontuação de um DataFrame no layout longo (colunas item e resposta).
+
+    Retorna uma Series float alinhada ao DataFrame (NaN para N/A ou itens desconhecidos).
+    """
+    import pandas as pd
+
+    reverso_por_texto = pd.Series({item: reverso == "SIM" for _, _, item, reverso in itens})
+    valores = pd.to_numeric(df["resposta"], errors="coerce")
+    reverso = df["item"].map(reverso_por_texto)
+    pontos = valores.mask(reverso.eq(True), 6 - valores)
+    return pontos.where(reverso.notna())
+
+
+def repontuar_largo(matriz_brutas, itens=ITENS):
+    """Recalcula pontuações a partir das colunas de resposta do layout largo (n × itens)."""
+    return pontuar_matriz(_para_float(matriz_brutas), itens)
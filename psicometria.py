@@ -0,0 +1,216 @@
+# psicometria.py
+"""Estatísticas psicométricas por bloco, vetorizadas sobre a matriz respondentes × itens.
+
+A entrada é a matriz de pontuações (reversos já invertidos, como produzido por
+pontuacao.pontuar_matriz), com NaN para N/A. Dados exportados são repontuados
+a partir da coluna de resposta com a chave de reversos do instrumento, de modo
+que uma pontuação gravada por uma versão antiga do app não distorce a análise
+(--pontuacao-gravada usa a coluna de pontuação como está).
+
+As covariâncias entre itens são calculadas par a par apenas com os
+respondentes que responderam aos dois itens, em poucas multiplicações de
+matrizes; alfa de Cronbach, correlação item-total corrigida e alfa sem o item
+saem dessa matriz de covariância. Pisos e tetos são as taxas de pontuação 1
+e 5 entre as respostas válidas.
+
+Uso: python psicometria.py dados.(parquet|csv|xlsx) [--org ID] [--instrumento CHAVE]
+                           [--pontuacao-gravada] [--saida resultado.json]
+"""
+import argparse
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from itens import INSTRUMENTO_PADRAO, ITENS, carregar_instrumento
+
+MAX_RESULTADOS_EM_CACHE = 32
+_cache = OrderedDict()
+
+
+def covariancia_pareada(matriz):
+    """Covariância amostral par a par (NaN-aware). Retorna (cov, n_pares)."""
+    observado = ~np.isnan(matriz)
+    x = np.where(observado, matriz, 0.0)
+    m = observado.astype(float)
+    n = m.T @ m                      # respondentes com ambos os itens
+    soma_xy = x.T @ x
+    soma_x_dado_y = x.T @ m          # soma de x_i onde x_j foi respondido
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = (soma_xy - soma_x_dado_y * soma_x_dado_y.T / n) / (n - 1)
+    return cov, n
+
+
+def _alfa(k, traco, soma_total):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return k / (k - 1) * (1 - traco / soma_total)
+
+
+def estatisticas_bloco(matriz):
+    """Alfa, correlação item-total corrigida e alfa sem o item para um bloco (n × k)."""
+    k = matriz.shape[1]
+    cov, _ = covariancia_pareada(matriz)
+    variancias = np.diag(cov)
+    soma_total = np.nansum(cov)
+    soma_linhas = np.nansum(cov, axis=1)
+    traco = np.nansum(variancias)
+
+    cov_item_resto = soma_linhas - variancias
+    var_resto = soma_total - 2 * soma_linhas + variancias
+    with np.errstate(invalid="ignore", divide="ignore"):
+        correlacao_item_total = cov_item_resto / np.sqrt(variancias * var_resto)
+    alfa_sem_item = _alfa(k - 1, traco - variancias, var_resto) if k > 2 else np.full(k, np.nan)
+    return {
+        "alfa": float(_alfa(k, traco, soma_total)) if k > 1 else float("nan"),
+        "correlacao_item_total": correlacao_item_total,
+        "alfa_sem_item": alfa_sem_item,
+    }
+
+
+def analisar(matriz, itens=ITENS, versao=None):
+    """Analisa a matriz n × itens e retorna um dict por bloco e por item.
+
+    Com `versao` (ex.: instrumento e versão dos dados da organização), o resultado
+    é reaproveitado enquanto a versão e o conteúdo do banco de itens não mudarem.
+    """
+    chave = (versao, tuple(itens)) if versao is not None else None
+    if chave is not None and chave in _cache:
+        _cache.move_to_end(chave)
+        return _cache[chave]
+
+    matriz = np.asarray(matriz, dtype=float)
+    observado = ~np.isnan(matriz)
+    validos = observado.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        taxa_na = 1 - validos / matriz.shape[0]
+        taxa_piso = (matriz == 1).sum(axis=0) / validos
+        taxa_teto = (matriz == 5).sum(axis=0) / validos
+        medias = np.nansum(matriz, axis=0) / validos
+
+    blocos = list(dict.fromkeys(bloco for bloco, _, _, _ in itens))
+    bloco_por_item = np.array([blocos.index(bloco) for bloco, _, _, _ in itens])
+    resultado = {"respondentes": int(matriz.shape[0]), "blocos": [], "itens": []}
+    por_item = {}
+    for codigo, bloco in enumerate(blocos):
+        colunas = np.flatnonzero(bloco_por_item == codigo)
+        estatisticas = estatisticas_bloco(matriz[:, colunas])
+        resultado["blocos"].append({
+            "bloco": bloco, "itens": int(len(colunas)), "alfa": _arredondar(estatisticas["alfa"]),
+        })
+        for posicao, coluna in enumerate(colunas):
+            por_item[coluna] = (estatisticas["correlacao_item_total"][posicao],
+                                estatisticas["alfa_sem_item"][posicao])
+
+    for coluna, (bloco, item_id, _, reverso) in enumerate(itens):
+        correlacao, alfa_sem = por_item[coluna]
+        resultado["itens"].append({
+            "id": item_id, "bloco": bloco, "reverso": reverso == "SIM",
+            "n": int(validos[coluna]), "media": _arredondar(medias[coluna]),
+            "taxa_na": _arredondar(taxa_na[coluna]), "taxa_piso": _arredondar(taxa_piso[coluna]),
+            "taxa_teto": _arredondar(taxa_teto[coluna]),
+            "correlacao_item_total": _arredondar(correlacao), "alfa_sem_item": _arredondar(alfa_sem),
+        })
+
+    if chave is not None:
+        _cache[chave] = resultado
+        if len(_cache) > MAX_RESULTADOS_EM_CACHE:
+            _cache.popitem(last=False)
+    return resultado
+
+
+def _arredondar(valor, casas=4):
+    valor = float(valor)
+    return None if np.isnan(valor) else round(valor, casas)
+
+
+# --- LEITURA DE DADOS EXPORTADOS ---
+def matriz_de_dataframe(df, itens=ITENS, instrumento=INSTRUMENTO_PADRAO, repontuar=True):
+    """Matriz de pontuações a partir de um DataFrame exportado (layout longo ou largo).
+
+    Com `repontuar`, as pontuações são recalculadas das respostas
+    (pontuacao.repontuar_longo/repontuar_largo); sem ele, vêm da coluna de
+    pontuação gravada. No layout longo, as linhas (na ordem da aba) são separadas em envios por
+    armazenamento.AgrupadorEnviosLongos. Nos dois layouts, cópias de um mesmo
+    id_envio contam uma vez.
+    """
+    import pandas as pd
+
+    from armazenamento import COLUNAS_LONGAS, SUFIXO_PONTUACAO, SUFIXO_RESPOSTA, AgrupadorEnviosLongos
+    from pontuacao import repontuar_largo, repontuar_longo
+
+    if "instrumento" in df.columns:
+        df = df[df["instrumento"].fillna("").replace("", INSTRUMENTO_PADRAO) == instrumento]
+
+    ids = [item_id for _, item_id, _, _ in itens]
+    colunas_largas = [f"{item_id}{SUFIXO_PONTUACAO}" for item_id in ids]
+    if set(colunas_largas) <= set(df.columns):
+        if "id_envio" in df.columns:
+            df = df[(df["id_envio"].fillna("") == "") | ~df["id_envio"].duplicated()]
+        if repontuar:
+            return repontuar_largo(df[[f"{item_id}{SUFIXO_RESPOSTA}" for item_id in ids]].to_numpy(), itens)
+        return df[colunas_largas].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+    agrupador, envios, primeiro_por_id = AgrupadorEnviosLongos(), [], {}
+    linhas = df.reindex(columns=COLUNAS_LONGAS).fillna("").astype(str).values.tolist()
+    for indice, linha in enumerate(linhas):
+        if agrupador.novo_envio(linha):
+            envio = indice
+            if isinstance(agrupador.chave, str):
+                # Um id_envio repetido (lote gravado duas vezes) volta ao envio da primeira cópia
+                envio = primeiro_por_id.setdefault(agrupador.chave, indice)
+        envios.append(envio)
+    id_por_texto = {item: item_id for _, item_id, item, _ in itens}
+    longo = df.assign(
+        envio=envios,
+        item_id=df["item"].map(id_por_texto),
+        pontos=repontuar_longo(df, itens) if repontuar else pd.to_numeric(df["pontuacao"], errors="coerce"),
+    ).dropna(subset=["item_id"])
+    tabela = longo.pivot_table(
+        index="envio", columns="item_id", values="pontos", aggfunc="first", dropna=False, sort=False,
+    )
+    return tabela.reindex(columns=ids).to_numpy(dtype=float)
+
+
+def ler_dados(caminho, id_organizacao=None):
+    import pandas as pd
+
+    if caminho.endswith(".csv"):
+        df = pd.read_csv(caminho, dtype=str)
+    elif caminho.endswith(".xlsx"):
+        df = pd.read_excel(caminho, dtype=str)
+    else:
+        df = pd.read_parquet(caminho)
+    if id_organizacao is not None:
+        df = df[df["id_organizacao"].astype(str) == id_organizacao]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estatísticas psicométricas por bloco e por item.")
+    parser.add_argument("dados", help="Arquivo exportado (.parquet, .csv ou .xlsx), layout longo ou largo.")
+    parser.add_argument("--org", help="Filtra por id_organizacao.")
+    parser.add_argument("--instrumento", default=INSTRUMENTO_PADRAO)
+    parser.add_argument("--pontuacao-gravada", action="store_true",
+                        help="Usa a coluna de pontuação gravada em vez de repontuar as respostas.")
+    parser.add_argument("--saida", help="Grava o resultado em JSON.")
+    args = parser.parse_args()
+
+    from pontuacao import medias_por_bloco
+
+    itens = carregar_instrumento(args.instrumento).itens
+    matriz = matriz_de_dataframe(ler_dados(args.dados, args.org), itens, args.instrumento,
+                                 repontuar=not args.pontuacao_gravada)
+    resultado = analisar(matriz, itens)
+    # Média do bloco: média, entre os respondentes, da média de cada um no bloco
+    medias = medias_por_bloco(matriz, itens).mean()
+    print(f"Respondentes: {resultado['respondentes']}")
+    for bloco in resultado["blocos"]:
+        bloco["media"] = _arredondar(medias[bloco["bloco"]])
+        print(f"  {bloco['bloco']:<45} itens={bloco['itens']:>2}  alfa={bloco['alfa']}  media={bloco['media']}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
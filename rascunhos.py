@@ -0,0 +1,200 @@
+# rascunhos.py
+"""Rascunhos das respostas em andamento, para retomar o questionário após uma queda.
+
+As respostas são codificadas com largura fixa, um byte por item na ordem do
+instrumento: 0 = sem resposta, 1–5 = escala Likert, 6 = N/A. O rascunho fica
+em SQLite local sob uma chave derivada do token de retomada do navegador
+(um cookie aleatório, nunca a URL), da assinatura do link e do instrumento;
+só é restaurado no mesmo navegador e pelo mesmo link.
+
+A gravação é adiada (debounce): `agendar` só atualiza um dicionário em
+memória e uma thread grava o rascunho depois de `espera` segundos sem novas
+mudanças. A mesma thread remove os rascunhos com mais de `ttl` segundos.
+"""
+import sqlite3
+import threading
+import time
+
+CAMINHO_RASCUNHOS_PADRAO = "rascunhos.sqlite3"
+TTL_PADRAO = 7 * 24 * 3600      # Rascunhos sem alteração há mais tempo são removidos (segundos)
+ESPERA_GRAVACAO = 2.0           # Silêncio necessário antes de gravar um rascunho (segundos)
+INTERVALO_EXPURGO = 3600.0      # Intervalo entre remoções de rascunhos vencidos (segundos)
+
+CODIGO_SEM_RESPOSTA = 0
+CODIGO_NA = 6
+
+
+# --- CODIFICAÇÃO (UM BYTE POR ITEM) ---
+def codigo_resposta(resposta):
+    if resposta is None:
+        return CODIGO_SEM_RESPOSTA
+    if resposta == "N/A":
+        return CODIGO_NA
+    return int(resposta)
+
+
+def resposta_do_codigo(codigo):
+    if codigo == CODIGO_SEM_RESPOSTA:
+        return None
+    if codigo == CODIGO_NA:
+        return "N/A"
+    return int(codigo)
+
+
+def codificar(respostas, instrumento):
+    """{ID: resposta} -> bytes na ordem dos itens do instrumento."""
+    dados = bytearray(len(instrumento))
+    for item_id, resposta in respostas.items():
+        indice = instrumento.indice.get(item_id)
+        if indice is not None:
+            dados[indice] = codigo_resposta(resposta)
+    return bytes(dados)
+
+
+def decodificar(dados, instrumento):
+    """bytes -> {ID: resposta} apenas com os itens respondidos ({} se o tamanho não bate)."""
+    if dados is None or len(dados) != len(instrumento):
+        return {}
+    return {
+        item_id: resposta_do_codigo(codigo)
+        for (_, item_id, _, _), codigo in zip(instrumento.itens, dados)
+        if codigo != CODIGO_SEM_RESPOSTA and codigo <= CODIGO_NA
+    }
+
+
+# --- ARMAZENAMENTO ---
+class ArmazemRascunhos:
+    """Rascunhos por token de retomada, em SQLite, com gravação adiada e expiração.
+
+    Um rascunho é um dict com: link (assinatura do link), instrumento,
+    respostas (bytes), respondente e id_envio.
+    """
+
+    CAMPOS = ("link", "instrumento", "respostas", "respondente", "id_envio")
+
+    def __init__(self, caminho=CAMINHO_RASCUNHOS_PADRAO, ttl=TTL_PADRAO, espera=ESPERA_GRAVACAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.espera = espera
+        self._pendentes = {}  # token -> (rascunho, momento da última mudança)
+        self._trava = threading.Lock()
+        self._sinal = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._proximo_expurgo = 0.0
+        self._criar_tabela()
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    def _criar_tabela(self):
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")  # arquivo compartilhado no modo multiprocesso
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS rascunhos (
+                       token TEXT PRIMARY KEY,
+                       link TEXT,
+                       instrumento TEXT NOT NULL,
+                       respostas BLOB NOT NULL,
+                       respondente TEXT,
+                       id_envio TEXT,
+                       atualizado_em REAL NOT NULL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS rascunhos_atualizado_em ON rascunhos (atualizado_em)")
+
+    def agendar(self, token, rascunho):
+        """Registra a versão mais recente do rascunho; a gravação ocorre após `espera` s sem mudanças."""
+        with self._trava:
+            self._pendentes[token] = (dict(rascunho), time.monotonic())
+        self._sinal.set()
+
+    def salvar(self, token, rascunho):
+        """Grava o rascunho imediatamente."""
+        with self._conectar() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO rascunhos
+                   (token, link, instrumento, respostas, respondente, id_envio, atualizado_em)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (token, *(rascunho.get(campo) for campo in self.CAMPOS), time.time()),
+            )
+
+    def carregar(self, token):
+        """Rascunho do token (o pendente em memória, se houver) ou None se ausente/vencido."""
+        with self._trava:
+            pendente = self._pendentes.get(token)
+        if pendente is not None:
+            return dict(pendente[0])
+        with self._conectar() as conn:
+            linha = conn.execute(
+                f"SELECT {', '.join(self.CAMPOS)} FROM rascunhos WHERE token = ? AND atualizado_em >= ?",
+                (token, time.time() - self.ttl),
+            ).fetchone()
+        if linha is None:
+            return None
+        rascunho = dict(zip(self.CAMPOS, linha))
+        rascunho["respostas"] = bytes(rascunho["respostas"])
+        return rascunho
+
+    def remover(self, token):
+        with self._trava:
+            self._pendentes.pop(token, None)
+        with self._conectar() as conn:
+            conn.execute("DELETE FROM rascunhos WHERE token = ?", (token,))
+
+    def expurgar(self):
+        """Remove os rascunhos vencidos. Retorna quantos foram removidos."""
+        with self._conectar() as conn:
+            return conn.execute(
+                "DELETE FROM rascunhos WHERE atualizado_em < ?", (time.time() - self.ttl,)
+            ).rowcount
+
+    # --- GRAVAÇÃO ADIADA ---
+    def gravar_pendentes(self, todos=False):
+        """Grava os rascunhos parados há pelo menos `espera` s (ou todos). Retorna a espera até o próximo."""
+        agora = time.monotonic()
+        with self._trava:
+            vencidos = [
+                (token, rascunho) for token, (rascunho, momento) in self._pendentes.items()
+                if todos or agora - momento >= self.espera
+            ]
+        for token, rascunho in vencidos:
+            self.salvar(token, rascunho)
+        with self._trava:
+            for token, rascunho in vencidos:
+                # Só descarta se não houve mudança enquanto gravava
+                if token in self._pendentes and self._pendentes[token][0] == rascunho:
+                    del self._pendentes[token]
+            momentos = [momento for _, momento in self._pendentes.values()]
+        return max(0.0, min(momentos) + self.espera - agora) if momentos else None
+
+    def _loop(self):
+        proxima = None
+        while not self._parar.is_set():
+            self._sinal.wait(timeout=INTERVALO_EXPURGO if proxima is None else proxima)
+            self._sinal.clear()
+            try:
+                proxima = self.gravar_pendentes()
+                if time.monotonic() >= self._proximo_expurgo:
+                    self.expurgar()
+                    self._proximo_expurgo = time.monotonic() + INTERVALO_EXPURGO
+            except sqlite3.Error as e:
+                print(f"Falha ao gravar rascunhos: {e}")
+                proxima = self.espera
+        self.gravar_pendentes(todos=True)
+
+    def iniciar(self):
+        """Inicia a thread de gravação (e expurga os rascunhos vencidos)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name="rascunhos", daemon=True)
+            self._thread.start()
+            self._sinal.set()
+        return self
+
+    def parar(self, timeout=None):
+        """Grava o que estiver pendente e encerra a thread."""
+        self._parar.set()
+        self._sinal.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
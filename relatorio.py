@@ -0,0 +1,360 @@
+# relatorio.py
+"""Agregação incremental por organização e bloco, com gráficos em cache.
+
+O motor guarda em SQLite uma marca d'água (linhas já lidas da aba e último
+timestamp visto) e agregados acumulados por (organização, bloco): contagem,
+soma, soma dos quadrados e distribuição das pontuações 1–5. A cada
+atualização só as linhas novas são lidas (leitura por intervalo) e somadas
+aos agregados. Cada organização tem um número de versão que só muda quando
+ela recebe envios novos; os gráficos ficam em cache por (organização, versão).
+
+Também é guardado o vetor de pontuações de cada envio (um byte por item,
+0 = sem pontuação), base das análises psicométricas (psicometria.py) sem
+reler a planilha. O envio é identificado pelo id_envio gravado na planilha;
+em linhas antigas, sem ele, pela linha da aba em que o envio começa (no
+layout longo, os envios são separados por AgrupadorEnviosLongos). Um envio
+cujo id_envio já foi incorporado (lote gravado duas vezes) não é somado de
+novo.
+
+Os vetores e agregados dependem do banco de itens: o arquivo guarda uma
+assinatura dos itens e, se o instrumento mudar (itens.py recompila quando o
+arquivo muda), é refeito a partir da planilha, como numa troca de esquema.
+"""
+import hashlib
+import io
+import json
+import math
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from armazenamento import (
+    COLUNAS_FIXAS_LARGO, AgrupadorEnviosLongos, eh_aba_larga, id_envio_da_linha_longa,
+    instrumento_da_linha_longa, letra_coluna, mapa_colunas,
+)
+from itens import INSTRUMENTO_PADRAO, ITENS
+
+CAMINHO_RELATORIO_PADRAO = "relatorio.sqlite3"
+LINHAS_POR_LEITURA = 5000
+PONTUACOES = (1, 2, 3, 4, 5)
+COLUNA_FINAL_LONGA = "K"
+VERSAO_ESQUEMA = 2  # user_version do SQLite; um arquivo mais antigo é refeito a partir da planilha
+
+
+def _pontuacao(valor):
+    """Converte a célula de pontuação em int 1–5 (None para N/A/vazio)."""
+    try:
+        numero = int(float(valor))
+    except (TypeError, ValueError):
+        return None
+    return numero if numero in PONTUACOES else None
+
+
+class _Leitura:
+    """Envios lidos em uma atualização: chave -> [id_organizacao, org, timestamp, vetor]."""
+
+    def __init__(self, tamanho_vetor):
+        self.tamanho_vetor = tamanho_vetor
+        self.envios = OrderedDict()
+        self.agrupador = AgrupadorEnviosLongos()
+        self.atual = None  # envio corrente (layout longo); None se repetido nesta leitura
+
+    def novo_envio(self, chave, linha):
+        if chave in self.envios:
+            self.atual = None
+        else:
+            self.atual = self.envios[chave] = [linha[1], linha[4], linha[0], bytearray(self.tamanho_vetor)]
+        return self.atual
+
+
+class MotorRelatorio:
+    """Agregados persistidos por organização/bloco, atualizados incrementalmente."""
+
+    def __init__(self, caminho=CAMINHO_RELATORIO_PADRAO, itens=ITENS,
+                 linhas_por_leitura=LINHAS_POR_LEITURA, instrumento=INSTRUMENTO_PADRAO):
+        self.caminho = caminho
+        self.itens = itens
+        self.instrumento = instrumento
+        self.linhas_por_leitura = linhas_por_leitura
+        self.bloco_por_indice = [bloco for bloco, _, _, _ in itens]
+        self.indice_por_texto = {item: i for i, (_, _, item, _) in enumerate(itens)}
+        self.indice_por_id = {item_id: i for i, (_, item_id, _, _) in enumerate(itens)}
+        self._graficos = {}
+        self._trava = threading.Lock()
+        self._criar_tabelas()
+
+    # --- PERSISTÊNCIA ---
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    def _criar_tabelas(self):
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")  # arquivo compartilhado no modo multiprocesso
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS metadados (chave TEXT PRIMARY KEY, valor TEXT)")
+            assinatura = hashlib.sha256(
+                json.dumps(self.itens, ensure_ascii=False).encode("utf-8")
+            ).hexdigest()
+            gravada = conn.execute("SELECT valor FROM metadados WHERE chave = 'itens'").fetchone()
+            if (conn.execute("PRAGMA user_version").fetchone()[0] < VERSAO_ESQUEMA
+                    or (gravada is not None and gravada[0] != assinatura)):
+                # Os dados são derivados da planilha: esquema ou itens antigos são descartados e relidos
+                for tabela in ("marca_dagua", "organizacoes", "agregados", "vetores"):
+                    conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+                conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+            conn.execute("INSERT OR REPLACE INTO metadados (chave, valor) VALUES ('itens', ?)", (assinatura,))
+        with self._conectar() as conn:
+            conn.executescript(
+                """CREATE TABLE IF NOT EXISTS marca_dagua (
+                       aba TEXT PRIMARY KEY,
+                       linhas_lidas INTEGER NOT NULL,
+                       ultimo_timestamp TEXT
+                   );
+                   CREATE TABLE IF NOT EXISTS organizacoes (
+                       id_organizacao TEXT PRIMARY KEY,
+                       org TEXT,
+                       envios INTEGER NOT NULL DEFAULT 0,
+                       versao INTEGER NOT NULL DEFAULT 0,
+                       ultimo_timestamp TEXT
+                   );
+                   CREATE TABLE IF NOT EXISTS agregados (
+                       id_organizacao TEXT NOT NULL,
+                       bloco TEXT NOT NULL,
+                       n INTEGER NOT NULL DEFAULT 0,
+                       soma REAL NOT NULL DEFAULT 0,
+                       soma_quadrados REAL NOT NULL DEFAULT 0,
+                       d1 INTEGER NOT NULL DEFAULT 0,
+                       d2 INTEGER NOT NULL DEFAULT 0,
+                       d3 INTEGER NOT NULL DEFAULT 0,
+                       d4 INTEGER NOT NULL DEFAULT 0,
+                       d5 INTEGER NOT NULL DEFAULT 0,
+                       PRIMARY KEY (id_organizacao, bloco)
+                   );
+                   CREATE TABLE IF NOT EXISTS vetores (
+                       chave TEXT PRIMARY KEY,
+                       id_organizacao TEXT NOT NULL,
+                       pontos BLOB NOT NULL
+                   );
+                   CREATE INDEX IF NOT EXISTS vetores_organizacao ON vetores (id_organizacao);"""
+            )
+
+    def marca_dagua(self, aba):
+        """Retorna (linhas_lidas, ultimo_timestamp) da aba."""
+        with self._conectar() as conn:
+            linha = conn.execute(
+                "SELECT linhas_lidas, ultimo_timestamp FROM marca_dagua WHERE aba = ?", (aba,)
+            ).fetchone()
+        return linha if linha else (0, None)
+
+    # --- LEITURA DAS LINHAS NOVAS ---
+    def _acumular_longo(self, aba, linhas, primeira_linha, leitura):
+        """Layout longo: [timestamp, id_org, respondente, data, org, bloco, item, resposta, pontuação, ...]."""
+        for numero, linha in enumerate(linhas, start=primeira_linha):
+            if len(linha) < 9 or instrumento_da_linha_longa(linha) != self.instrumento:
+                continue
+            indice = self.indice_por_texto.get(linha[6])
+            if indice is None:
+                continue  # cabeçalho ou item desconhecido
+            if leitura.agrupador.novo_envio(linha):
+                leitura.novo_envio(id_envio_da_linha_longa(linha) or f"{aba}:{numero}", linha)
+            pontos = _pontuacao(linha[8])
+            if pontos is not None and leitura.atual is not None:
+                leitura.atual[3][indice] = pontos
+
+    def _acumular_largo(self, aba, linhas, primeira_linha, cabecalho, leitura):
+        """Layout largo: uma linha por envio, pares (resposta, pontuação) por item."""
+        colunas = [
+            (self.indice_por_id[item_id], coluna_pontos)
+            for item_id, (_, coluna_pontos) in mapa_colunas(cabecalho).items()
+            if item_id in self.indice_por_id and coluna_pontos is not None
+        ]
+        coluna_id = cabecalho.index("id_envio") if "id_envio" in cabecalho else None
+        for numero, linha in enumerate(linhas, start=primeira_linha):
+            if not linha or linha[0] == COLUNAS_FIXAS_LARGO[0]:
+                continue
+            id_envio = linha[coluna_id] if coluna_id is not None and coluna_id < len(linha) else ""
+            envio = leitura.novo_envio(id_envio or f"{aba}:{numero}", linha)
+            if envio is None:
+                continue
+            for indice, coluna_pontos in colunas:
+                pontos = _pontuacao(linha[coluna_pontos]) if coluna_pontos < len(linha) else None
+                if pontos is not None:
+                    envio[3][indice] = pontos
+
+    def atualizar(self, ws):
+        """Lê apenas as linhas novas da aba e as incorpora aos agregados.
+
+        Retorna o conjunto de organizações que receberam envios novos.
+        """
+        with self._trava:
+            linhas_lidas, ultimo_timestamp = self.marca_dagua(ws.title)
+            linhas_lidas_antes = linhas_lidas
+            largo = eh_aba_larga(ws.title)
+            cabecalho = ws.row_values(1) if largo else None
+            ultima_coluna = letra_coluna(len(COLUNAS_FIXAS_LARGO) + 2 * len(self.itens)) if largo \
+                else COLUNA_FINAL_LONGA
+            leitura = _Leitura(len(self.itens))
+            while True:
+                inicio = linhas_lidas + 1
+                fim = linhas_lidas + self.linhas_por_leitura
+                bloco_linhas = ws.get(f"A{inicio}:{ultima_coluna}{fim}")
+                if not bloco_linhas:
+                    break
+                if largo:
+                    self._acumular_largo(ws.title, bloco_linhas, inicio, cabecalho, leitura)
+                else:
+                    self._acumular_longo(ws.title, bloco_linhas, inicio, leitura)
+                linhas_lidas += len(bloco_linhas)
+                if len(bloco_linhas) < self.linhas_por_leitura:
+                    break
+            if leitura.envios:
+                ultimo_timestamp = max([ultimo_timestamp or ""] + [e[2] for e in leitura.envios.values()])
+            organizacoes = self._gravar(ws.title, linhas_lidas_antes, linhas_lidas, ultimo_timestamp,
+                                        leitura.envios)
+        return organizacoes or set()
+
+    def _gravar(self, aba, linhas_lidas_antes, linhas_lidas, ultimo_timestamp, envios):
+        """Grava o lote se a marca d'água não mudou desde a leitura.
+
+        Retorna as organizações com envios novos, ou None se o lote foi descartado.
+        Com vários processos sobre o mesmo arquivo (modo multiprocesso), outro
+        processo pode ter incorporado as mesmas linhas enquanto esta leitura
+        acontecia; a verificação e a gravação ocorrem sob a mesma trava de escrita.
+        """
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            atual = conn.execute("SELECT linhas_lidas FROM marca_dagua WHERE aba = ?", (aba,)).fetchone()
+            if (atual[0] if atual else 0) != linhas_lidas_antes:
+                return None
+            # Envios já incorporados (o mesmo id_envio gravado de novo na planilha) não contam
+            chaves = list(envios)
+            for inicio in range(0, len(chaves), 500):
+                parte = chaves[inicio:inicio + 500]
+                for (chave,) in conn.execute(
+                    f"SELECT chave FROM vetores WHERE chave IN ({', '.join('?' * len(parte))})", parte
+                ):
+                    del envios[chave]
+            conn.executemany(
+                "INSERT INTO vetores (chave, id_organizacao, pontos) VALUES (?, ?, ?)",
+                [(chave, id_org, bytes(vetor)) for chave, (id_org, _, _, vetor) in envios.items()],
+            )
+            parciais, por_organizacao = {}, {}
+            for id_org, org, timestamp, vetor in envios.values():
+                for indice, pontos in enumerate(vetor):
+                    if pontos:
+                        parciais.setdefault((id_org, self.bloco_por_indice[indice]), []).append(pontos)
+                resumo = por_organizacao.setdefault(id_org, [org, 0, timestamp])
+                resumo[1] += 1
+                resumo[2] = max(resumo[2], timestamp)
+            for (id_org, bloco), valores in parciais.items():
+                contagem = [valores.count(p) for p in PONTUACOES]
+                conn.execute(
+                    """INSERT INTO agregados (id_organizacao, bloco, n, soma, soma_quadrados, d1, d2, d3, d4, d5)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (id_organizacao, bloco) DO UPDATE SET
+                           n = n + excluded.n, soma = soma + excluded.soma,
+                           soma_quadrados = soma_quadrados + excluded.soma_quadrados,
+                           d1 = d1 + excluded.d1, d2 = d2 + excluded.d2, d3 = d3 + excluded.d3,
+                           d4 = d4 + excluded.d4, d5 = d5 + excluded.d5""",
+                    (id_org, bloco, len(valores), sum(valores), sum(v * v for v in valores), *contagem),
+                )
+            for id_org, (org, quantidade, ultimo) in por_organizacao.items():
+                conn.execute(
+                    """INSERT INTO organizacoes (id_organizacao, org, envios, versao, ultimo_timestamp)
+                       VALUES (?, ?, ?, 1, ?)
+                       ON CONFLICT (id_organizacao) DO UPDATE SET
+                           org = excluded.org, envios = envios + excluded.envios,
+                           versao = versao + 1, ultimo_timestamp = excluded.ultimo_timestamp""",
+                    (id_org, org, quantidade, ultimo),
+                )
+            conn.execute(
+                """INSERT INTO marca_dagua (aba, linhas_lidas, ultimo_timestamp) VALUES (?, ?, ?)
+                   ON CONFLICT (aba) DO UPDATE SET
+                       linhas_lidas = excluded.linhas_lidas, ultimo_timestamp = excluded.ultimo_timestamp""",
+                (aba, linhas_lidas, ultimo_timestamp),
+            )
+        return set(por_organizacao)
+
+    # --- CONSULTAS ---
+    def organizacoes(self):
+        """Lista de dicts com id_organizacao, org, envios, versao e ultimo_timestamp."""
+        with self._conectar() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(linha) for linha in conn.execute(
+                "SELECT * FROM organizacoes ORDER BY org"
+            )]
+
+    def versao(self, id_organizacao):
+        with self._conectar() as conn:
+            linha = conn.execute(
+                "SELECT versao FROM organizacoes WHERE id_organizacao = ?", (id_organizacao,)
+            ).fetchone()
+        return linha[0] if linha else 0
+
+    def resumo(self, id_organizacao):
+        """Por bloco (na ordem do banco de itens): n, média, desvio padrão e distribuição 1–5."""
+        with self._conectar() as conn:
+            linhas = {
+                linha[0]: linha[1:] for linha in conn.execute(
+                    """SELECT bloco, n, soma, soma_quadrados, d1, d2, d3, d4, d5
+                       FROM agregados WHERE id_organizacao = ?""", (id_organizacao,)
+                )
+            }
+        resumo = []
+        for bloco in dict.fromkeys(bloco for bloco, _, _, _ in self.itens):
+            if bloco not in linhas:
+                continue
+            n, soma, soma_quadrados, *distribuicao = linhas[bloco]
+            media = soma / n
+            variancia = max(soma_quadrados / n - media * media, 0.0) * n / (n - 1) if n > 1 else 0.0
+            resumo.append({
+                "bloco": bloco, "prefixo": self._prefixo(bloco), "n": n,
+                "media": round(media, 3), "desvio": round(math.sqrt(variancia), 3),
+                "distribuicao": dict(zip(PONTUACOES, distribuicao)),
+            })
+        return resumo
+
+    def matriz(self, id_organizacao=None):
+        """Matriz respondentes × itens (float, NaN sem pontuação) de uma ou de todas as organizações."""
+        import numpy as np
+
+        consulta = "SELECT pontos FROM vetores"
+        parametros = ()
+        if id_organizacao is not None:
+            consulta += " WHERE id_organizacao = ?"
+            parametros = (id_organizacao,)
+        with self._conectar() as conn:
+            brutos = b"".join(linha[0] for linha in conn.execute(consulta, parametros))
+        matriz = np.frombuffer(brutos, dtype=np.uint8).reshape(-1, len(self.itens)).astype(float)
+        matriz[matriz == 0] = np.nan
+        return matriz
+
+    def _prefixo(self, bloco):
+        return next(item_id[:2] for b, item_id, _, _ in self.itens if b == bloco)
+
+    # --- GRÁFICOS EM CACHE ---
+    def grafico(self, id_organizacao):
+        """PNG com as médias por bloco; refeito só quando a versão da organização muda."""
+        versao = self.versao(id_organizacao)
+        em_cache = self._graficos.get(id_organizacao)
+        if em_cache and em_cache[0] == versao:
+            return em_cache[1]
+
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        resumo = self.resumo(id_organizacao)
+        figura, eixo = plt.subplots(figsize=(7, 3.5))
+        eixo.bar([r["prefixo"] for r in resumo], [r["media"] for r in resumo],
+                 yerr=[r["desvio"] for r in resumo], color="#70D1C6", capsize=4)
+        eixo.set_ylim(0, 5.5)
+        eixo.set_ylabel("Média (1–5)")
+        eixo.set_title("Média por bloco")
+        buffer = io.BytesIO()
+        figura.tight_layout()
+        figura.savefig(buffer, format="png", dpi=120)
+        plt.close(figura)
+        png = buffer.getvalue()
+        self._graficos[id_organizacao] = (versao, png)
+        return png
@@ -0,0 +1,39 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from armazenamento import linha_larga, linhas_longas  # noqa: E402
+from itens import INSTRUMENTO_PADRAO, ITENS  # noqa: E402
+
+TIMESTAMP = "2026-01-01T00:00:00"
+
+
+def _pontuados(pontos):
+    """Itens pontuados com a mesma pontuação em todos os itens (a resposta dos reversos é 6 - pontos)."""
+    return [
+        (item_id, bloco, item, 6 - pontos if reverso == "SIM" else pontos, pontos)
+        for bloco, item_id, item, reverso in ITENS
+    ]
+
+
+@pytest.fixture
+def envio_longo():
+    """Fábrica das 58 linhas longas de um envio com a mesma pontuação em todos os itens."""
+    def criar(pontos=3, respondente="", id_envio="", id_organizacao="ORG1", timestamp=TIMESTAMP):
+        metadados = [timestamp, id_organizacao, respondente, "01/01/2026", "Org"]
+        return linhas_longas(metadados, _pontuados(pontos), INSTRUMENTO_PADRAO, id_envio)
+    return criar
+
+
+@pytest.fixture
+def envio_largo():
+    """Fábrica da linha larga de um envio com a mesma pontuação em todos os itens."""
+    def criar(pontos=3, respondente="", id_envio="", id_organizacao="ORG1", timestamp=TIMESTAMP):
+        metadados = [timestamp, id_organizacao, respondente, "01/01/2026", "Org"]
+        return linha_larga(metadados, _pontuados(pontos), ITENS, INSTRUMENTO_PADRAO, id_envio)
+    return criar
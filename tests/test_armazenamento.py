@@ -0,0 +1,43 @@
+# tests/test_armazenamento.py
+from armazenamento import (
+    COLUNAS_FIXAS_LARGO, VERSAO_LAYOUT_LARGO, cabecalho_largo, converter_longo_para_largo, mapa_colunas,
+    migrar_aba,
+)
+from itens import INSTRUMENTO_PADRAO, ITENS
+from planilha_falsa import PlanilhaFalsa
+
+
+def _id_envio(linha):
+    return linha[COLUNAS_FIXAS_LARGO.index("id_envio")]
+
+
+def test_envios_anonimos_no_mesmo_segundo_nao_se_fundem(envio_longo):
+    # Mesmos (timestamp, organização, respondente): antes viravam uma única linha larga
+    linhas = envio_longo(pontos=1) + envio_longo(pontos=5)
+    largas = converter_longo_para_largo(linhas)
+    assert len(largas) == 2
+    coluna = mapa_colunas(cabecalho_largo())[ITENS[0][1]][1]
+    assert [linha[coluna] for linha in largas] == [1, 5]
+
+
+def test_envios_com_id_sao_separados_pelo_id(envio_longo):
+    linhas = envio_longo(id_envio="a") + envio_longo(id_envio="b") + envio_longo(id_envio="a")
+    assert [_id_envio(linha) for linha in converter_longo_para_largo(linhas)] == ["a", "b", "a"]
+
+
+def test_linhas_legadas_sem_instrumento_nem_id(envio_longo):
+    legadas = [linha[:9] for linha in envio_longo(respondente="Ana")]
+    largas = converter_longo_para_largo(legadas)
+    assert len(largas) == 1
+    assert largas[0][:len(COLUNAS_FIXAS_LARGO)] == [
+        *legadas[0][:5], VERSAO_LAYOUT_LARGO, INSTRUMENTO_PADRAO, "",
+    ]
+
+
+def test_migrar_aba_grava_cabecalho_e_um_envio_por_linha(envio_longo):
+    planilha = PlanilhaFalsa()
+    longa, larga = planilha.worksheet("Organizacional"), planilha.worksheet("Organizacional_Largo")
+    longa.append_rows(envio_longo(id_envio="a") + envio_longo(id_envio="b"))
+    assert migrar_aba(longa, larga) == 2
+    assert larga.row_values(1) == cabecalho_largo()
+    assert larga.row_count == 3
@@ -0,0 +1,211 @@
+# tests/test_avaliacao_organizacional.py
+"""Fluxo do questionário no AppTest, com a planilha falsa e arquivos locais temporários.
+
+O AppTest reexecuta o script inteiro a cada interação (os fragmentos não são
+reexecutados isoladamente); os testes conferem o estado que os fragmentos
+mantêm: contador de respostas válidas, limite de envio e trava após o envio.
+"""
+import hashlib
+import hmac
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import cliente_planilhas
+from fila_envio import FilaEnvio
+from planilha_falsa import PlanilhaFalsa
+
+APP = Path(__file__).resolve().parent.parent / "avaliacao_organizacional.py"
+ROTULO_ENVIO = "Finalizar e Enviar Respostas"
+SEGREDO_LINK = "segredo-de-teste"
+
+
+@pytest.fixture(scope="module")
+def ambiente(tmp_path_factory):
+    """Pasta dos arquivos do app e planilha falsa, compartilhadas pelas sessões (como em um processo).
+
+    O AppTest não tem navegador: os cookies de st.context vêm de um cliente
+    falso, sem nenhum cookie salvo a não ser com a fixture `navegador`.
+    """
+    import streamlit as st
+    import streamlit.runtime.context as contexto
+
+    st.cache_resource.clear()
+    pasta = tmp_path_factory.mktemp("app")
+    planilha = PlanilhaFalsa()
+    cliente = SimpleNamespace(cookies={})
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(cliente_planilhas, "abrir_planilha_google", lambda credenciais, nome, **kwargs: planilha)
+        mp.setattr(contexto, "_get_client_context", lambda: cliente)
+        yield {"pasta": pasta, "planilha": planilha, "cliente": cliente}
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def abrir_app(ambiente):
+    """Abre uma nova sessão do app (com os parâmetros de URL dados) e executa o primeiro run."""
+    from streamlit.testing.v1 import AppTest
+
+    def abrir(**parametros):
+        app = AppTest.from_file(str(APP), default_timeout=30)
+        app.secrets["SPOOL_PATH"] = str(ambiente["pasta"] / "spool.sqlite3")
+        app.secrets["RASCUNHOS_PATH"] = str(ambiente["pasta"] / "rascunhos.sqlite3")
+        app.secrets["RELATORIO_PATH"] = str(ambiente["pasta"] / "relatorio.sqlite3")
+        app.secrets["google_credentials"] = {"private_key": "falsa"}
+        app.secrets["LINK_SECRET_KEY"] = SEGREDO_LINK
+        for nome, valor in parametros.items():
+            app.query_params[nome] = valor
+        return app.run()
+    return abrir
+
+
+@pytest.fixture
+def navegador(ambiente):
+    """Sessões abertas no mesmo navegador: todas enviam o mesmo cookie de retomada."""
+    ambiente["cliente"].cookies = {"avaliacao_rascunho": "navegador-de-teste"}
+    yield
+    ambiente["cliente"].cookies = {}
+
+
+@pytest.fixture
+def fila(ambiente):
+    return FilaEnvio(lambda aba: None, caminho=str(ambiente["pasta"] / "spool.sqlite3"))
+
+
+def assinar(*partes):
+    return hmac.new(SEGREDO_LINK.encode(), "|".join(partes).encode(), hashlib.sha256).hexdigest()
+
+
+def link(org="Org Teste", inst=None):
+    """Parâmetros de um link assinado válido por uma hora (inst, se dado, entra na assinatura)."""
+    exp = str(int(time.time()) + 3600)
+    parametros = {"org": org, "exp": exp, "sig": assinar(org, exp, *([inst] if inst else []))}
+    if inst:
+        parametros["inst"] = inst
+    return parametros
+
+
+def botao_envio(app):
+    return next(b for b in app.button if b.label == ROTULO_ENVIO)
+
+
+def responder(app, quantidade, valor=3, inicio=0):
+    for radio in list(app.radio)[inicio:inicio + quantidade]:
+        radio.set_value(valor)
+    return app.run()
+
+
+def test_envio_liberado_a_partir_de_metade_das_respostas_validas(abrir_app):
+    app = abrir_app()
+    assert botao_envio(app).disabled
+    assert any("Responda 50%" in aviso.value for aviso in app.warning)
+
+    responder(app, 28)
+    responder(app, 10, valor="N/A", inicio=28)  # N/A não conta
+    assert app.session_state["respostas_validas"] == 28
+    assert botao_envio(app).disabled
+
+    responder(app, 1, inicio=40)
+    assert app.session_state["respostas_validas"] == 29
+    assert not botao_envio(app).disabled
+    assert not app.warning
+
+    # Trocar uma resposta válida por N/A volta a bloquear o envio
+    responder(app, 1, valor="N/A")
+    assert app.session_state["respostas_validas"] == 28
+    assert botao_envio(app).disabled
+
+
+def test_envio_grava_no_spool_e_trava_o_botao(abrir_app, fila):
+    app = abrir_app()
+    app.text_input(key="input_respondente").input("Ana")
+    responder(app, 58, valor=4)
+    botao_envio(app).click().run()
+
+    assert not app.exception
+    assert any("sucesso" in mensagem.value for mensagem in app.success)
+    assert botao_envio(app).disabled
+    assert app.session_state["envio_aceito"] == "novo"
+    assert fila.ja_aceito(app.session_state["id_envio"])
+    assert not any("já havia sido registrado" in info.value for info in app.info)
+
+    # Novas interações na mesma sessão mantêm o botão travado
+    responder(app, 1, valor=5)
+    assert botao_envio(app).disabled
+
+
+def test_inst_entra_na_assinatura_do_link(abrir_app):
+    app = abrir_app(**link(inst="organizacional-v1"))
+    assert not app.error
+    assert app.text_input[2].value == "Org Teste"
+    assert len(app.radio) == 58
+
+    # Assinatura sem o inst: o parâmetro foi acrescentado ou trocado depois de assinado
+    parametros = link()
+    parametros["inst"] = "organizacional-v1"
+    app = abrir_app(**parametros)
+    assert any("adulterado" in erro.value for erro in app.error)
+    assert not app.radio
+
+
+def test_inst_desconhecido_bloqueia_o_questionario(abrir_app):
+    app = abrir_app(**link(inst="organizacional-v9"))
+    assert any("Questionário indisponível" in erro.value for erro in app.error)
+    assert not app.radio
+
+
+def test_link_compartilhado_nao_leva_o_rascunho_nem_o_envio(abrir_app, fila):
+    parametros = link()
+    app = abrir_app(**parametros)
+    # O token de retomada vai para um cookie deste navegador, não para a URL
+    [script] = app.get("html")
+    assert "document.cookie = 'avaliacao_rascunho=" in script.proto.body
+    assert set(app.query_params) == set(parametros)
+
+    app.text_input(key="input_respondente").input("Ana")
+    responder(app, 58, valor=4)
+    botao_envio(app).click().run()
+    assert fila.ja_aceito(app.session_state["id_envio"])
+    assert set(app.query_params) == set(parametros)
+
+    # Outra pessoa abre o mesmo link (outro navegador, sem o cookie)
+    outra = abrir_app(**parametros)
+    assert outra.session_state["respostas_validas"] == 0
+    assert outra.text_input(key="input_respondente").value == ""
+    assert outra.session_state["envio_aceito"] is None
+    assert outra.session_state["id_envio"] != app.session_state["id_envio"]
+    assert not any("restauradas" in info.value for info in outra.info)
+
+    responder(outra, 29)
+    assert not botao_envio(outra).disabled
+    botao_envio(outra).click().run()
+    assert outra.session_state["envio_aceito"] == "novo"
+    assert not any("já havia sido registrado" in info.value for info in outra.info)
+
+
+def test_mesmo_navegador_retoma_o_rascunho_e_recomeca_apos_o_envio(abrir_app, navegador, fila):
+    parametros = link()
+    app = abrir_app(**parametros)
+    app.text_input(key="input_respondente").input("Bia")
+    responder(app, 30, valor=2)
+
+    # Queda da sessão: o mesmo navegador reabre o link e recupera as respostas
+    retomada = abrir_app(**parametros)
+    assert any("restauradas" in info.value for info in retomada.info)
+    assert retomada.session_state["respostas_validas"] == 30
+    assert retomada.text_input(key="input_respondente").value == "Bia"
+    assert retomada.session_state["id_envio"] == app.session_state["id_envio"]
+    botao_envio(retomada).click().run()
+    id_aceito = retomada.session_state["id_envio"]
+    assert fila.ja_aceito(id_aceito)
+
+    # Depois do envio aceito, reabrir o link começa um questionário novo, com outro ID
+    nova = abrir_app(**parametros)
+    assert nova.session_state["respostas_validas"] == 0
+    assert nova.session_state["envio_aceito"] is None
+    assert nova.session_state["id_envio"] != id_aceito
+    assert not any("já havia sido registrado" in info.value for info in nova.info)
+    responder(nova, 29)
+    assert not botao_envio(nova).disabled
@@ -0,0 +1,130 @@
+# tests/test_cliente_planilhas.py
+import pytest
+
+import cliente_planilhas
+from cliente_planilhas import ClientePlanilhas, PlanilhaIndisponivel
+from planilha_falsa import ErroHttpFalso, PlanilhaFalsa
+
+
+class AbaComFalhas:
+    """Aba que levanta os erros da fila `falhas` (um por chamada) antes de responder."""
+
+    def __init__(self, falhas):
+        self.title = "Aba"
+        self.falhas = list(falhas)
+        self.chamadas = 0
+
+    def append_rows(self, linhas, **kwargs):
+        self.chamadas += 1
+        if self.falhas:
+            raise self.falhas.pop(0)
+        return "ok"
+
+    row_values = append_rows
+
+
+class PlanilhaComAba:
+    def __init__(self, aba):
+        self.aba = aba
+
+    def worksheet(self, nome):
+        return self.aba
+
+    def worksheets(self):
+        return [self.aba]
+
+
+def test_falha_de_conexao_recusa_novas_tentativas_ate_o_fim_do_intervalo(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cliente_planilhas.time, "monotonic", lambda: agora[0])
+    aberturas = []
+
+    def abrir():
+        aberturas.append(agora[0])
+        if len(aberturas) == 1:
+            raise OSError("rede fora")
+        return PlanilhaFalsa()
+
+    cliente = ClientePlanilhas(abrir, intervalo_reconexao=15.0, dormir=lambda s: None)
+    with pytest.raises(PlanilhaIndisponivel):
+        cliente.executar("Aba", "row_values", 1)
+    agora[0] += 10
+    with pytest.raises(PlanilhaIndisponivel):
+        cliente.executar("Aba", "row_values", 1)
+    assert len(aberturas) == 1  # dentro da janela: nenhuma nova tentativa de conexão
+
+    agora[0] += 10
+    assert cliente.executar("Aba", "row_values", 1) == []
+    assert len(aberturas) == 2
+
+
+def test_401_descarta_a_conexao_e_reconecta():
+    aba = AbaComFalhas([ErroHttpFalso(401, "token expirado")])
+    aberturas = []
+
+    def abrir():
+        aberturas.append(1)
+        return PlanilhaComAba(aba)
+
+    cliente = ClientePlanilhas(abrir, dormir=lambda s: None)
+    assert cliente.executar("Aba", "append_rows", [[1]]) == "ok"
+    assert len(aberturas) == 2
+    assert cliente.resumo_metricas()["Aba.append_rows"]["novas_tentativas"] == 1
+
+
+def test_429_repete_com_backoff_e_respeita_retry_after():
+    aba = AbaComFalhas([ErroHttpFalso(429), ErroHttpFalso(429), ErroHttpFalso(429, retry_after=7)])
+    esperas = []
+    cliente = ClientePlanilhas(lambda: PlanilhaComAba(aba), espera_base=0.5, espera_max=32.0,
+                               dormir=esperas.append)
+    assert cliente.executar("Aba", "append_rows", [[1]]) == "ok"
+    assert aba.chamadas == 4
+    assert 0.25 <= esperas[0] <= 0.5
+    assert 0.5 <= esperas[1] <= 1.0
+    assert esperas[2] == 7
+
+
+def test_429_desiste_apos_o_limite_de_tentativas():
+    aba = AbaComFalhas([ErroHttpFalso(429)] * 10)
+    cliente = ClientePlanilhas(lambda: PlanilhaComAba(aba), tentativas=3, dormir=lambda s: None)
+    with pytest.raises(ErroHttpFalso):
+        cliente.executar("Aba", "append_rows", [[1]])
+    assert aba.chamadas == 3
+
+
+@pytest.mark.parametrize("erro", [ErroHttpFalso(503), ConnectionResetError("conexão perdida")])
+def test_append_rows_nao_e_repetido_apos_falha_ambigua(erro):
+    aba = AbaComFalhas([erro])
+    cliente = ClientePlanilhas(lambda: PlanilhaComAba(aba), dormir=lambda s: None)
+    with pytest.raises(type(erro)):
+        cliente.executar("Aba", "append_rows", [[1]])
+    assert aba.chamadas == 1
+
+
+def test_leitura_e_repetida_apos_5xx():
+    aba = AbaComFalhas([ErroHttpFalso(503)])
+    cliente = ClientePlanilhas(lambda: PlanilhaComAba(aba), dormir=lambda s: None)
+    assert cliente.executar("Aba", "row_values", 1) == "ok"
+    assert aba.chamadas == 2
+
+
+def test_erro_4xx_nao_repetivel_e_propagado_sem_nova_tentativa():
+    aba = AbaComFalhas([ErroHttpFalso(400)])
+    cliente = ClientePlanilhas(lambda: PlanilhaComAba(aba), dormir=lambda s: None)
+    with pytest.raises(ErroHttpFalso):
+        cliente.executar("Aba", "append_rows", [[1]])
+    assert aba.chamadas == 1
+
+
+def test_metricas_recebem_a_latencia_de_cada_operacao():
+    from metricas import Metricas
+
+    metricas = Metricas()
+    cliente = ClientePlanilhas(lambda: PlanilhaComAba(AbaComFalhas([])), dormir=lambda s: None,
+                               metricas=metricas)
+    cliente.executar("Aba", "append_rows", [[1]])
+    assert cliente.metricas is metricas
+    [histograma] = metricas.instantaneo()["histogramas"]
+    assert histograma["nome"] == "sheets_segundos"
+    assert histograma["total"] == 1
+    assert cliente.resumo_metricas()["Aba.append_rows"]["chamadas"] == 1
@@ -0,0 +1,56 @@
+# tests/test_deduplicar.py
+from armazenamento import cabecalho_largo
+from deduplicar import DUPLICATA_CONTEUDO, DUPLICATA_ID, encontrar_duplicatas, gravar_em_partes
+from planilha_falsa import AbaFalsa
+
+
+def _tipos(duplicatas):
+    return [(tipo, indices[0], mantida) for tipo, _, indices, mantida in duplicatas]
+
+
+def test_duplicatas_por_id_e_por_conteudo_no_layout_longo(envio_longo):
+    linhas = (
+        envio_longo(respondente="Ana", id_envio="a")
+        + envio_longo(respondente="Ana", id_envio="a")      # lote reenviado
+        + envio_longo(respondente=" ANA ", id_envio="b")    # nova sessão, mesmas respostas
+        + envio_longo(respondente="Bia", id_envio="c")
+        + envio_longo(respondente="Ana", pontos=4, id_envio="d")
+    )
+    sem_duplicatas, duplicatas = encontrar_duplicatas(linhas)
+    assert _tipos(duplicatas) == [(DUPLICATA_ID, 58, 0), (DUPLICATA_CONTEUDO, 116, 0)]
+    assert sem_duplicatas == linhas[:58] + linhas[174:]
+
+
+def test_copia_posterior_de_um_id_removido_por_conteudo_aponta_para_o_mantido(envio_longo):
+    linhas = envio_longo(id_envio="a") + envio_longo(id_envio="b") + envio_longo(id_envio="b")
+    _, duplicatas = encontrar_duplicatas(linhas)
+    assert _tipos(duplicatas) == [(DUPLICATA_CONTEUDO, 58, 0), (DUPLICATA_ID, 116, 0)]
+
+
+def test_linhas_legadas_sem_id_usam_so_o_conteudo(envio_longo):
+    linhas = [linha[:9] for linha in envio_longo(respondente="Ana") + envio_longo(respondente="Ana")]
+    sem_duplicatas, duplicatas = encontrar_duplicatas(linhas)
+    assert _tipos(duplicatas) == [(DUPLICATA_CONTEUDO, 58, 0)]
+    assert len(sem_duplicatas) == 58
+
+
+def test_layout_largo(envio_largo):
+    linhas = [
+        cabecalho_largo(),
+        envio_largo(respondente="Ana", id_envio="a"),
+        envio_largo(respondente="Ana", id_envio="a"),
+        envio_largo(respondente="ana", id_envio="b"),
+        envio_largo(respondente="Ana", pontos=5, id_envio="c"),
+    ]
+    sem_duplicatas, duplicatas = encontrar_duplicatas(linhas, largo=True)
+    assert _tipos(duplicatas) == [(DUPLICATA_ID, 2, 1), (DUPLICATA_CONTEUDO, 3, 1)]
+    assert sem_duplicatas == [linhas[0], linhas[1], linhas[4]]
+
+
+def test_gravacao_em_intervalos_limitados(envio_longo):
+    linhas = [envio_longo(id_envio=str(n)) for n in range(10)]
+    linhas = [linha for envio in linhas for linha in envio]
+    aba = AbaFalsa("Destino", [["antigo"]] * 1000)
+    assert gravar_em_partes(aba, linhas, celulas_por_gravacao=11 * 100) == 6
+    assert aba.linhas == linhas
+    assert aba.chamadas["update"] == 6
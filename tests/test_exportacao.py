@@ -0,0 +1,52 @@
+# tests/test_exportacao.py
+import pytest
+
+pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+import exportacao  # noqa: E402
+from armazenamento import ABA_LONGA  # noqa: E402
+from exportacao import exportar_parquet, ler_checkpoint  # noqa: E402
+from planilha_falsa import AbaFalsa  # noqa: E402
+
+
+def _linhas_exportadas(destino):
+    return pq.read_table(destino).num_rows
+
+
+def test_retoma_do_checkpoint_lendo_so_as_linhas_novas(tmp_path, envio_longo):
+    aba = AbaFalsa(ABA_LONGA, envio_longo(id_envio="a") + envio_longo(id_envio="b"))
+    assert exportar_parquet(aba, tmp_path, linhas_por_leitura=50) == 116
+    assert ler_checkpoint(tmp_path)[ABA_LONGA]["linhas_lidas"] == 116
+
+    aba.append_rows(envio_longo(id_envio="c", timestamp="2026-02-01T00:00:00"))
+    leituras = aba.chamadas["get"]
+    assert exportar_parquet(aba, tmp_path, linhas_por_leitura=50) == 58
+    assert aba.chamadas["get"] - leituras == 2  # linhas 117-166 e 167-174
+    assert ler_checkpoint(tmp_path)[ABA_LONGA]["ultimo_timestamp"] == "2026-02-01T00:00:00"
+    assert exportar_parquet(aba, tmp_path, linhas_por_leitura=50) == 0
+    assert _linhas_exportadas(tmp_path) == 174
+
+
+def test_lote_repetido_apos_queda_sobrescreve_o_mesmo_arquivo(tmp_path, envio_longo, monkeypatch):
+    aba = AbaFalsa(ABA_LONGA, envio_longo(id_envio="a") + envio_longo(id_envio="b"))
+    gravar_checkpoint = exportacao.gravar_checkpoint
+    gravacoes = []
+
+    def queda_no_segundo_checkpoint(destino, checkpoint):
+        gravacoes.append(1)
+        if len(gravacoes) == 2:
+            raise KeyboardInterrupt("queda depois de gravar o Parquet do lote")
+        gravar_checkpoint(destino, checkpoint)
+
+    monkeypatch.setattr(exportacao, "gravar_checkpoint", queda_no_segundo_checkpoint)
+    with pytest.raises(KeyboardInterrupt):
+        exportar_parquet(aba, tmp_path, linhas_por_leitura=50)
+    assert ler_checkpoint(tmp_path)[ABA_LONGA]["linhas_lidas"] == 50
+
+    monkeypatch.setattr(exportacao, "gravar_checkpoint", gravar_checkpoint)
+    assert exportar_parquet(aba, tmp_path, linhas_por_leitura=50) == 66
+    assert _linhas_exportadas(tmp_path) == 116
+    assert sorted(p.name for p in tmp_path.rglob("*.parquet")) == [
+        "part-000000001.parquet", "part-000000051.parquet", "part-000000101.parquet",
+    ]
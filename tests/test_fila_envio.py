@@ -0,0 +1,177 @@
+# tests/test_fila_envio.py
+import sys
+
+import pytest
+
+import fila_envio
+from armazenamento import ABA_LONGA, CabecalhoIncompativel, aba_larga
+from fila_envio import FilaEnvio
+from metricas import Metricas
+from planilha_falsa import ErroHttpFalso, PlanilhaFalsa
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return str(tmp_path / "spool.sqlite3")
+
+
+def test_envios_pendentes_sobrevivem_ao_reinicio(spool, envio_longo):
+    fila = FilaEnvio(lambda aba: None, caminho=spool)
+    fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a")
+    fila.enfileirar(ABA_LONGA, envio_longo(id_envio="b"), "b")
+    with pytest.raises(ConnectionError):
+        fila.descarregar()
+    assert fila.pendentes() == 2
+
+    # Novo processo sobre o mesmo spool
+    planilha = PlanilhaFalsa()
+    reiniciada = FilaEnvio(planilha.worksheet, caminho=spool)
+    assert reiniciada.descarregar() == 2
+    assert reiniciada.pendentes() == 0
+    aba = planilha.worksheet(ABA_LONGA)
+    assert aba.row_count == 116
+    assert aba.chamadas["append_rows"] == 1
+
+
+def test_id_de_envio_repetido_e_descartado(spool, envio_longo):
+    fila = FilaEnvio(lambda aba: None, caminho=spool)
+    assert fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a") is not None
+    assert fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a") is None
+    assert fila.ja_aceito("a")
+    assert not fila.ja_aceito("b")
+    assert fila.pendentes() == 1
+    # O índice persiste no arquivo
+    assert FilaEnvio(lambda aba: None, caminho=spool).enfileirar(ABA_LONGA, envio_longo(), "a") is None
+
+
+def test_lote_em_voo_nao_e_regravado_apos_queda(spool, envio_longo, monkeypatch):
+    planilha = PlanilhaFalsa()
+    fila = FilaEnvio(planilha.worksheet, caminho=spool)
+    fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a")
+
+    def queda(ids):
+        raise RuntimeError("processo encerrado entre o append_rows e a remoção do spool")
+
+    monkeypatch.setattr(fila, "_remover", queda)
+    with pytest.raises(RuntimeError):
+        fila.descarregar()
+    aba = planilha.worksheet(ABA_LONGA)
+    assert aba.row_count == 58
+
+    reiniciada = FilaEnvio(planilha.worksheet, caminho=spool)
+    assert reiniciada.descarregar() == 1
+    assert reiniciada.pendentes() == 0
+    assert aba.row_count == 58
+    assert aba.chamadas["append_rows"] == 1
+    assert aba.chamadas["col_values"] == 1
+
+
+def test_lote_recusado_com_certeza_e_reenviado_sem_conferir_a_planilha(spool, envio_longo):
+    planilha = PlanilhaFalsa()
+    aba = planilha.worksheet(ABA_LONGA)
+    append_original = aba.append_rows
+    falhas = [ErroHttpFalso(429)]
+
+    def append_rows(linhas, **kwargs):
+        if falhas:
+            raise falhas.pop()
+        append_original(linhas, **kwargs)
+
+    aba.append_rows = append_rows
+    fila = FilaEnvio(planilha.worksheet, caminho=spool)
+    fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a")
+    with pytest.raises(ErroHttpFalso):
+        fila.descarregar()
+    assert fila.descarregar() == 1
+    assert aba.row_count == 58
+    assert aba.chamadas["col_values"] == 0
+
+
+def test_erro_permanente_vai_para_envios_falhos_sem_travar_a_fila(spool, envio_longo):
+    planilha = PlanilhaFalsa()
+    aba = planilha.worksheet(ABA_LONGA)
+    append_original = aba.append_rows
+
+    def append_rows(linhas, **kwargs):
+        if any(linha[2] == "inválido" for linha in linhas):
+            raise ErroHttpFalso(400, "Invalid value")
+        append_original(linhas, **kwargs)
+
+    aba.append_rows = append_rows
+    metricas = Metricas()
+    fila = FilaEnvio(planilha.worksheet, caminho=spool, metricas=metricas)
+    for id_envio, respondente in (("a", "Ana"), ("b", "inválido"), ("c", "Caio")):
+        fila.enfileirar(ABA_LONGA, envio_longo(respondente=respondente, id_envio=id_envio), id_envio)
+
+    assert fila.descarregar() == 3
+    assert fila.pendentes() == 0
+    assert fila.falhos() == 1
+    assert aba.row_count == 116
+    fila._atualizar_medidores()
+    texto = metricas.texto_prometheus()
+    assert "avaliacao_spool_falhos 1" in texto
+    assert "avaliacao_spool_pendentes 0" in texto
+
+    aba.append_rows = append_original
+    assert fila.reenfileirar_falhos() == 1
+    assert fila.descarregar() == 1
+    assert (fila.pendentes(), fila.falhos(), aba.row_count) == (0, 0, 174)
+
+
+def test_cabecalho_incompativel_move_o_lote_da_aba(spool, envio_largo):
+    def obter_planilha(nome_aba):
+        if nome_aba == aba_larga():
+            raise CabecalhoIncompativel("cabeçalho de outra versão")
+        return PlanilhaFalsa().worksheet(nome_aba)
+
+    fila = FilaEnvio(obter_planilha, caminho=spool)
+    fila.enfileirar(aba_larga(), [envio_largo(id_envio="a")], "a")
+    fila.enfileirar(aba_larga(), [envio_largo(id_envio="b")], "b")
+    assert fila.descarregar() == 2
+    assert fila.falhos() == 2
+
+
+def test_erro_transitorio_mantem_o_lote_no_spool(spool, envio_longo):
+    def obter_planilha(nome_aba):
+        raise ErroHttpFalso(503)
+
+    fila = FilaEnvio(obter_planilha, caminho=spool)
+    fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a")
+    with pytest.raises(ErroHttpFalso):
+        fila.descarregar()
+    assert (fila.pendentes(), fila.falhos()) == (1, 0)
+
+
+def test_apenas_um_descarregador_por_spool(spool):
+    primeira = FilaEnvio(lambda aba: None, caminho=spool)
+    segunda = FilaEnvio(lambda aba: None, caminho=spool)
+    assert primeira.assumir_descarga()
+    assert not segunda.assumir_descarga()
+    primeira.liberar_descarga()
+    assert segunda.assumir_descarga()
+    segunda.liberar_descarga()
+
+
+def test_linha_de_comando_lista_e_reenfileira_os_falhos(spool, envio_longo, monkeypatch, capsys):
+    def obter_planilha(nome_aba):
+        raise ErroHttpFalso(400, "Invalid value")
+
+    fila = FilaEnvio(obter_planilha, caminho=spool)
+    fila.enfileirar(ABA_LONGA, envio_longo(id_envio="a"), "a")
+    fila.enfileirar(aba_larga(), [["x"]], "b")
+    fila.descarregar()
+    fila.descarregar()
+    assert fila.falhos() == 2
+
+    monkeypatch.setattr(sys, "argv", ["fila_envio.py", spool, "listar"])
+    fila_envio.main()
+    saida = capsys.readouterr().out
+    assert "58 linhas" in saida and "Invalid value" in saida
+    assert "2 envio(s) em envios_falhos" in saida
+
+    id_longo = fila.listar_falhos(ABA_LONGA)[0]["id"]
+    monkeypatch.setattr(sys, "argv", ["fila_envio.py", spool, "reenfileirar", "--id", str(id_longo)])
+    fila_envio.main()
+    assert "1 envio(s) devolvido(s)" in capsys.readouterr().out
+    assert (fila.pendentes(), fila.falhos()) == (1, 1)
+    assert [envio["aba"] for envio in fila.listar_falhos()] == [aba_larga()]
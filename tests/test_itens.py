@@ -0,0 +1,62 @@
+# tests/test_itens.py
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import itens
+import psicometria
+from itens import INSTRUMENTO_PADRAO, InstrumentoInvalido, carregar_instrumento
+
+
+@pytest.fixture
+def pasta(tmp_path, monkeypatch):
+    """Pasta de instrumentos temporária com uma cópia do instrumento padrão."""
+    shutil.copy(os.path.join(itens.PASTA_INSTRUMENTOS, f"{INSTRUMENTO_PADRAO}.json"), tmp_path)
+    monkeypatch.setattr(itens, "PASTA_INSTRUMENTOS", str(tmp_path))
+    monkeypatch.setattr(itens, "_cache", {})
+    return tmp_path
+
+
+def _reescrever(caminho, alterar):
+    """Altera o arquivo de itens e avança o mtime (a resolução do sistema de arquivos pode ser grossa)."""
+    dados = json.loads(caminho.read_text(encoding="utf-8"))
+    alterar(dados)
+    mtime = caminho.stat().st_mtime_ns
+    caminho.write_text(json.dumps(dados, ensure_ascii=False), encoding="utf-8")
+    os.utime(caminho, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_instrumento_e_recompilado_so_quando_o_arquivo_muda(pasta):
+    primeiro = carregar_instrumento()
+    assert carregar_instrumento() is primeiro
+
+    _reescrever(pasta / f"{INSTRUMENTO_PADRAO}.json",
+                lambda dados: dados["itens"][0].update(item="Texto revisado."))
+    revisado = carregar_instrumento()
+    assert revisado is not primeiro
+    assert revisado.revisao != primeiro.revisao
+    assert revisado.itens[0][2] == "Texto revisado."
+    assert carregar_instrumento() is revisado
+
+
+def test_chave_invalida_ou_ausente(pasta):
+    with pytest.raises(InstrumentoInvalido):
+        carregar_instrumento("../segredos")
+    with pytest.raises(InstrumentoInvalido):
+        carregar_instrumento("organizacional-v9")
+
+
+def test_cache_da_psicometria_acompanha_o_banco_de_itens(pasta):
+    original = carregar_instrumento()
+    matriz = np.full((3, len(original)), 3.0)
+    primeiro = psicometria.analisar(matriz, original.itens, versao=("org", 1))
+
+    _reescrever(pasta / f"{INSTRUMENTO_PADRAO}.json", lambda dados: dados["itens"][0].update(bloco="Outro"))
+    revisado = carregar_instrumento()
+    segundo = psicometria.analisar(matriz, revisado.itens, versao=("org", 1))
+    assert segundo is not primeiro
+    assert segundo["itens"][0]["bloco"] == "Outro"
+    assert psicometria.analisar(matriz, revisado.itens, versao=("org", 1)) is segundo
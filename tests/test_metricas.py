@@ -0,0 +1,89 @@
+# tests/test_metricas.py
+import json
+import time
+
+from metricas import FORMATO_JSONL, Metricas, assinar_perfil, perfil_autorizado
+
+SEGREDO = "segredo-de-perfil"
+
+
+def test_perfil_autorizado_com_assinatura_valida_e_dentro_da_validade():
+    exp = str(int(time.time()) + 60)
+    assert perfil_autorizado(SEGREDO, exp, assinar_perfil(SEGREDO, exp))
+
+
+def test_perfil_recusado_vencido_adulterado_ou_sem_segredo():
+    vencido = str(int(time.time()) - 1)
+    assert not perfil_autorizado(SEGREDO, vencido, assinar_perfil(SEGREDO, vencido))
+
+    exp = str(int(time.time()) + 60)
+    assert not perfil_autorizado(SEGREDO, exp, assinar_perfil("outro-segredo", exp))
+    assert not perfil_autorizado(SEGREDO, str(int(exp) + 3600), assinar_perfil(SEGREDO, exp))
+    assert not perfil_autorizado(None, exp, assinar_perfil(SEGREDO, exp))
+    assert not perfil_autorizado(SEGREDO, exp, None)
+    assert not perfil_autorizado(SEGREDO, "amanha", assinar_perfil(SEGREDO, "amanha"))
+
+
+def test_texto_prometheus():
+    metricas = Metricas()
+    for valor in (0.002, 0.002, 0.3, 100):
+        metricas.observar("secao_segundos", valor, limites=(0.001, 0.01, 1.0), secao="envio")
+    metricas.contar("linhas_gravadas", 58, aba="Organizacional")
+    metricas.definir("spool_pendentes", 3)
+
+    linhas = metricas.texto_prometheus().splitlines()
+    assert linhas == [
+        "# TYPE avaliacao_secao_segundos histogram",
+        'avaliacao_secao_segundos_bucket{secao="envio",le="0.001"} 0',
+        'avaliacao_secao_segundos_bucket{secao="envio",le="0.01"} 2',
+        'avaliacao_secao_segundos_bucket{secao="envio",le="1.0"} 3',
+        'avaliacao_secao_segundos_bucket{secao="envio",le="+Inf"} 4',
+        'avaliacao_secao_segundos_sum{secao="envio"} 100.304',
+        'avaliacao_secao_segundos_count{secao="envio"} 4',
+        "# TYPE avaliacao_linhas_gravadas_total counter",
+        'avaliacao_linhas_gravadas_total{aba="Organizacional"} 58',
+        "# TYPE avaliacao_spool_pendentes gauge",
+        "avaliacao_spool_pendentes 3",
+    ]
+
+
+def test_instrumentacao_desativada_nao_registra():
+    metricas = Metricas(ativo=False)
+    with metricas.cronometro("css"):
+        metricas.contar("envios_gravados")
+    assert metricas.texto_prometheus() == "\n"
+
+
+def test_exportacao_periodica_em_segundo_plano(tmp_path):
+    # Sem nenhuma execução do script: a thread exporta sozinha (reruns de fragmento, flusher)
+    metricas = Metricas(caminho=str(tmp_path / "metricas-{pid}.prom"), intervalo=0.05).iniciar()
+    assert "{pid}" not in metricas.caminho
+    metricas.definir("spool_pendentes", 1)
+    limite = time.monotonic() + 5
+    while "spool_pendentes" not in _ler(metricas.caminho) and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert "avaliacao_spool_pendentes 1" in _ler(metricas.caminho)
+
+    metricas.definir("spool_pendentes", 0)
+    metricas.parar(timeout=5)
+    assert not metricas._thread.is_alive()
+    assert "avaliacao_spool_pendentes 0" in _ler(metricas.caminho)
+
+
+def test_exportacao_jsonl_acrescenta_uma_linha_por_exportacao(tmp_path):
+    caminho = tmp_path / "metricas.jsonl"
+    metricas = Metricas(caminho=str(caminho), formato=FORMATO_JSONL)
+    metricas.contar("envios_gravados")
+    metricas.exportar()
+    metricas.exportar()
+    registros = [json.loads(linha) for linha in caminho.read_text(encoding="utf-8").splitlines()]
+    assert len(registros) == 2
+    assert registros[0]["contadores"] == [{"nome": "envios_gravados", "rotulos": {}, "valor": 1}]
+
+
+def _ler(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as arquivo:
+            return arquivo.read()
+    except FileNotFoundError:
+        return ""
@@ -0,0 +1,72 @@
+# tests/test_pinger.py
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import pinger
+
+
+class AppAdormecido(BaseHTTPRequestHandler):
+    """Imita um app acordando: o health responde 503, depois derruba a conexão, depois "ok"."""
+
+    respostas_health = []
+
+    def do_GET(self):
+        if self.path == "/_stcore/stream":
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.end_headers()
+            return
+        if self.path != "/_stcore/health":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"<html></html>")
+            return
+        resposta = self.respostas_health.pop(0) if self.respostas_health else "ok"
+        if resposta == "derrubar":
+            self.close_connection = True
+            return  # fecha o socket sem enviar a linha de status
+        status = 200 if resposta == "ok" else int(resposta)
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b"ok" if status == 200 else b"Service Unavailable")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), AppAdormecido)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_continua_sondando_apos_503_e_conexao_derrubada(servidor):
+    AppAdormecido.respostas_health = ["503", "derrubar", "503", "ok"]
+    registro = asyncio.run(pinger.sondar(servidor, espera_maxima=5, intervalo=0.01))
+    assert registro["erro"] == ""
+    assert registro["estava_dormindo"] is True
+    assert registro["status_health"] == 200
+    assert registro["latencia_despertar_s"] is not None
+    assert registro["websocket_ok"] is True
+
+
+def test_conexao_derrubada_na_primeira_sondagem_e_tratada_como_sono(servidor):
+    AppAdormecido.respostas_health = ["derrubar", "ok"]
+    registro = asyncio.run(pinger.sondar(servidor, espera_maxima=5, intervalo=0.01))
+    assert registro["erro"] == ""
+    assert registro["estava_dormindo"] is True
+
+
+def test_app_que_nao_acorda_registra_o_ultimo_erro(servidor):
+    AppAdormecido.respostas_health = ["derrubar"] * 1000
+    registro = asyncio.run(pinger.sondar(servidor, espera_maxima=0.2, intervalo=0.01))
+    assert registro["erro"].startswith("App não acordou em 0.2s")
+    assert "RemoteDisconnected" in registro["erro"]
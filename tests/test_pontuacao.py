@@ -0,0 +1,24 @@
+# tests/test_pontuacao.py
+import numpy as np
+
+from itens import ITENS
+from pontuacao import itens_pontuados, matriz_respostas, pontuar_lote
+
+
+def test_lote_pontua_como_o_caminho_de_envio():
+    envios = [
+        {item_id: (i + j) % 5 + 1 for j, (_, item_id, _, _) in enumerate(ITENS)} for i in range(20)
+    ]
+    envios[0][ITENS[0][1]] = "N/A"
+    envios[1] = {ITENS[1][1]: "4", "desconhecido": 2}
+    lote = pontuar_lote(envios)
+    for envio, linha in zip(envios, lote):
+        esperado = [np.nan if p == "N/A" else p for *_, p in itens_pontuados(envio)]
+        np.testing.assert_array_equal(linha, esperado)
+
+
+def test_matriz_respostas_trata_na_vazio_e_invalido_como_nan():
+    ids = [item_id for _, item_id, _, _ in ITENS]
+    matriz = matriz_respostas([{ids[0]: "N/A", ids[1]: "", ids[2]: "x", ids[3]: "5", ids[4]: 2}])
+    np.testing.assert_array_equal(matriz[0, :5], [np.nan, np.nan, np.nan, 5, 2])
+    assert matriz_respostas([]).shape == (0, len(ids))
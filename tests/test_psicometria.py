@@ -0,0 +1,66 @@
+# tests/test_psicometria.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from armazenamento import COLUNAS_LONGAS
+from psicometria import covariancia_pareada, estatisticas_bloco, matriz_de_dataframe
+
+
+@pytest.fixture
+def matriz():
+    gerador = np.random.default_rng(7)
+    traco = gerador.normal(size=(200, 1))
+    return np.clip(np.round(3 + traco + gerador.normal(scale=0.8, size=(200, 6))), 1, 5)
+
+
+def alfa_de_cronbach(x):
+    """Fórmula de livro: k/(k-1) * (1 - soma das variâncias dos itens / variância do total)."""
+    k = x.shape[1]
+    return k / (k - 1) * (1 - x.var(axis=0, ddof=1).sum() / x.sum(axis=1).var(ddof=1))
+
+
+def test_alfa_e_estatisticas_por_item_batem_com_as_formulas_de_livro(matriz):
+    estatisticas = estatisticas_bloco(matriz)
+    assert estatisticas["alfa"] == pytest.approx(alfa_de_cronbach(matriz))
+    total = matriz.sum(axis=1)
+    for i in range(matriz.shape[1]):
+        item_resto = np.corrcoef(matriz[:, i], total - matriz[:, i])[0, 1]
+        assert estatisticas["correlacao_item_total"][i] == pytest.approx(item_resto)
+        sem_item = alfa_de_cronbach(np.delete(matriz, i, axis=1))
+        assert estatisticas["alfa_sem_item"][i] == pytest.approx(sem_item)
+
+
+def test_covariancia_pareada_com_na_bate_com_o_pandas(matriz):
+    com_na = matriz.copy()
+    com_na[np.random.default_rng(3).random(com_na.shape) < 0.15] = np.nan
+    cov, n = covariancia_pareada(com_na)
+    np.testing.assert_allclose(cov, pd.DataFrame(com_na).cov().to_numpy())
+    assert n[0, 1] == (~np.isnan(com_na[:, 0]) & ~np.isnan(com_na[:, 1])).sum()
+
+
+def test_envios_anonimos_no_mesmo_segundo_nao_se_fundem(envio_longo):
+    linhas = envio_longo(pontos=3) + envio_longo(pontos=5)
+    legado = pd.DataFrame([linha[:9] for linha in linhas], columns=COLUNAS_LONGAS[:9])
+    np.testing.assert_array_equal(matriz_de_dataframe(legado)[:, 0], [3, 5])
+
+    repetido = envio_longo(pontos=4, id_envio="x")
+    df = pd.DataFrame(linhas + repetido + repetido, columns=COLUNAS_LONGAS)
+    np.testing.assert_array_equal(matriz_de_dataframe(df)[:, 0], [3, 5, 4])
+
+
+def test_repontua_a_partir_das_respostas_nos_dois_layouts(envio_longo, envio_largo):
+    from armazenamento import cabecalho_largo
+    from itens import ITENS
+
+    reversos = np.array([reverso == "SIM" for _, _, _, reverso in ITENS])
+    longo = pd.DataFrame(envio_longo(pontos=2), columns=COLUNAS_LONGAS)
+    largo = pd.DataFrame([envio_largo(pontos=2)], columns=cabecalho_largo())
+    for df in (longo, largo):
+        np.testing.assert_array_equal(matriz_de_dataframe(df), np.full((1, len(ITENS)), 2.0))
+
+    # Pontuação gravada errada (reversos sem inversão): só a repontuação a corrige
+    longo["pontuacao"] = longo["resposta"]
+    gravada = matriz_de_dataframe(longo, repontuar=False)
+    np.testing.assert_array_equal(gravada[0, reversos], 4)
+    np.testing.assert_array_equal(matriz_de_dataframe(longo)[0, reversos], 2)
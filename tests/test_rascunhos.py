@@ -0,0 +1,54 @@
+# tests/test_rascunhos.py
+import sqlite3
+import time
+
+from itens import carregar_instrumento
+from rascunhos import ArmazemRascunhos, codificar, decodificar
+
+INSTRUMENTO = carregar_instrumento()
+
+
+def test_codificacao_tem_um_byte_por_item_e_ida_e_volta():
+    ids = [item_id for _, item_id, _, _ in INSTRUMENTO.itens]
+    respostas = {ids[0]: 1, ids[1]: 5, ids[2]: "N/A", ids[-1]: 3}
+    dados = codificar(respostas, INSTRUMENTO)
+    assert len(dados) == len(INSTRUMENTO)
+    assert dados[0] == 1 and dados[2] == 6 and dados[3] == 0
+    assert decodificar(dados, INSTRUMENTO) == respostas
+
+
+def test_decodificar_ignora_tamanho_errado_e_codigos_invalidos():
+    assert decodificar(b"\x01\x02", INSTRUMENTO) == {}
+    assert decodificar(None, INSTRUMENTO) == {}
+    dados = bytearray(len(INSTRUMENTO))
+    dados[0] = 9
+    assert decodificar(bytes(dados), INSTRUMENTO) == {}
+
+
+def _rascunho():
+    return {"link": "sig", "instrumento": INSTRUMENTO.chave,
+            "respostas": codificar({}, INSTRUMENTO), "respondente": "", "id_envio": "abc"}
+
+
+def test_rascunho_vencido_nao_e_carregado_e_e_expurgado(tmp_path):
+    caminho = str(tmp_path / "rascunhos.sqlite3")
+    armazem = ArmazemRascunhos(caminho, ttl=3600)
+    armazem.salvar("novo", _rascunho())
+    armazem.salvar("velho", _rascunho())
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("UPDATE rascunhos SET atualizado_em = ? WHERE token = 'velho'", (time.time() - 7200,))
+
+    assert armazem.carregar("novo")["id_envio"] == "abc"
+    assert armazem.carregar("velho") is None
+    assert armazem.expurgar() == 1
+    assert armazem.carregar("novo") is not None
+
+
+def test_gravacao_adiada_espera_o_silencio(tmp_path):
+    armazem = ArmazemRascunhos(str(tmp_path / "rascunhos.sqlite3"), espera=60)
+    armazem.agendar("t", _rascunho())
+    assert armazem.gravar_pendentes() > 0  # ainda dentro da espera: nada gravado
+    assert ArmazemRascunhos(armazem.caminho).carregar("t") is None
+    assert armazem.carregar("t") is not None  # o pendente em memória já é visível
+    assert armazem.gravar_pendentes(todos=True) is None
+    assert ArmazemRascunhos(armazem.caminho).carregar("t")["link"] == "sig"
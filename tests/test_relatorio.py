@@ -0,0 +1,99 @@
+# tests/test_relatorio.py
+import pytest
+
+from armazenamento import ABA_LONGA, aba_larga, cabecalho_largo
+from itens import ITENS
+from planilha_falsa import AbaFalsa
+from relatorio import MotorRelatorio
+
+ITENS_PRIMEIRO_BLOCO = sum(1 for bloco, _, _, _ in ITENS if bloco == ITENS[0][0])
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "relatorio.sqlite3")
+
+
+def test_atualizacao_incremental_le_so_as_linhas_novas(caminho, envio_longo):
+    aba = AbaFalsa(ABA_LONGA, envio_longo(pontos=3, id_envio="a"))
+    motor = MotorRelatorio(caminho, linhas_por_leitura=50)
+    assert motor.atualizar(aba) == {"ORG1"}
+    assert motor.versao("ORG1") == 1
+
+    assert motor.atualizar(aba) == set()
+    assert motor.versao("ORG1") == 1  # sem envios novos, a versão (e o gráfico em cache) não muda
+
+    aba.append_rows(envio_longo(pontos=5, id_envio="b"))
+    leituras = aba.chamadas["get"]
+    assert motor.atualizar(aba) == {"ORG1"}
+    assert aba.chamadas["get"] - leituras == 2  # linhas 59-108 e 109-116
+    assert motor.marca_dagua(ABA_LONGA)[0] == 116
+    organizacao = motor.organizacoes()[0]
+    assert (organizacao["envios"], organizacao["versao"]) == (2, 2)
+    primeiro_bloco = motor.resumo("ORG1")[0]
+    assert primeiro_bloco["media"] == 4.0
+    assert primeiro_bloco["distribuicao"][3] == primeiro_bloco["distribuicao"][5] == primeiro_bloco["n"] / 2
+
+
+def test_envios_anonimos_no_mesmo_segundo_contam_separados(caminho, envio_longo):
+    # Linhas antigas, sem id_envio: o segundo envio começa quando o primeiro item se repete
+    linhas = [linha[:9] for linha in envio_longo(pontos=3) + envio_longo(pontos=5)]
+    motor = MotorRelatorio(caminho, linhas_por_leitura=50)
+    motor.atualizar(AbaFalsa(ABA_LONGA, linhas))
+    assert motor.organizacoes()[0]["envios"] == 2
+    assert motor.matriz("ORG1").shape == (2, 58)
+    assert sorted(motor.matriz("ORG1")[:, 0]) == [3, 5]
+
+
+def test_lote_gravado_duas_vezes_nao_e_somado_de_novo(caminho, envio_longo):
+    aba = AbaFalsa(ABA_LONGA, envio_longo(id_envio="a") * 2)
+    motor = MotorRelatorio(caminho)
+    motor.atualizar(aba)
+    aba.append_rows(envio_longo(id_envio="a"))
+    motor.atualizar(aba)
+    assert motor.organizacoes()[0]["envios"] == 1
+    assert motor.resumo("ORG1")[0]["n"] == motor.matriz("ORG1").shape[0] * ITENS_PRIMEIRO_BLOCO
+
+
+def test_layout_largo(caminho, envio_largo):
+    aba = AbaFalsa(aba_larga(), [cabecalho_largo(), envio_largo(3, id_envio="a"), envio_largo(5)])
+    motor = MotorRelatorio(caminho)
+    assert motor.atualizar(aba) == {"ORG1"}
+    assert motor.organizacoes()[0]["envios"] == 2
+    assert sorted(motor.matriz()[:, 0]) == [3, 5]
+
+
+class AbaComConcorrente(AbaFalsa):
+    """Aba em que outro processo incorpora as mesmas linhas durante a leitura deste."""
+
+    concorrente = None
+
+    def get(self, range_name=None, **kwargs):
+        linhas = super().get(range_name, **kwargs)
+        if self.concorrente is not None:
+            concorrente, self.concorrente = self.concorrente, None
+            concorrente.atualizar(AbaFalsa(self.title, self.linhas))
+        return linhas
+
+
+def test_marca_dagua_alterada_por_outro_processo_descarta_a_leitura(caminho, envio_longo):
+    aba = AbaComConcorrente(ABA_LONGA, envio_longo(id_envio="a") + envio_longo(id_envio="b"))
+    motor, outro_processo = MotorRelatorio(caminho), MotorRelatorio(caminho)
+    aba.concorrente = outro_processo
+    assert motor.atualizar(aba) == set()
+    organizacao = motor.organizacoes()[0]
+    assert (organizacao["envios"], organizacao["versao"]) == (2, 1)
+    assert motor.resumo("ORG1")[0]["n"] == 2 * ITENS_PRIMEIRO_BLOCO
+    assert motor.marca_dagua(ABA_LONGA)[0] == 116
+
+
+def test_banco_de_itens_alterado_refaz_os_agregados(caminho, envio_longo):
+    aba = AbaFalsa(ABA_LONGA, envio_longo(pontos=3, id_envio="a"))
+    MotorRelatorio(caminho).atualizar(aba)
+
+    # Mesmo arquivo, banco de itens sem o último item: vetores e marca d'água são descartados
+    motor = MotorRelatorio(caminho, itens=ITENS[:-1])
+    assert motor.marca_dagua(ABA_LONGA) == (0, None)
+    assert motor.atualizar(aba) == {"ORG1"}
+    assert motor.matriz("ORG1").shape == (1, len(ITENS) - 1)
+    assert MotorRelatorio(caminho, itens=ITENS[:-1]).marca_dagua(ABA_LONGA)[0] == 58